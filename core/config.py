@@ -2,7 +2,7 @@
 
 import os
 import toml
-from typing import Dict, Any, Optional, Union, List
+from typing import Dict, Any, Optional, Union, List, Literal
 from pydantic import BaseModel, Field, ValidationError, SecretStr, validator, HttpUrl, DirectoryPath, FilePath, AliasChoices, PrivateAttr, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import logging
@@ -181,6 +181,18 @@ class MemoryCacheConfig(BaseModel):
 class RedisConfig(BaseSettings):
     # Allow overriding via REDIS_URL env var
     url: str = Field("redis://localhost:6379/0", validation_alias=AliasChoices("url", "REDIS_URL"))
+    serializer: Literal["msgpack", "json"] = "msgpack" # Cache value encoding; json is human-readable for debugging
+    # Write-behind: cache writes return immediately and are flushed in pipelined batches.
+    # Opt-in: writes are acknowledged before Redis has them and are lost if the process exits first
+    write_behind: bool = False
+    write_behind_interval: float = 0.005 # Seconds to wait for more writes before flushing
+    write_behind_max_batch: int = 512
+    # Connection pool: commands wait for a free connection once pool_size are in use
+    pool_size: int = 50
+    pool_timeout: Optional[float] = 5.0 # Seconds to wait for a free connection
+    # In-process LRU in front of Redis for hot keys; entries written by other processes may be stale for up to the TTL
+    local_cache_size: int = 1024 # 0 disables the local cache
+    local_cache_ttl_seconds: float = 1.0
 
 # NEW LanceDB Config
 class LanceDBConfig(BaseModel):
@@ -190,6 +202,20 @@ class LanceDBConfig(BaseModel):
     # We will likely pass the embedding provider instance directly during initialization
     embedding_function_name: Optional[str] = None
     embedding_model_name: Optional[str] = None
+    vector_dtype: Literal["float32", "float16"] = Field("float32", description="Storage type of the vector column. float16 halves vector storage and scan bandwidth.")
+    indexed_metadata_keys: List[str] = Field(default_factory=list, description="Metadata keys promoted to indexed string columns for fast filtering.")
+    # Write coalescing: concurrent writes are upserted in one batch per window
+    async_insert_wait_time: float = Field(0.02, description="Seconds to wait for more writes before flushing a batch. 0 disables write batching.")
+    async_insert_max_rows: int = Field(256, description="Maximum number of records upserted in a single batch.")
+    metadata_format: Literal["json", "msgpack"] = Field("json", description="Encoding of the metadata column. msgpack stores smaller binary rows; filters on non-indexed keys are then applied in-process.")
+    # Approximate nearest neighbour index and search tuning
+    vector_index_type: Literal["IVF_PQ", "IVF_SQ", "HNSW_SQ"] = Field("IVF_PQ", description="Vector index built automatically once the table is large enough.")
+    auto_index_min_rows: int = Field(10000, description="Row count that triggers the first vector index build; rebuilt when the row count doubles. 0 disables automatic indexing.")
+    nprobes: Optional[int] = Field(None, description="IVF partitions probed per search. None uses the LanceDB default.")
+    ef_search: Optional[int] = Field(None, description="HNSW candidate list size per search. None uses the LanceDB default.")
+    refine_factor: Optional[int] = Field(None, description="Re-rank top_k * refine_factor candidates on full-precision vectors.")
+    distance_type: Literal["cosine", "l2", "dot"] = Field("cosine", description="Distance metric of the vector index and of searches; both must match for valid results.")
+    use_io_uring: bool = Field(False, description="Read local (Linux) databases through Lance's io_uring object store. Ignored for remote URIs and tmpfs/NFS mounts.")
     # mode: str = "overwrite" # If needed for table creation
 
 class MemoryConfig(BaseModel):
@@ -204,6 +230,15 @@ class MemoryConfig(BaseModel):
     # Simplify to a single optional LanceDB config for now
     lancedb: Optional[LanceDBConfig] = None 
 
+    # In-process search result cache (MemoryManager.search)
+    search_cache_size: int = 256 # Max cached result lists; 0 disables the cache
+    search_cache_similarity_threshold: Optional[float] = None # Reuse results for queries with cosine similarity >= threshold; None = exact matches only
+    search_cache_ttl_seconds: float = 5.0 # Max age of cached results; bounds staleness from writes by other workers/processes. 0 disables the cache
+
+    # Write coalescing (MemoryManager.write): identical rewrites of a key within the TTL are skipped
+    write_coalesce_size: int = 10000 # Max tracked keys; 0 disables coalescing
+    write_coalesce_ttl_seconds: float = 2.0
+
     default_embedding_provider_id: str = 'openai' # TODO: Link this better? Or remove?
 
 class IggyStreamDefaults(BaseModel):
@@ -241,6 +276,17 @@ class AppConfig(BaseSettings):
     host: str = "127.0.0.1"
     port: int = 8000
     reload: bool = False # Set True for Uvicorn auto-reload (dev only)
+    # Uvicorn event loop: "auto" (uvloop when installed, else asyncio), "asyncio", "uvloop",
+    # or a "module:factory" import string for a custom loop (e.g. an io_uring-backed one)
+    event_loop: str = "auto"
+    # Uvicorn worker processes sharing the listening socket; each runs its own event loop,
+    # event bus and service clients. 0 = one per CPU core. Ignored when reload is on.
+    workers: int = Field(default=1, ge=0)
+    # Fraction of successful requests logged by the request middleware (4xx/5xx are always logged)
+    request_log_sample_rate: float = Field(default=1.0, ge=0.0, le=1.0)
+    # Env var holding the shared secret for x-internal-trusted (HMAC-SHA256 of "<x-internal-timestamp>.<body>")
+    # on POST /v1/turns; freshly signed bodies from internal services skip request validation. Unset = disabled.
+    internal_hmac_secret_env_var: Optional[str] = None
 
     # Provider configurations (can be nested in TOML)
     providers: Dict[str, Union[OpenAIProviderConfig, AnthropicProviderConfig, GroqProviderConfig]] = Field(default_factory=dict)
@@ -255,6 +301,9 @@ class AppConfig(BaseSettings):
 
     # Internal queue settings (optional)
     event_queue_max_size: int = 1000
+    # Workers per event type (step / step result). 0 = derived from event_queue_max_size,
+    # one per 500 slots, clamped to [1, CPU count]
+    event_workers: int = Field(default=0, ge=0)
 
     # --- Model Validators ---
     @model_validator(mode='before')
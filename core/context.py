@@ -3,6 +3,7 @@
 from __future__ import annotations
 import logging
 import structlog  # Add structlog import
+import orjson
 from typing import List, Optional, Dict, Any
 
 # Local application imports
@@ -115,8 +116,7 @@ class ContextManager:
             retrieved_data = await self.memory_manager.read(key=turn_id)
             
             if retrieved_data and isinstance(retrieved_data.get("text"), str):
-                turn_json = retrieved_data["text"]
-                turn = Turn.model_validate_json(turn_json)
+                turn = self._load_turn(retrieved_data["text"])
                 log.info(f"Retrieved turn '{turn_id}' from memory.")
                 return turn
             else:
@@ -126,6 +126,33 @@ class ContextManager:
             log.error(f"Error retrieving turn '{turn_id}': {e}", exc_info=True)
             return None
 
+    async def get_turns(self, turn_ids: List[str]) -> Dict[str, Optional[Turn]]:
+        """Retrieves several turns with one batched memory read. Missing or invalid turns map to None."""
+        turns: Dict[str, Optional[Turn]] = dict.fromkeys(turn_ids)
+        if not turn_ids:
+            return turns
+        try:
+            retrieved = await self.memory_manager.read_many(turn_ids)
+        except Exception as e:
+            log.error(f"Error retrieving {len(turn_ids)} turns: {e}", exc_info=True)
+            return turns
+        for turn_id, retrieved_data in zip(turn_ids, retrieved):
+            if retrieved_data and isinstance(retrieved_data.get("text"), str):
+                try:
+                    turns[turn_id] = self._load_turn(retrieved_data["text"])
+                except Exception as e:
+                    log.error(f"Error parsing turn '{turn_id}': {e}", exc_info=True)
+        log.info(f"Retrieved {sum(turn is not None for turn in turns.values())} of {len(turn_ids)} turns from memory.")
+        return turns
+
+    @staticmethod
+    def _load_turn(turn_json: str) -> Turn:
+        """Validates a stored turn and keeps its JSON-mode dict for read-only serving."""
+        turn_data = orjson.loads(turn_json)
+        turn = Turn.model_validate(turn_data)
+        turn._stored_data = turn_data # Already JSON-mode: served as-is by GET /v1/turns
+        return turn
+
     async def execute_memory_op(self, operation: str, arguments: Dict[str, Any], turn_context: Turn) -> Any:
         """Executes a memory operation requested by a plan step.
 
@@ -108,9 +108,9 @@ class EventPublisherSubscriber:
             pass # For strict pub/sub, only deliver if subscribed
         else:
             logging.debug(f"Publishing event {envelope.event_id} (type: {event_type}) to {len(self._subscriptions[event_type])} subscribers.")
-            # Distribute to all subscribed queues
+            # Distribute to all subscribed queues (unbounded, so put_nowait never blocks or raises)
             for queue in self._subscriptions[event_type]:
-                await queue.put(envelope)
+                queue.put_nowait(envelope)
 
     def subscribe(self, event_type: str) -> asyncio.Queue:
         """Subscribes to an event type and returns a queue to receive events.
@@ -153,6 +153,17 @@ event_publisher = EventPublisherSubscriber()
 shutdown_event = asyncio.Event() 
 
 # --- Worker Functions (moved from server.py) --- #
+
+# Most events a worker takes from its queue per wakeup
+EVENT_BATCH_SIZE = 64
+
+async def _next_batch(queue: asyncio.Queue, timeout: float = 1.0) -> List[EventEnvelope]:
+    """Waits up to `timeout` for an event, then also takes whatever else is already queued (up to EVENT_BATCH_SIZE)."""
+    batch = [await asyncio.wait_for(queue.get(), timeout=timeout)]
+    while len(batch) < EVENT_BATCH_SIZE and not queue.empty():
+        batch.append(queue.get_nowait())
+    return batch
+
 async def step_event_worker(
     publisher: EventPublisherSubscriber, 
     processor: 'StepProcessor', # String hint for StepProcessor
@@ -163,16 +174,18 @@ async def step_event_worker(
     try:
         while not shutdown_event_flag.is_set():
             try:
-                event_envelope: EventEnvelope = await asyncio.wait_for(subscriber_queue.get(), timeout=1.0)
-                if isinstance(event_envelope.payload, StepEventPayload):
-                    log.info(f"StepEventWorker received step event for turn {event_envelope.payload.turn_id}, step {event_envelope.payload.step_id}")
-                    try:
-                        await processor.execute_step(event_envelope.payload)
-                    except Exception as e:
-                        log.error(f"Error processing step {event_envelope.payload.step_id} in StepEventWorker: {e}", exc_info=True)
-                else:
-                    log.warning(f"StepEventWorker received non-StepEventPayload on 'StepEvent' channel: {type(event_envelope.payload)}")
-                subscriber_queue.task_done()
+                batch = await _next_batch(subscriber_queue)
+                log.debug(f"StepEventWorker took {len(batch)} step events")
+                for event_envelope in batch:
+                    if isinstance(event_envelope.payload, StepEventPayload):
+                        log.info(f"StepEventWorker received step event for turn {event_envelope.payload.turn_id}, step {event_envelope.payload.step_id}")
+                        try:
+                            await processor.execute_step(event_envelope.payload)
+                        except Exception as e:
+                            log.error(f"Error processing step {event_envelope.payload.step_id} in StepEventWorker: {e}", exc_info=True)
+                    else:
+                        log.warning(f"StepEventWorker received non-StepEventPayload on 'StepEvent' channel: {type(event_envelope.payload)}")
+                    subscriber_queue.task_done()
             except asyncio.TimeoutError:
                 continue # Allow checking shutdown_event periodically
             except Exception as e:
@@ -192,16 +205,18 @@ async def step_result_event_worker(
     try:
         while not shutdown_event_flag.is_set():
             try:
-                event_envelope: EventEnvelope = await asyncio.wait_for(subscriber_queue.get(), timeout=1.0)
-                if isinstance(event_envelope.payload, StepResultEventPayload):
-                    log.info(f"StepResultEventWorker received step result event for turn {event_envelope.payload.turn_id}, step {event_envelope.payload.step_id}")
-                    try:
-                        await manager.handle_step_result_event(event_envelope)
-                    except Exception as e:
-                        log.error(f"Error processing step result for turn {event_envelope.payload.turn_id} in StepResultEventWorker: {e}", exc_info=True)
-                else:
-                    log.warning(f"StepResultEventWorker received non-StepResultEventPayload on 'StepResultEvent' channel: {type(event_envelope.payload)}")
-                subscriber_queue.task_done()
+                batch = await _next_batch(subscriber_queue)
+                log.debug(f"StepResultEventWorker took {len(batch)} step result events")
+                for event_envelope in batch:
+                    if isinstance(event_envelope.payload, StepResultEventPayload):
+                        log.info(f"StepResultEventWorker received step result event for turn {event_envelope.payload.turn_id}, step {event_envelope.payload.step_id}")
+                        try:
+                            await manager.handle_step_result_event(event_envelope)
+                        except Exception as e:
+                            log.error(f"Error processing step result for turn {event_envelope.payload.turn_id} in StepResultEventWorker: {e}", exc_info=True)
+                    else:
+                        log.warning(f"StepResultEventWorker received non-StepResultEventPayload on 'StepResultEvent' channel: {type(event_envelope.payload)}")
+                    subscriber_queue.task_done()
             except asyncio.TimeoutError:
                 continue # Allow checking shutdown_event periodically
             except Exception as e:
@@ -3,6 +3,27 @@ import sys
 import structlog
 import uuid
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+def _orjson_dumps(obj, default=None, **kwargs) -> str:
+    """JSONRenderer serializer backed by orjson (returns str, as ProcessorFormatter expects).
+
+    Like json.dumps in the stdlib renderer, it accepts dicts with non-str keys (ints, enums, ...),
+    and values neither orjson nor `default` can encode are logged as str() instead of raising.
+    """
+    def _default(value):
+        if default is not None:
+            try:
+                return default(value)
+            except TypeError:
+                pass
+        return str(value)
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode()
+
 def configure_logging(log_level: str = "INFO", force_json: bool = False):
     """
     Configures structlog and standard library logging.
@@ -29,7 +50,7 @@ def configure_logging(log_level: str = "INFO", force_json: bool = False):
     def add_trace_id(logger, method_name, event_dict):
         """Ensure all logs have a trace_id for correlation."""
         if "trace_id" not in event_dict:
-            event_dict["trace_id"] = str(uuid.uuid4())
+            event_dict["trace_id"] = uuid.uuid4().hex
         return event_dict
 
     # Add our custom processor to the shared processors
@@ -37,12 +58,13 @@ def configure_logging(log_level: str = "INFO", force_json: bool = False):
 
     is_tty = sys.stdout.isatty()
     if force_json or not is_tty:
-        final_processor = structlog.processors.JSONRenderer()
+        final_processor = structlog.processors.JSONRenderer(serializer=_orjson_dumps) if ORJSON_AVAILABLE else structlog.processors.JSONRenderer()
     else:
         final_processor = structlog.dev.ConsoleRenderer(colors=True)
 
     structlog.configure(
-        processors=shared_processors + [
+        # Drop events below the configured level before any processor (or formatting) runs
+        processors=[structlog.stdlib.filter_by_level] + shared_processors + [
             structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
         ],
         logger_factory=structlog.stdlib.LoggerFactory(),
@@ -1,7 +1,8 @@
 """Prometheus metrics for the KFM Framework."""
 
+import asyncio
 import time
-from typing import Dict, Optional, Any
+from typing import Callable, Dict, Optional, Any
 from prometheus_client import Counter, Histogram, Gauge
 import structlog
 
@@ -55,7 +56,8 @@ TURN_EXECUTION_TOTAL = Counter(
 # Current active turns gauge
 ACTIVE_TURNS = Gauge(
     'active_turns',
-    'Number of currently active turns'
+    'Number of currently active turns',
+    multiprocess_mode='livesum'  # Summed over live workers when PROMETHEUS_MULTIPROC_DIR is set
 )
 
 # Helper functions for tracking metrics
@@ -77,12 +79,12 @@ def record_llm_request(
     Args:
         provider: The LLM provider (e.g., 'openai', 'anthropic')
         model: The model used (e.g., 'gpt-4o', 'claude-3-opus')
-        start_time: Request start time (time.time())
-        end_time: Request end time (time.time())
+        start_time: Request start time (time.perf_counter() or time.time())
+        end_time: Request end time (same clock as start_time)
         input_tokens: Number of input/prompt tokens
         output_tokens: Number of output/completion tokens
         cost: Total cost in USD
-        status: Request status ('success' or 'error')
+        status: Request status ('success', 'error' or 'cancelled')
         error_type: Type of error if status is 'error'
     """
     duration = end_time - start_time
@@ -120,11 +122,11 @@ def record_embedding_request(
     Args:
         provider: The embedding provider (e.g., 'openai')
         model: The model used (e.g., 'text-embedding-ada-002')
-        start_time: Request start time (time.time())
-        end_time: Request end time (time.time())
+        start_time: Request start time (time.perf_counter() or time.time())
+        end_time: Request end time (same clock as start_time)
         input_tokens: Number of input tokens
         cost: Total cost in USD
-        status: Request status ('success' or 'error')
+        status: Request status ('success', 'error' or 'cancelled')
         error_type: Type of error if status is 'error'
     """
     duration = end_time - start_time
@@ -166,4 +168,51 @@ def record_turn_completed(status: str) -> None:
         status: Completion status ('SUCCEEDED' or 'FAILED')
     """
     ACTIVE_TURNS.dec()
-    TURN_EXECUTION_TOTAL.labels(status=status).inc() 
\ No newline at end of file
+    TURN_EXECUTION_TOTAL.labels(status=status).inc() 
+
+
+# Background recording: request paths enqueue samples and return immediately.
+_METRICS_QUEUE_MAXSIZE = 10000
+_metrics_queue: Optional[asyncio.Queue] = None
+_metrics_task: Optional[asyncio.Task] = None
+
+
+async def _drain_metrics(queue: asyncio.Queue) -> None:
+    """Consumes queued samples and records them."""
+    while True:
+        recorder, fields = await queue.get()
+        try:
+            recorder(**fields)
+        except Exception as e:
+            log.error(f"Failed to record metrics via {recorder.__name__}: {e}", exc_info=True)
+        finally:
+            queue.task_done()
+
+
+def enqueue_metric(recorder: Callable[..., None], **fields: Any) -> None:
+    """
+    Records a metric sample off the request path.
+
+    Queues `recorder(**fields)` (e.g. record_llm_request) for a background consumer started
+    on first use. Outside an event loop the sample is recorded inline. If the queue is full
+    the sample is dropped rather than delaying or failing the request.
+    """
+    global _metrics_queue, _metrics_task
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        recorder(**fields)
+        return
+    if _metrics_task is None or _metrics_task.done() or _metrics_task.get_loop() is not loop:
+        _metrics_queue = asyncio.Queue(maxsize=_METRICS_QUEUE_MAXSIZE)
+        _metrics_task = loop.create_task(_drain_metrics(_metrics_queue))
+    try:
+        _metrics_queue.put_nowait((recorder, fields))
+    except asyncio.QueueFull:
+        log.warning(f"Metrics queue full; dropping {recorder.__name__} sample.")
+
+
+async def flush_metrics() -> None:
+    """Waits until all queued metric samples have been recorded."""
+    if _metrics_queue is not None and _metrics_task is not None and not _metrics_task.done():
+        await _metrics_queue.join()
@@ -2,7 +2,7 @@
 
 from datetime import datetime
 from typing import Literal, Optional, Any, Dict, List
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 import time # For timestamps
 
 # --- Core Message Structure ---
@@ -31,6 +31,9 @@ class Turn(BaseModel):
     error: Optional[Dict[str, Any]] = Field(None, description="Error details if the turn failed")
     created_at: Optional[float] = Field(default_factory=time.time, description="Unix timestamp of turn creation")
     updated_at: Optional[float] = Field(default_factory=time.time, description="Unix timestamp of last turn update")
+    # JSON-mode dict this turn was loaded from (set by ContextManager.get_turn), so read-only
+    # callers can serve it without dumping the models again
+    _stored_data: Optional[Dict[str, Any]] = PrivateAttr(default=None)
 
 # --- Step Execution --- Data primarily for StepEvent payload ---
 
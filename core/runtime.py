@@ -8,7 +8,10 @@ from .errors import ProviderError, ConfigurationError, ToolNotFoundError, ToolEx
 import uuid # For generating IDs
 import time # For timestamps
 import json # For parsing LLM plan output
+from collections import ChainMap
+from types import MappingProxyType
 from core.metrics import record_step_execution, record_turn_started, record_turn_completed
+import fastjsonschema
 
 # Get structlog logger *after* potential configuration
 # Configuration should happen in server.py or main entry point
@@ -33,6 +36,70 @@ from providers.exceptions import ProviderError
 # Remove direct import causing circular dependency
 # from memory.manager import MemoryManager 
 
+# JSON schemas for the arguments of the built-in memory tools. Compiled once at import
+# so TOOL_CALL steps validate (and fill defaults) with a single generated function call.
+_TOOL_ARG_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "search_memory": {
+        "type": "object",
+        "properties": {
+            "query": {"type": "string", "minLength": 1},
+            "top_k": {"type": "integer", "default": 5},
+            "filters": {"type": ["object", "null"]},
+        },
+        "required": ["query"],
+    },
+    "retrieve_from_memory": {
+        "type": "object",
+        "properties": {"doc_id": {"type": "string", "minLength": 1}},
+        "required": ["doc_id"],
+    },
+    "add_to_memory": {
+        "type": "object",
+        "properties": {
+            "doc_id": {"type": "string", "minLength": 1},
+            "text": {"type": "string", "minLength": 1},
+            "metadata": {"type": "object", "default": {}},
+        },
+        "required": ["doc_id", "text"],
+    },
+    "delete_from_memory": {
+        "type": "object",
+        "properties": {"doc_id": {"type": "string", "minLength": 1}},
+        "required": ["doc_id"],
+    },
+}
+
+# Validators raise fastjsonschema.JsonSchemaException (a ValueError) and return the args with defaults filled in
+_TOOL_SCHEMAS = {name: fastjsonschema.compile(schema) for name, schema in _TOOL_ARG_SCHEMAS.items()}
+
+# Shared read-only mapping for absent step params/config/inputs, so steps don't allocate empty dicts
+_EMPTY_MAP = MappingProxyType({})
+
+# LLM parameters a step may override flat in its step_config
+_STEP_LLM_PARAM_KEYS = ("temperature", "max_tokens", "top_p", "frequency_penalty", "presence_penalty")
+
+def _build_llm_messages(step_inputs: Dict[str, Any], system_messages: tuple, step_id: str) -> List[Message]:
+    """Builds the provider message list for an llm_generate step from its inputs."""
+    final_messages: List[Message] = list(system_messages)
+
+    # Add user/assistant messages from inputs
+    if "messages" in step_inputs and isinstance(step_inputs["messages"], list):
+        for msg_data in step_inputs["messages"]:
+            if isinstance(msg_data, dict) and "role" in msg_data and "content" in msg_data:
+                final_messages.append(Message(role=msg_data["role"], content=msg_data["content"]))
+            else:
+                log.warning(f"Skipping malformed message data in 'messages' input for step {step_id}: {msg_data}")
+    elif "prompt" in step_inputs and isinstance(step_inputs["prompt"], str):
+        final_messages.append(Message(role="user", content=step_inputs["prompt"]))
+    else:
+        raise ValueError("llm_generate step requires 'messages' (list of dicts) or 'prompt' (string) in inputs.")
+
+    if not any(msg.role == "user" for msg in final_messages):
+        # Ideally the plan should ensure a user message; some models error without one.
+        log.warning(f"No user message in 'inputs' for llm_generate step {step_id}. Plan should include user input.")
+
+    return final_messages
+
 class TurnManager:
     """Manages the lifecycle of a single user interaction turn."""
     def __init__(self, 
@@ -59,9 +126,9 @@ class TurnManager:
         """Starts a new turn, generates a plan, and initiates step execution. Returns the turn_id."""
         
         # --- Generate IDs ---
-        turn_id = f"turn_{uuid.uuid4()}"
+        turn_id = f"turn_{uuid.uuid4().hex}"
         # Use provided trace_id or generate a new one
-        trace_id = trace_id or f"trace_{uuid.uuid4()}" 
+        trace_id = trace_id or f"trace_{uuid.uuid4().hex}" 
         log.info(f"Starting new turn: turn_id={turn_id}, trace_id={trace_id}, session_id={session_id}")
 
         # Record that a turn has started
@@ -150,7 +217,7 @@ class TurnManager:
                 **step_to_execute.model_dump()
             )
             step_event = EventEnvelope(
-                event_id=str(uuid.uuid4()),
+                event_id=uuid.uuid4().hex,
                 type="StepEvent",
                 spec_version="1.0.0",
                 trace_id=trace_id,
@@ -314,7 +381,7 @@ class TurnManager:
 
             # --- Publish Final Turn Event ---
             final_event = EventEnvelope(
-                event_id=str(uuid.uuid4()),
+                event_id=uuid.uuid4().hex,
                 type=final_event_type,
                 spec_version="1.0.0", # Use appropriate version
                 trace_id=trace_id,
@@ -534,8 +601,77 @@ class StepProcessor:
         self.event_publisher = event_publisher
         self.personality_manager = personality_manager
         self.memory_manager = memory_manager # Store memory manager if used
+        # Specialized step handlers keyed by (personality_id, step_type, provider_id).
+        # Each entry keeps the PersonalityConfig it was built from so reloaded packs rebuild it.
+        self._specialized: Dict[tuple, tuple] = {}
         log.info("StepProcessor initialized.")
 
+    def _get_llm_generate_handler(self, personality: PersonalityConfig, provider_id: str):
+        """Returns the cached llm_generate handler for this personality/provider, building it on first use."""
+        key = (personality.id, "llm_generate", provider_id)
+        cached = self._specialized.get(key)
+        if cached is not None and cached[0] is personality:
+            return cached[1]
+        handler = self._build_llm_generate_handler(personality, provider_id)
+        self._specialized[key] = (personality, handler)
+        return handler
+
+    def _build_llm_generate_handler(self, personality: PersonalityConfig, provider_id: str):
+        """Resolves provider, model and parameters once and bakes them into an llm_generate handler.
+
+        Resolution order is AppConfig provider defaults -> personality overrides -> step_config
+        overrides; only the step_config layer is evaluated per call.
+        """
+        # Start with AppConfig defaults for the chosen provider
+        provider_app_config = self.app_config.providers.get(provider_id)
+        if not provider_app_config or not provider_app_config.llm:
+            raise ConfigurationError(f"LLM configuration not found for provider '{provider_id}' in AppConfig.")
+
+        # Base model name from AppConfig, overridden by Personality's LLM config
+        baked_model_name = provider_app_config.llm.model
+        personality_parameters = _EMPTY_MAP
+        if personality.llm: # personality.llm should be an LLMConfig object
+            if personality.llm.model: # Personality can override model
+                baked_model_name = personality.llm.model
+            personality_parameters = personality.llm.parameters or _EMPTY_MAP
+        baked_parameters = MappingProxyType({**(provider_app_config.llm.parameters or _EMPTY_MAP), **personality_parameters})
+        baked_stream = personality.llm.stream if personality.llm else False
+        system_messages = (Message(role="system", content=personality.system_prompt),) if personality.system_prompt else ()
+
+        provider_factory = self.provider_factory
+        app_config = self.app_config
+
+        async def handler(step_inputs: Dict[str, Any], step_config: Dict[str, Any], step_id: str) -> Message:
+            final_messages = _build_llm_messages(step_inputs, system_messages, step_id)
+
+            # Override with Step-specific config (highest priority); step_config carries flat
+            # overrides for known LLM params, e.g. {"temperature": 0.9}
+            model_name = step_config.get("model_name", baked_model_name)
+            step_parameters = {key: step_config[key] for key in _STEP_LLM_PARAM_KEYS if key in step_config} if step_config else _EMPTY_MAP
+            model_parameters = ChainMap(step_parameters, baked_parameters) if step_parameters else baked_parameters
+            stream = step_config.get("stream", baked_stream) # Default to False
+
+            if not provider_id or not model_name:
+                raise ConfigurationError(f"Could not resolve provider_id ('{provider_id}') or model_name ('{model_name}') for llm_generate step.")
+
+            # The factory takes personality_config, which might influence how a provider is set up
+            provider = await provider_factory.get_provider(provider_id, app_config, personality)
+            if not provider:
+                raise ConfigurationError(f"Provider '{provider_id}' not found or failed to initialize for llm_generate step.")
+
+            log.info(f"Executing llm_generate step '{step_id}' using provider '{provider_id}', model '{model_name}'")
+
+            # Provider's generate method should return a Message object and handle its own metrics (tokens, cost)
+            # The `record_llm_request` should be called *inside* the provider.
+            return await provider.generate(
+                messages=final_messages,
+                model_name=model_name,
+                stream=stream,
+                **model_parameters
+            )
+
+        return handler
+
     async def handle_step_event(self, step_payload: StepEventPayload) -> None:
         """Handles a StepEvent by executing the specified tool or action."""
         turn_id = step_payload.turn_id
@@ -548,7 +684,7 @@ class StepProcessor:
         step_error_message: Optional[str] = None
         step_metrics: Optional[StepMetrics] = None
         status: Literal["SUCCEEDED", "FAILED", "RETRYING", "CANCELLED"] # Add type hint
-        start_time = time.time() # For latency calculation
+        start_ns = time.perf_counter_ns() # Monotonic, for latency calculation
 
         try:
             # Attempt to get the specific personality config
@@ -559,98 +695,20 @@ class StepProcessor:
 
             # --- Execute Step based on Type ---
             step_type = step_payload.step_type
-            step_params = step_payload.parameters or {} # Old: step_params, New: step_config from payload
-            step_config = step_payload.step_config or {} # Use step_config for provider/model overrides
-            step_inputs = step_payload.inputs or {}
+            step_params = step_payload.parameters or _EMPTY_MAP # Old: step_params, New: step_config from payload
+            step_config = step_payload.step_config or _EMPTY_MAP # Use step_config for provider/model overrides
+            step_inputs = step_payload.inputs or _EMPTY_MAP
 
             if step_type == "llm_generate": # Renamed from LLM_CALL
                 log.info(f"Executing llm_generate step '{step_id}' for turn '{turn_id}'")
 
-                # 1. Prepare messages for the provider
-                final_messages: List[Message] = []
-                
-                # Add system prompt from personality
-                if personality.system_prompt:
-                    final_messages.append(Message(role="system", content=personality.system_prompt))
-                
-                # Add user/assistant messages from inputs
-                if "messages" in step_inputs and isinstance(step_inputs["messages"], list):
-                    for msg_data in step_inputs["messages"]:
-                        if isinstance(msg_data, dict) and "role" in msg_data and "content" in msg_data:
-                            final_messages.append(Message(role=msg_data["role"], content=msg_data["content"]))
-                        else:
-                            log.warning(f"Skipping malformed message data in 'messages' input for step {step_id}: {msg_data}")
-                elif "prompt" in step_inputs and isinstance(step_inputs["prompt"], str):
-                    final_messages.append(Message(role="user", content=step_inputs["prompt"]))
-                else:
-                    raise ValueError("llm_generate step requires 'messages' (list of dicts) or 'prompt' (string) in inputs.")
-
-                if not any(msg.role == "user" for msg in final_messages):
-                    # Add a dummy user message if none, to prevent errors with some models,
-                    # though ideally the plan should ensure a user message.
-                    # Or raise ValueError if no user message explicitly provided.
-                    # For now, let's be a bit more robust, but this might need review.
-                    log.warning(f"No user message in 'inputs' for llm_generate step {step_id}. Plan should include user input.")
-                    # raise ValueError("llm_generate step requires at least one user message in 'inputs'.")
-
-
-                # 2. Determine provider, model, and parameters
-                # Provider ID
                 provider_id = step_config.get("provider_id", personality.provider_id) # personality.provider_id should exist
                 if not provider_id: # Fallback to app default if not in personality (should be rare)
                     provider_id = self.app_config.core_runtime.default_provider
-                
-                # Model Name & Parameters
-                # Start with AppConfig defaults for the chosen provider
-                provider_app_config = self.app_config.providers.get(provider_id)
-                if not provider_app_config or not provider_app_config.llm:
-                    raise ConfigurationError(f"LLM configuration not found for provider '{provider_id}' in AppConfig.")
-
-                # Base model name and parameters from AppConfig
-                model_name = provider_app_config.llm.model
-                model_parameters = provider_app_config.llm.parameters.copy() if provider_app_config.llm.parameters else {}
-
-                # Override with Personality's LLM config (if personality defines specific llm settings)
-                if personality.llm: # personality.llm should be an LLMConfig object
-                    if personality.llm.model: # Personality can override model
-                        model_name = personality.llm.model
-                    if personality.llm.parameters: # Personality can override/add params
-                        model_parameters.update(personality.llm.parameters)
-                
-                # Override with Step-specific config (highest priority)
-                if "model_name" in step_config:
-                    model_name = step_config["model_name"]
-                
-                # For model parameters in step_config, merge them in.
-                # Example: step_config might have {"temperature": 0.9, "max_tokens": 100}
-                # These should override anything from personality or app_config.
-                # We need a clear definition of what goes into step_config.model_parameters vs. flat in step_config
-                # For now, assume flat overrides in step_config for known LLM params
-                for param_key in ["temperature", "max_tokens", "top_p", "frequency_penalty", "presence_penalty"]: # Common params
-                    if param_key in step_config:
-                        model_parameters[param_key] = step_config[param_key]
-                
-                stream = step_config.get("stream", personality.llm.stream if personality.llm else False) # Default to False
-
-                if not provider_id or not model_name:
-                    raise ConfigurationError(f"Could not resolve provider_id ('{provider_id}') or model_name ('{model_name}') for llm_generate step.")
 
-                # 3. Get provider and generate
-                # The factory now takes personality_config, which might influence how a provider is set up
-                provider = await self.provider_factory.get_provider(provider_id, self.app_config, personality)
-                if not provider:
-                     raise ConfigurationError(f"Provider '{provider_id}' not found or failed to initialize for llm_generate step.")
-                
-                log.info(f"Executing llm_generate step '{step_id}' using provider '{provider_id}', model '{model_name}'")
-                
-                # Provider's generate method should return a Message object and handle its own metrics (tokens, cost)
-                # The `record_llm_request` should be called *inside* the provider.
-                response_message: Message = await provider.generate(
-                    messages=final_messages,
-                    model_name=model_name,
-                    stream=stream, 
-                    **model_parameters 
-                )
+                # Provider/personality resolution is baked into a handler cached per (personality, step_type, provider)
+                handler = self._get_llm_generate_handler(personality, provider_id)
+                response_message: Message = await handler(step_inputs, step_config, step_id)
                 
                 step_output_data = response_message.model_dump() # As per test assertion
                 status = "SUCCEEDED"
@@ -756,33 +814,28 @@ class StepProcessor:
 
                 log.info(f"Executing TOOL_CALL step '{step_id}' for turn '{turn_id}' with tool_name: '{tool_name}'")
 
+                # Validate built-in memory tool args against their precompiled schemas
+                validator = _TOOL_SCHEMAS.get(tool_name)
+                if validator:
+                    try:
+                        tool_args = validator(dict(tool_args)) # Defaults are filled into a copy, not the step's config
+                    except ValueError as e:
+                        raise ValueError(f"Invalid args for {tool_name} tool: {e}") from e
+
                 # Check for built-in memory tools first
                 if tool_name == "search_memory":
                     if not self.memory_manager:
                         raise RuntimeError("MemoryManager not available for search_memory tool.")
-                    # Validate specific args for search_memory
-                    query = tool_args.get("query")
-                    if not query or not isinstance(query, str):
-                        raise ValueError("Missing or invalid 'query' (string) for search_memory tool args.")
-                    top_k = tool_args.get("top_k", 5)
-                    if not isinstance(top_k, int):
-                        raise ValueError("Invalid 'top_k' (must be int) for search_memory tool args.")
-                    filters = tool_args.get("filters")
-                    if filters and not isinstance(filters, dict): # Allow filters to be None
-                        raise ValueError("Invalid 'filters' (must be dict) for search_memory tool args.")
-                    
-                    step_output_data = await self.memory_manager.search(query=query, top_k=top_k, filters=filters)
+                    step_output_data = await self.memory_manager.search(
+                        query=tool_args["query"], top_k=tool_args["top_k"], filters=tool_args.get("filters")
+                    )
                     status = "SUCCEEDED"
                     log.info(f"Memory tool 'search_memory' executed for step '{step_id}'.")
 
                 elif tool_name == "retrieve_from_memory":
                     if not self.memory_manager:
                         raise RuntimeError("MemoryManager not available for retrieve_from_memory tool.")
-                    doc_id = tool_args.get("doc_id")
-                    if not doc_id or not isinstance(doc_id, str):
-                        raise ValueError("Missing or invalid 'doc_id' (string) for retrieve_from_memory tool args.")
-
-                    retrieved_doc = await self.memory_manager.read(key=doc_id) # Assuming MemoryManager.read is the correct method
+                    retrieved_doc = await self.memory_manager.read(key=tool_args["doc_id"]) # Assuming MemoryManager.read is the correct method
                     step_output_data = retrieved_doc 
                     status = "SUCCEEDED"
                     log.info(f"Memory tool 'retrieve_from_memory' executed for step '{step_id}'.")
@@ -790,18 +843,9 @@ class StepProcessor:
                 elif tool_name == "add_to_memory":
                     if not self.memory_manager:
                         raise RuntimeError("MemoryManager not available for add_to_memory tool.")
-                    # Define expected args for add_to_memory from tool_args
-                    doc_id = tool_args.get("doc_id")
-                    text_content = tool_args.get("text") # Assuming 'text' holds the primary content
-                    metadata = tool_args.get("metadata", {}) # Optional metadata
-
-                    if not doc_id or not text_content:
-                        raise ValueError("Missing or invalid 'doc_id' or 'text' for add_to_memory tool args.")
-                    if not isinstance(metadata, dict):
-                        raise ValueError("Invalid 'metadata' (must be dict) for add_to_memory tool args.")
-
+                    doc_id = tool_args["doc_id"]
                     # Assuming MemoryManager.write takes key and a data dict
-                    await self.memory_manager.write(key=doc_id, data={"text": text_content, "metadata": metadata})
+                    await self.memory_manager.write(key=doc_id, data={"text": tool_args["text"], "metadata": tool_args["metadata"]})
                     step_output_data = {"status": "write successful", "doc_id": doc_id}
                     status = "SUCCEEDED"
                     log.info(f"Memory tool 'add_to_memory' executed for step '{step_id}'.")
@@ -809,10 +853,7 @@ class StepProcessor:
                 elif tool_name == "delete_from_memory":
                     if not self.memory_manager:
                         raise RuntimeError("MemoryManager not available for delete_from_memory tool.")
-                    doc_id = tool_args.get("doc_id")
-                    if not doc_id or not isinstance(doc_id, str):
-                        raise ValueError("Missing or invalid 'doc_id' (string) for delete_from_memory tool args.")
-
+                    doc_id = tool_args["doc_id"]
                     await self.memory_manager.delete(key=doc_id)
                     step_output_data = {"status": "delete successful", "doc_id": doc_id}
                     status = "SUCCEEDED"
@@ -888,7 +929,7 @@ class StepProcessor:
             step_error_message = str(e)
             status = "FAILED"
         
-        latency_ms = (time.time() - start_time) * 1000
+        latency_ms = (time.perf_counter_ns() - start_ns) / 1_000_000
         # If step_metrics wasn't populated by a provider/tool, create basic one
         if not step_metrics:
             step_metrics = StepMetrics(latency_ms=latency_ms)
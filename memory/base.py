@@ -25,7 +25,7 @@ class MemoryService(ABC):
     """Abstract base class for memory service implementations."""
 
     @abstractmethod
-    async def write(self, key: str, value: Any, metadata: Optional[Dict] = None, ttl: Optional[int] = None) -> None:
+    async def write(self, key: str, value: Any, metadata: Optional[Dict] = None, ttl: Optional[int] = None) -> bool:
         """
         Write data to the memory store.
 
@@ -34,6 +34,9 @@ class MemoryService(ABC):
             value: The data to store.
             metadata: Optional metadata associated with the data.
             ttl: Optional time-to-live in seconds for cache entries.
+
+        Returns:
+            True if the data was stored, False if the write failed.
         """
         pass
 
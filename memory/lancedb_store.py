@@ -1,19 +1,186 @@
 import asyncio
+import functools
+import hashlib
 import json
 import logging
-from typing import Any, List, Dict, Optional, Type
+import math
+import os
+import re
+import sys
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, List, Dict, Optional, Sequence, Type, Union
 
 import lancedb
+import numpy as np
 import pyarrow as pa
 from lancedb.pydantic import LanceModel, Vector
 from lancedb.embeddings import get_registry, EmbeddingFunctionRegistry, EmbeddingFunction
-from pydantic import Field, BaseModel
+from lancedb.index import BTree, HnswSq, IvfPq, IvfSq
+from pydantic import Field, BaseModel, create_model
 import structlog
 
 from .base import MemoryService
+from . import onnx_embeddings  # noqa: F401  (registers the "local-onnx" embedding function; its heavy deps load on first use)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    from lancedb.expr import Expr, col, lit
+    LANCEDB_EXPR_AVAILABLE = True
+except ImportError: # lancedb < 0.30 has no typed expressions; filters stay SQL strings
+    Expr = None
+    LANCEDB_EXPR_AVAILABLE = False
 
 log = structlog.get_logger(__name__)
 
+def _encode_metadata(metadata: Optional[Dict]) -> Optional[str]:
+    """Serializes metadata for the metadata column (orjson when available)."""
+    if not metadata:
+        return None
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(metadata).decode()
+    return json.dumps(metadata)
+
+_json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+def _encode_metadata_msgpack(metadata: Optional[Dict]) -> Optional[bytes]:
+    """Serializes metadata as msgpack bytes for a binary metadata column."""
+    if not metadata:
+        return None
+    return msgpack.packb(metadata, use_bin_type=True)
+
+_METADATA_FORMATS = {"json": (pa.string(), _encode_metadata), "msgpack": (pa.binary(), _encode_metadata_msgpack)}
+
+def _metadata_matches(metadata: Any, filters: Dict[str, Any]) -> bool:
+    """In-process equivalent of the json_extract equality filters, for binary metadata."""
+    if not isinstance(metadata, dict):
+        return False
+    return all(key in metadata and metadata[key] == value for key, value in filters.items())
+
+# Filesystems where io_uring reads give no benefit or are unsupported; these stay on buffered I/O
+_NO_URING_FS_TYPES = frozenset({"tmpfs", "ramfs", "nfs", "nfs4", "cifs", "smb3", "fuse", "overlay", "9p"})
+
+def _local_fs_type(path: str) -> Optional[str]:
+    """Returns the filesystem type of the mount holding `path` (Linux /proc/mounts), or None."""
+    path = os.path.realpath(path)
+    best_mount, best_type = "", None
+    try:
+        with open("/proc/mounts") as mounts:
+            for line in mounts:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                mount_point, fs_type = parts[1], parts[2]
+                if (path == mount_point or path.startswith(mount_point.rstrip("/") + "/")) and len(mount_point) > len(best_mount):
+                    best_mount, best_type = mount_point, fs_type
+    except OSError:
+        return None
+    return best_type
+
+def _uring_table_location(db_uri: str, table_name: str, use_io_uring: bool) -> Optional[str]:
+    """
+    Returns the table's location on Lance's io_uring object store ("file+uring://"), or None.
+
+    The location is passed to open_table() on a plain-path connection: LanceDB's connect()
+    treats a "file+uring://" database URI as a relative directory name, but Lance itself
+    resolves the scheme for a table location. Only the read-only handle uses it; writes go
+    through the regular table, since Lance commits through "file+uring://" without its safe
+    commit handler.
+    Only applies on Linux to local paths on block-device filesystems (ext4, xfs, ...);
+    remote URIs and tmpfs/NFS/overlay mounts keep the default buffered reader.
+    Note: io_uring reads bypass the page cache only when the kernel honours O_DIRECT, which
+    requires 512-byte aligned offsets/buffers; Lance handles alignment internally. Large read
+    buffers (>= 2MB) benefit from transparent huge pages (THP "madvise" or "always").
+    """
+    if not use_io_uring or sys.platform != "linux" or "://" in db_uri:
+        return None
+    path = os.path.abspath(db_uri)
+    fs_type = _local_fs_type(path)
+    if fs_type is None or fs_type in _NO_URING_FS_TYPES:
+        log.info(f"io_uring requested for '{db_uri}' but filesystem is '{fs_type}'; using buffered I/O.")
+        return None
+    return f"file+uring://{path}/{table_name}.lance"
+
+# Connections shared by stores opened on the same database URI, with the number of stores using each
+_conn_cache: Dict[str, "asyncio.Future[lancedb.AsyncConnection]"] = {}
+_conn_refcounts: Dict[str, int] = {}
+
+async def _acquire_connection(uri: str, key: Optional[str] = None, **connect_kwargs: Any) -> "lancedb.AsyncConnection":
+    """Returns the shared connection for `uri` (cached under `key`, default `uri`), connecting
+    (with `connect_kwargs`) on first use."""
+    key = key or uri
+    fut = _conn_cache.get(key)
+    if fut is None:
+        fut = asyncio.ensure_future(lancedb.connect_async(uri, **connect_kwargs))
+        _conn_cache[key] = fut
+    try:
+        conn = await fut
+    except Exception:
+        # Don't hand a failed connection attempt to later stores
+        if _conn_cache.get(key) is fut:
+            del _conn_cache[key]
+        raise
+    _conn_refcounts[key] = _conn_refcounts.get(key, 0) + 1
+    return conn
+
+def _release_connection(key: str) -> None:
+    """Drops one reference to the shared connection cached under `key`, closing it with the last one."""
+    remaining = _conn_refcounts.get(key, 0) - 1
+    if remaining > 0:
+        _conn_refcounts[key] = remaining
+        return
+    _conn_refcounts.pop(key, None)
+    fut = _conn_cache.pop(key, None)
+    if fut is not None and fut.done() and not fut.cancelled() and fut.exception() is None:
+        fut.result().close()
+
+# Columns materialized for read/search results; skips fetching the stored vectors
+_RESULT_COLUMNS = ["text", "metadata"]
+
+# Supported storage types for the vector column
+_VECTOR_DTYPES = {"float32": pa.float32(), "float16": pa.float16()}
+_NUMPY_VECTOR_DTYPES = {"float32": np.float32, "float16": np.float16}
+
+# Filter condition builders, dispatched on the exact type of the filter value
+def _str_condition(key: str, value: str) -> str:
+    escaped_value = value.replace("'", "''")
+    return f"json_extract(metadata, '$.{key}') = '{escaped_value}'"
+
+def _number_condition(key: str, value: Any) -> str:
+    return f"CAST(json_extract(metadata, '$.{key}') AS REAL) = {value}"
+
+def _bool_condition(key: str, value: bool) -> str:
+    return f"CAST(json_extract(metadata, '$.{key}') AS REAL) = {str(value).upper()}"
+
+_FILTER_CONDITION_BUILDERS = {str: _str_condition, int: _number_condition, float: _number_condition, bool: _bool_condition}
+
+# Metadata keys promoted to their own columns must be plain identifiers that don't shadow built-in columns
+_INDEXED_KEY_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_RESERVED_COLUMNS = frozenset({"vector", "text", "doc_id", "metadata", "_distance"})
+
+# Limit multiplier for searches with in-process filters: first fetch, and growth per retry
+_RESIDUAL_FILTER_OVERFETCH = 4
+
+# Upper bound on memoized filters per store
+_FILTER_CACHE_MAX_SIZE = 1024
+
+# Quantized vector index builders; SQ indexes store int8 scalar-quantized codes, PQ stores product-quantized codes
+_VECTOR_INDEX_CONFIGS = {"HNSW_SQ": HnswSq, "IVF_SQ": IvfSq, "IVF_PQ": IvfPq}
+
+# Metrics for vector indexes and searches; a search must use the metric its index was built with
+_DISTANCE_TYPES = ("cosine", "l2", "dot")
+
 # Define a base model for data records without vector field initially
 class BaseLanceRecord(BaseModel):
     text: str
@@ -27,8 +194,21 @@ class LanceDBVectorStore(MemoryService):
         self,
         db_uri: str,
         table_name: str,
-        embedding_function_name: str = "openai", # e.g., "openai", "sentence-transformers"
+        embedding_function_name: str = "openai", # e.g., "openai", "sentence-transformers", "local-onnx"
         embedding_model_name: Optional[str] = None, # e.g., "text-embedding-ada-002", "BAAI/bge-small-en-v1.5"
+        async_insert_wait_time: float = 0.0,
+        async_insert_max_rows: int = 256,
+        vector_dtype: str = "float32",
+        query_embedding_cache_size: int = 4096,
+        indexed_metadata_keys: Optional[List[str]] = None,
+        use_io_uring: bool = False,
+        metadata_format: str = "json",
+        vector_index_type: str = "IVF_PQ",
+        auto_index_min_rows: int = 0,
+        nprobes: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        refine_factor: Optional[int] = None,
+        distance_type: str = "cosine",
         # Add kwargs for embedding function config if needed (e.g., api_key_env_var for openai)
     ):
         """
@@ -39,16 +219,86 @@ class LanceDBVectorStore(MemoryService):
             table_name: Name of the table to use/create.
             embedding_function_name: Name of the embedding function in LanceDB registry.
             embedding_model_name: Specific model name for the embedding function.
+            async_insert_wait_time: Seconds a write waits for others to join its batch.
+                0 disables batching and each write is applied on its own.
+            async_insert_max_rows: Maximum number of records upserted in one batch.
+            vector_dtype: Storage type of the vector column ("float32" or "float16").
+            query_embedding_cache_size: Number of query embeddings kept in the LRU cache. 0 disables it.
+            indexed_metadata_keys: Metadata keys also stored as string columns with a BTree index,
+                so filters on them compare a column instead of parsing the metadata JSON per row.
+            use_io_uring: Serve reads and searches of a local (Linux, NVMe/SSD-backed) database from
+                a read-only table handle on Lance's io_uring object store. Writes keep the regular
+                handle. Ignored for remote URIs and tmpfs/NFS mounts.
+            metadata_format: Encoding of the metadata column: "json" (string) or "msgpack" (binary,
+                smaller and faster to decode). With msgpack, filters on non-indexed keys are applied
+                in-process to the search results instead of via json_extract.
+            vector_index_type: ANN index built automatically ("IVF_PQ", "IVF_SQ" or "HNSW_SQ").
+            auto_index_min_rows: Build the vector index in the background once the table holds this
+                many rows, and rebuild it whenever the row count doubles. 0 disables automatic indexing.
+            nprobes: IVF partitions probed per search (LanceDB default when None).
+            ef_search: HNSW candidate list size per search (LanceDB default when None).
+            refine_factor: Re-rank `top_k * refine_factor` candidates on full-precision vectors.
+            distance_type: Metric ("cosine", "l2" or "dot") of both the vector index and searches.
         """
         self.db_uri = db_uri
+        self.use_io_uring = use_io_uring
         self.table_name = table_name
         self.embedding_function_name = embedding_function_name
         self.embedding_model_name = embedding_model_name
+        if vector_dtype not in _VECTOR_DTYPES:
+            raise ValueError(f"Unsupported vector_dtype '{vector_dtype}'. Expected one of {list(_VECTOR_DTYPES)}.")
+        self.vector_dtype = vector_dtype
+        self.indexed_metadata_keys = tuple(indexed_metadata_keys or ())
+        for key in self.indexed_metadata_keys:
+            if not _INDEXED_KEY_PATTERN.match(key) or key in _RESERVED_COLUMNS:
+                raise ValueError(f"Invalid indexed metadata key '{key}'.")
+        if metadata_format not in _METADATA_FORMATS:
+            raise ValueError(f"Unsupported metadata_format '{metadata_format}'. Expected one of {list(_METADATA_FORMATS)}.")
+        if metadata_format == "msgpack" and not MSGPACK_AVAILABLE:
+            raise ValueError("metadata_format 'msgpack' requires the 'msgpack' package.")
+        self._set_metadata_format(metadata_format)
+        if vector_index_type not in _VECTOR_INDEX_CONFIGS:
+            raise ValueError(f"Unsupported vector index type '{vector_index_type}'. Expected one of {list(_VECTOR_INDEX_CONFIGS)}.")
+        self.vector_index_type = vector_index_type
+        if distance_type not in _DISTANCE_TYPES:
+            raise ValueError(f"Unsupported distance_type '{distance_type}'. Expected one of {list(_DISTANCE_TYPES)}.")
+        self.distance_type = distance_type
+        self.auto_index_min_rows = auto_index_min_rows
+        self.nprobes = nprobes
+        self.ef_search = ef_search
+        self.refine_factor = refine_factor
+        # Automatic indexing: rows written until the next row count check, and rows covered by the last build
+        self._rows_until_index_check = auto_index_min_rows
+        self._indexed_rows: Optional[int] = 0
+        self._index_task: Optional[asyncio.Task] = None
         self.db = None
+        self._connect_uri: Optional[str] = None # Key of the shared connection held by this store
         self.table = None
+        # Table handle for reads/searches: self.table, or a read-only handle opened through io_uring
+        self._read_table = None
+        self._read_connect_key: Optional[str] = None
         self.embedding_func = None
         self.schema = None # Schema will be created after embedding_func is initialized
+        self._vector_field: Optional[pa.Field] = None # Set with the schema
         self._initialized = False # Flag to track initialization
+        # Set once the table is ready; operations check it with a plain attribute read
+        self._init_done = asyncio.Event()
+        self._init_task: Optional[asyncio.Task] = None # Shared by concurrent first callers
+
+        # Write coalescing: writes are queued and upserted in batches by a background flusher
+        self.async_insert_wait_time = async_insert_wait_time
+        self.async_insert_max_rows = max(1, async_insert_max_rows)
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._flusher_task: Optional[asyncio.Task] = None
+
+        # LRU of query embeddings keyed by the SHA-256 digest of the query text
+        self._query_embedding_cache: "OrderedDict[bytes, List[float]]" = OrderedDict()
+        self._query_embedding_cache_size = query_embedding_cache_size
+
+        # Memoized filter strings keyed by the (key, type, value) items of the filter dict
+        self._filter_cache: Dict[frozenset, Any] = {}
+        # Column expressions per set of indexed filter keys, bound to values per call
+        self._filter_templates: Dict[tuple, tuple] = {}
 
         try:
             # Initialize embedding function synchronously if possible
@@ -78,6 +328,28 @@ class LanceDBVectorStore(MemoryService):
             self.embedding_func = None
             self.schema = None
 
+    def _set_metadata_format(self, metadata_format: str) -> None:
+        """Selects the metadata encoding and the matching Arrow schema of written records."""
+        self.metadata_format = metadata_format
+        metadata_type, self._encode_metadata = _METADATA_FORMATS[metadata_format]
+        # Arrow schema of written records; the vector column is filled in by LanceDB's embedding function
+        self._arrow_write_schema = pa.schema(
+            [pa.field("doc_id", pa.string()), pa.field("text", pa.string()), pa.field("metadata", metadata_type)]
+            + [pa.field(key, pa.string()) for key in self.indexed_metadata_keys]
+        )
+
+    async def _check_metadata_column(self) -> None:
+        """Falls back to JSON metadata for existing tables created with a string metadata column."""
+        try:
+            schema = await self.table.schema()
+            metadata_type = schema.field("metadata").type
+        except Exception as e:
+            log.warning(f"Could not inspect metadata column of '{self.table_name}': {e}")
+            return
+        if pa.types.is_string(metadata_type) or pa.types.is_large_string(metadata_type):
+            log.warning(f"Table '{self.table_name}' stores JSON metadata; keeping metadata_format 'json' for it.")
+            self._set_metadata_format("json")
+
     async def _initialize_table(self):
         """Asynchronously connect to DB and open or create the table."""
         if self._initialized:
@@ -89,8 +361,9 @@ class LanceDBVectorStore(MemoryService):
 
         try:
             log.info(f"Connecting to LanceDB at: {self.db_uri}")
-            # lancedb.connect returns an AsyncConnection
-            self.db = await lancedb.connect_async(self.db_uri)
+            # Stores on the same database share one AsyncConnection
+            self.db = await _acquire_connection(self.db_uri)
+            self._connect_uri = self.db_uri
             
             log.info(f"Checking for LanceDB table: {self.table_name}")
             table_names = await self.db.table_names()
@@ -99,6 +372,11 @@ class LanceDBVectorStore(MemoryService):
                 log.info(f"Opening existing LanceDB table: {self.table_name}")
                 self.table = await self.db.open_table(self.table_name)
                 # TODO: Potentially validate schema compatibility here?
+                # Existing tables may already be large or indexed; check on the first write
+                self._rows_until_index_check = 0
+                self._indexed_rows = None
+                if self.metadata_format == "msgpack":
+                    await self._check_metadata_column()
             else:
                 log.info(f"Creating new LanceDB table: {self.table_name} with schema: {self.schema.__name__}")
                 self.table = await self.db.create_table(
@@ -106,22 +384,50 @@ class LanceDBVectorStore(MemoryService):
                     schema=self.schema, 
                     mode="create"
                 )
+                await self._create_scalar_indexes()
+            self._read_table = await self._open_read_table()
             
             self._initialized = True
+            self._init_done.set()
             log.info(f"LanceDB table '{self.table_name}' initialized successfully.")
 
         except Exception as e:
             log.error(f"Failed to initialize LanceDB table '{self.table_name}'. Error: {e}", exc_info=True)
             self._initialized = False # Ensure flag is false on error
-            self.db = None
-            self.table = None
+            self._release_connections()
             # Optionally re-raise or handle differently
             raise RuntimeError(f"Failed to initialize LanceDB table '{self.table_name}'") from e
 
+    async def _open_read_table(self):
+        """Opens a read-only handle on the table through io_uring when enabled, else reuses self.table."""
+        location = _uring_table_location(self.db_uri, self.table_name, self.use_io_uring)
+        if location is None:
+            return self.table
+        # Checks for new versions on every read so writes made through self.table are visible
+        read_key = f"{self.db_uri}#consistent-reads"
+        read_db = await _acquire_connection(self.db_uri, key=read_key, read_consistency_interval=timedelta(0))
+        self._read_connect_key = read_key
+        log.info(f"Serving reads of LanceDB table '{self.table_name}' through io_uring ({location}).")
+        return await read_db.open_table(self.table_name, location=location)
+
+    def _release_connections(self) -> None:
+        """Drops this store's references to its shared connections and table handles."""
+        for key in (self._connect_uri, self._read_connect_key):
+            if key is not None:
+                _release_connection(key)
+        self._connect_uri = self._read_connect_key = None
+        self.db = None
+        self.table = self._read_table = None
+
     async def _ensure_initialized(self):
-        """Helper to ensure the table is initialized before operations."""
+        """Helper to ensure the table is initialized before operations.
+
+        Call sites guard it with `if not self._init_done.is_set()`, so the steady state costs no await.
+        """
         if not self._initialized:
-            await self._initialize_table()
+            if self._init_task is None or self._init_task.done():
+                self._init_task = asyncio.ensure_future(self._initialize_table())
+            await self._init_task
         if not self.table:
              # This should not happen if _initialize_table succeeded or raised
              raise RuntimeError("LanceDB table is not available after initialization attempt.")
@@ -134,41 +440,81 @@ class LanceDBVectorStore(MemoryService):
         # Capture embedding_func and dimension in local variables
         embedding_func = self.embedding_func 
         embedding_dim = embedding_func.ndims() 
+        value_type = _VECTOR_DTYPES[self.vector_dtype]
+        metadata_type = Optional[bytes] if self.metadata_format == "msgpack" else Optional[str]
+        self._vector_field = pa.field("vector", pa.list_(value_type, embedding_dim))
         # source_field_name = "text" # Not strictly needed if using SourceField()
 
         # Use a factory function to define the class dynamically
         class DynamicLanceSchema(LanceModel):
             # Use the local variables captured above, not self.
-            vector: Vector(embedding_dim) = embedding_func.VectorField() 
+            vector: Vector(embedding_dim, value_type=value_type) = embedding_func.VectorField() 
             text: str = embedding_func.SourceField()
             doc_id: str # Add doc_id separately as it's not part of embedding
-            metadata: Optional[str] = None
+            metadata: metadata_type = None
 
             # If LanceModel base class doesn't handle extra fields, use BaseModel
             # and potentially add vector later or use PyArrow schema.
             # For now, assume LanceModel works like this.
         
+        # Promoted metadata keys become nullable string columns
+        if self.indexed_metadata_keys:
+            DynamicLanceSchema = create_model(
+                "DynamicLanceSchema",
+                __base__=DynamicLanceSchema,
+                **{key: (Optional[str], None) for key in self.indexed_metadata_keys}
+            )
+
         # This dynamic creation might need refinement based on LanceModel internals
         # It might be better to construct a PyArrow schema manually here.
-        log.info(f"Created dynamic LanceDB schema with dim {embedding_dim} linked to func {self.embedding_function_name}")
+        log.info(f"Created dynamic LanceDB schema with dim {embedding_dim} ({self.vector_dtype}) linked to func {self.embedding_function_name}")
         return DynamicLanceSchema
 
+    async def _create_scalar_indexes(self) -> None:
+        """Creates BTree indexes on the promoted metadata columns."""
+        for key in self.indexed_metadata_keys:
+            try:
+                await self.table.create_index(key, config=BTree(), replace=True)
+            except Exception as e:
+                log.warning(f"Could not create BTree index on '{key}' for LanceDB table '{self.table_name}': {e}")
+
+    async def create_vector_index(self, index_type: str = "HNSW_SQ", **index_params) -> None:
+        """Builds a quantized ANN index on the vector column, using the store's distance_type (as searches do).
+
+        Args:
+            index_type: One of "HNSW_SQ", "IVF_SQ" (int8 scalar quantization) or "IVF_PQ".
+            **index_params: Passed to the LanceDB index config (e.g. num_partitions, num_sub_vectors).
+        """
+        if not self._init_done.is_set():
+            await self._ensure_initialized()
+        config_cls = _VECTOR_INDEX_CONFIGS.get(index_type)
+        if config_cls is None:
+            raise ValueError(f"Unsupported vector index type '{index_type}'. Expected one of {list(_VECTOR_INDEX_CONFIGS)}.")
+        await self.table.create_index("vector", config=config_cls(distance_type=self.distance_type, **index_params), replace=True)
+        log.info(f"Created {index_type} vector index on LanceDB table '{self.table_name}'.")
+
     # --- MemoryService Interface Implementation (Revised) ---
 
-    async def write(self, key: str, value: Any, metadata: Optional[Dict] = None, ttl: Optional[int] = None) -> None:
-        """Writes (upserts) data; LanceDB handles embedding via schema."""
-        await self._ensure_initialized()
+    async def write(self, key: str, value: Any, metadata: Optional[Dict] = None, ttl: Optional[int] = None) -> bool:
+        """Upserts a record keyed by doc_id in a single merge_insert transaction.
+
+        LanceDB computes the embedding for the text via the schema's embedding function.
+        Existing rows with the same doc_id are replaced atomically.
+        Returns True once the record is committed; failures are logged and return False.
+        """
+        if not self._init_done.is_set():
+            await self._ensure_initialized()
         if not self.table:
             log.error("LanceDB table not initialized, cannot write.")
-            return
+            return False
         if ttl:
             log.warning(f"LanceDBVectorStore does not support TTL for key '{key}'")
 
         if not isinstance(value, str):
             log.error(f"LanceDBVectorStore.write currently only supports string values for embedding. Received type {type(value)}.")
-            return
+            return False
         
-        metadata_str = json.dumps(metadata) if metadata else None
+        metadata_str = self._encode_metadata(metadata)
         # Prepare record matching schema fields *excluding* vector (it's auto-generated)
         # Ensure doc_id is included.
         data_record = {
@@ -176,46 +522,149 @@ class LanceDBVectorStore(MemoryService):
             "text": value, 
             "metadata": metadata_str
         }
+        # Promoted keys are copied into their columns; metadata keeps the full dict for reads
+        for indexed_key in self.indexed_metadata_keys:
+            indexed_value = metadata.get(indexed_key) if metadata else None
+            data_record[indexed_key] = None if indexed_value is None else str(indexed_value)
             
+        if self.async_insert_wait_time > 0:
+            try:
+                await self._enqueue_write(data_record)
+                log.debug(f"Successfully upserted doc_id '{key}' in a batched write.")
+            except Exception as e:
+                log.error(f"Failed during upsert operation for doc_id '{key}': {e}", exc_info=True)
+                return False
+            return True
+
         try:
-            # Upsert: Delete + Add
-            log.debug(f"Attempting delete for upsert: doc_id = '{key}'")
-            await self.delete(key) # Call delete helper which has its own logging
-            
-            # If delete succeeded, proceed to add
-            log.debug(f"Attempting add for upsert: doc_id = '{key}'")
-            await self.table.add([data_record]) # LanceDB computes embedding for 'text'
+            await self._upsert_records([data_record])
             log.debug(f"Successfully upserted doc_id '{key}' via LanceDB embedding function.")
-        
         except Exception as e:
-            # This will catch errors from either delete() or table.add()
-            # delete() already logs its specific errors, so we log a general upsert failure here.
             log.error(f"Failed during upsert operation for doc_id '{key}': {e}", exc_info=True)
-            # No need to log duplicate info if delete() failed and logged.
-            # The error 'e' will contain the specific exception (from delete or add).
+            return False
+        return True
+
+    async def _upsert_records(self, records: List[Dict[str, Any]]) -> None:
+        """Inserts or replaces records by doc_id as one Lance commit, passed to Lance as a single RecordBatch.
+
+        Embeddings for all records are computed here in one embedding call and included in the
+        batch, so LanceDB doesn't embed each record again.
+        """
+        columns = {name: [record[name] for record in records] for name in self._arrow_write_schema.names}
+        batch = pa.RecordBatch.from_pydict(columns, schema=self._arrow_write_schema)
+        vectors = await asyncio.to_thread(self.embedding_func.compute_source_embeddings, columns["text"])
+        batch = batch.append_column(self._vector_field, self._to_vector_array(vectors))
+        await self.table.merge_insert("doc_id").when_matched_update_all().when_not_matched_insert_all().execute(batch)
+        self._note_rows_written(len(records))
+
+    def _note_rows_written(self, num_rows: int) -> None:
+        """Schedules a background vector index check once enough rows were written since the last one."""
+        if not self.auto_index_min_rows:
+            return
+        self._rows_until_index_check -= num_rows
+        if self._rows_until_index_check <= 0 and (self._index_task is None or self._index_task.done()):
+            self._index_task = asyncio.create_task(self._maybe_build_vector_index())
+            self._index_task.add_done_callback(self._on_index_task_done)
+
+    async def _maybe_build_vector_index(self) -> None:
+        """Builds the vector index when the table reached the threshold or doubled since the last build."""
+        num_rows = await self.table.count_rows()
+        if self._indexed_rows is None: # Opened table: adopt an existing vector index instead of rebuilding it
+            indices = await self.table.list_indices()
+            self._indexed_rows = num_rows if any("vector" in index.columns for index in indices) else 0
+        target = max(self.auto_index_min_rows, 2 * self._indexed_rows)
+        if num_rows < target:
+            self._rows_until_index_check = target - num_rows
+            return
+        await self.create_vector_index(self.vector_index_type, **self._vector_index_params(num_rows))
+        self._indexed_rows = num_rows
+        self._rows_until_index_check = num_rows
+
+    def _vector_index_params(self, num_rows: int) -> Dict[str, int]:
+        """IVF partitions ~ sqrt(N); PQ sub-vectors ~ dim/16, adjusted to divide the dimension."""
+        params = {"num_partitions": max(1, int(math.sqrt(num_rows)))}
+        if self.vector_index_type == "IVF_PQ":
+            dim = self._vector_field.type.list_size
+            params["num_sub_vectors"] = next(n for n in range(max(1, dim // 16), 0, -1) if dim % n == 0)
+        return params
+
+    def _on_index_task_done(self, task: asyncio.Task) -> None:
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            self._rows_until_index_check = self.auto_index_min_rows # Retry after more writes
+            log.error(f"Failed to build vector index on LanceDB table '{self.table_name}': {error}", exc_info=error)
+
+    def _to_vector_array(self, vectors: List[List[float]]) -> pa.FixedSizeListArray:
+        """Packs embeddings into a fixed-size list array matching the vector column."""
+        flat = np.asarray(vectors, dtype=_NUMPY_VECTOR_DTYPES[self.vector_dtype]).reshape(-1)
+        return pa.FixedSizeListArray.from_arrays(pa.array(flat), self._vector_field.type.list_size)
+
+    async def _enqueue_write(self, record: Dict[str, Any]) -> None:
+        """Queues a record for the batch flusher and waits until its batch is committed."""
+        if self._flusher_task is None or self._flusher_task.done():
+            self._write_queue = asyncio.Queue()
+            self._flusher_task = asyncio.create_task(self._flush_writes())
+        future = asyncio.get_running_loop().create_future()
+        self._write_queue.put_nowait((record, future))
+        await future
+
+    async def _flush_writes(self) -> None:
+        """Background task draining the write queue into batched merge_insert upserts."""
+        loop = asyncio.get_running_loop()
+        queue = self._write_queue
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.async_insert_wait_time
+            while len(batch) < self.async_insert_max_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Last write wins for a doc_id repeated within the batch
+            records = list({record["doc_id"]: record for record, _ in batch}.values())
+            try:
+                await self._upsert_records(records)
+                log.debug(f"Upserted batch of {len(records)} record(s) into '{self.table_name}'.")
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+            finally:
+                for _ in batch:
+                    queue.task_done()
 
     async def read(self, key: str) -> Optional[Dict[str, Any]]:
         # Read implementation remains largely the same, fetches by doc_id
-        await self._ensure_initialized()
+        if not self._init_done.is_set():
+            await self._ensure_initialized()
         if not self.table:
             log.error("LanceDB table not initialized.")
             return None
         try:
-            results = await self.table.search().where(f"doc_id = '{key}'").limit(1).to_pandas_async()
-            if results.empty: return None
-            doc = results.iloc[0].to_dict()
-            output = {"text": doc.get("text"), "metadata": None}
-            if doc.get("metadata"):
-                try: output["metadata"] = json.loads(doc["metadata"])
-                except: output["metadata"] = doc["metadata"]
-            return output
+            results = await self._read_table.query().where(f"doc_id = '{key}'").select(_RESULT_COLUMNS).limit(1).to_arrow()
+            if results.num_rows == 0: return None
+            return {
+                "text": results.column("text")[0].as_py(),
+                "metadata": self._decode_metadata(results.column("metadata")[0].as_py())
+            }
         except Exception as e:
             log.error(f"Failed to read doc_id '{key}': {e}", exc_info=True)
             return None
 
     async def delete(self, key: str) -> None:
         # Delete implementation remains the same
-        await self._ensure_initialized()
+        if not self._init_done.is_set():
+            await self._ensure_initialized()
         if not self.table: return
         try:
             await self.table.delete(f"doc_id = '{key}'")
@@ -224,57 +673,214 @@ class LanceDBVectorStore(MemoryService):
             log.error(f"Failed to delete doc_id '{key}': {e}", exc_info=True)
             raise # Re-raise the exception after logging
 
-    async def search(self, query: str, top_k: int = 5, filters: Optional[Dict] = None) -> List[Dict]:
-        """Performs vector search; LanceDB handles query embedding via schema/function."""
-        await self._ensure_initialized()
+    async def embed_query(self, query: str) -> List[float]:
+        """Returns the query embedding, computing it with the store's embedding function on a cache miss."""
+        cache_key = hashlib.sha256(query.encode()).digest()
+        vector = self._query_embedding_cache.get(cache_key)
+        if vector is not None:
+            self._query_embedding_cache.move_to_end(cache_key)
+            return vector
+        embeddings = await asyncio.to_thread(self.embedding_func.compute_query_embeddings, query)
+        vector = embeddings[0]
+        self._cache_query_embedding(cache_key, vector)
+        return vector
+
+    def _compute_query_embeddings(self, queries: List[str]) -> List[List[float]]:
+        """Embeds queries as queries (not source documents), so models with distinct query
+        prompts/prefixes match embed_query() and the shared query embedding cache."""
+        return [self.embedding_func.compute_query_embeddings(query)[0] for query in queries]
+
+    def _cache_query_embedding(self, cache_key: bytes, vector: List[float]) -> None:
+        if not self._query_embedding_cache_size:
+            return
+        self._query_embedding_cache[cache_key] = vector
+        self._query_embedding_cache.move_to_end(cache_key)
+        if len(self._query_embedding_cache) > self._query_embedding_cache_size:
+            self._query_embedding_cache.popitem(last=False)
+
+    async def search(self, query: Union[str, Sequence[float]], top_k: int = 5, filters: Optional[Dict] = None, raise_errors: bool = False) -> List[Dict]:
+        """Performs vector search. String queries are embedded (via the query embedding cache), vectors are used as-is.
+
+        Failures are logged and return an empty list, or are re-raised with `raise_errors` so callers
+        can tell them from an empty result.
+        """
+        if not self._init_done.is_set():
+            await self._ensure_initialized()
         if not self.table:
             log.error("LanceDB table not initialized, cannot search.")
             return []
 
         try:
-            # LanceDB handles query embedding if table was created with embedding func
-            search_query = self.table.search(query) 
-
-            if filters:
-                filter_string = self._build_filter_string(filters)
-                if filter_string:
-                     # Still need filter string builder
-                    search_query = search_query.where(filter_string, prefilter=False)
-
-            results = await search_query.limit(top_k).to_pandas_async()
-
-            # Format results (remains same)
-            output_list = []
-            for doc in results.to_dict(orient='records'):
-                formatted_doc = {
-                    "text": doc.get("text"),
-                    "metadata": None,
-                    "score": doc.get("_distance")
-                }
-                if doc.get("metadata"):
-                    try: formatted_doc["metadata"] = json.loads(doc["metadata"])
-                    except: formatted_doc["metadata"] = doc["metadata"]
-                output_list.append(formatted_doc)
-            return output_list
+            # Hand LanceDB a precomputed vector so repeated queries skip the embedding model
+            query_vector = await self.embed_query(query) if isinstance(query, str) else query
+            predicate = self._get_filter(filters) if filters else None
+            return await self._search_vector(query_vector, top_k, filters, predicate)
 
         except Exception as e:
             log.error(f"Failed to execute search for query '{query}': {e}", exc_info=True)
+            if raise_errors:
+                raise
+            return []
+
+    async def search_batch(self, queries: List[str], top_k: int = 5, filters: Optional[Dict] = None) -> List[List[Dict]]:
+        """Searches for several queries at once, embedding them in a single embedding call.
+
+        Returns one result list per query, in the same order as `queries`.
+        """
+        if not self._init_done.is_set():
+            await self._ensure_initialized()
+        if not self.table:
+            log.error("LanceDB table not initialized, cannot search.")
+            return [[] for _ in queries]
+        if not queries:
             return []
 
+        try:
+            # One worker-thread hop embeds all uncached queries; the vector searches themselves are cheap
+            cache_keys = [hashlib.sha256(query.encode()).digest() for query in queries]
+            vectors = [self._query_embedding_cache.get(cache_key) for cache_key in cache_keys]
+            missing = [i for i, vector in enumerate(vectors) if vector is None]
+            if missing:
+                computed = await asyncio.to_thread(self._compute_query_embeddings, [queries[i] for i in missing])
+                for i, vector in zip(missing, computed):
+                    vectors[i] = vector
+                    self._cache_query_embedding(cache_keys[i], vector)
+            predicate = self._get_filter(filters) if filters else None
+            return list(await asyncio.gather(*(self._search_vector(vector, top_k, filters, predicate) for vector in vectors)))
+
+        except Exception as e:
+            log.error(f"Failed to execute batch search for {len(queries)} queries: {e}", exc_info=True)
+            return [[] for _ in queries]
+
+    async def _search_vector(self, vector: Sequence[float], top_k: int, filters: Optional[Dict], predicate: Any) -> List[Dict]:
+        """Runs one vector search for the `top_k` best rows matching `filters`.
+
+        Filters applied in-process (see _residual_filters) can discard fetched rows, so those
+        searches over-fetch and widen the limit until `top_k` rows match or the table is exhausted.
+        """
+        residual = bool(filters) and bool(self._residual_filters(filters))
+        limit = top_k * _RESIDUAL_FILTER_OVERFETCH if residual else top_k
+        while True:
+            search_query = self._vector_query(vector)
+            if predicate is not None:
+                search_query = search_query.where(predicate).postfilter()
+            results = await search_query.limit(limit).to_arrow()
+            formatted = self._format_search_results(results, filters)
+            if not residual or len(formatted) >= top_k or results.num_rows < limit:
+                return formatted[:top_k]
+            limit *= _RESIDUAL_FILTER_OVERFETCH
+
+    def _vector_query(self, vector: Sequence[float]):
+        """Starts a vector search projected to the result columns, with the index's metric and the configured ANN tuning."""
+        search_query = self._read_table.vector_search(vector).select(_RESULT_COLUMNS).distance_type(self.distance_type)
+        if self.nprobes is not None:
+            search_query = search_query.nprobes(self.nprobes)
+        if self.ef_search is not None:
+            search_query = search_query.ef(self.ef_search)
+        if self.refine_factor is not None:
+            search_query = search_query.refine_factor(self.refine_factor)
+        return search_query
+
+    def _format_search_results(self, results: pa.Table, filters: Optional[Dict] = None) -> List[Dict]:
+        """Converts an Arrow search result into the store's output dicts, column by column.
+
+        With binary metadata, filters on non-indexed keys are applied here.
+        """
+        num_rows = results.num_rows
+        if num_rows == 0:
+            return []
+        texts = results.column("text").to_pylist()
+        metadatas = results.column("metadata").to_pylist() if "metadata" in results.column_names else [None] * num_rows
+        scores = results.column("_distance").to_pylist() if "_distance" in results.column_names else [None] * num_rows
+        formatted = [
+            {"text": text, "metadata": self._decode_metadata(metadata), "score": score}
+            for text, metadata, score in zip(texts, metadatas, scores)
+        ]
+        residual_filters = self._residual_filters(filters) if filters else None
+        if residual_filters:
+            formatted = [result for result in formatted if _metadata_matches(result["metadata"], residual_filters)]
+        return formatted
+
+    def _residual_filters(self, filters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Filters that can't be pushed into LanceDB (non-indexed keys over binary metadata)."""
+        if self.metadata_format != "msgpack":
+            return None
+        return {key: value for key, value in filters.items() if key not in self.indexed_metadata_keys}
+
+    @staticmethod
+    def _decode_metadata(metadata: Union[str, bytes, None]) -> Any:
+        """Parses stored metadata (msgpack bytes or JSON), passing through values that can't be parsed."""
+        if not metadata:
+            return None
+        if isinstance(metadata, bytes) and MSGPACK_AVAILABLE:
+            try: return msgpack.unpackb(metadata, raw=False)
+            except Exception: pass # Rows written before the switch to msgpack hold JSON bytes
+        try: return _json_loads(metadata)
+        except: return metadata
+
+    def _get_filter(self, filters: Dict[str, Any]) -> Any:
+        """Returns the predicate for `filters`, reusing it when the same filter was seen before.
+
+        Filters on indexed metadata keys only become a typed LanceDB expression, which skips
+        SQL parsing per query; anything else is a SQL filter string.
+        """
+        try:
+            cache_key = frozenset((key, type(value).__name__, value) for key, value in filters.items())
+        except TypeError: # Unhashable filter value; build without caching
+            return self._build_filter(filters)
+        predicate = self._filter_cache.get(cache_key)
+        if predicate is None:
+            predicate = self._build_filter(filters)
+            if len(self._filter_cache) >= _FILTER_CACHE_MAX_SIZE:
+                self._filter_cache.clear()
+            self._filter_cache[cache_key] = predicate
+        return predicate
+
+    def _build_filter(self, filters: Dict[str, Any]) -> Any:
+        """Builds the predicate for `filters`; None when no condition applies."""
+        if LANCEDB_EXPR_AVAILABLE and all(key in self.indexed_metadata_keys for key in filters):
+            keys = tuple(sorted(filters))
+            columns = self._filter_templates.get(keys)
+            if columns is None:
+                columns = self._filter_templates[keys] = tuple(col(key) for key in keys)
+            # Promoted keys hold the value's string form in their own column
+            return functools.reduce(
+                lambda left, right: left & right,
+                (column == lit(str(filters[key])) for key, column in zip(keys, columns)),
+            )
+        return self._build_filter_string(filters) or None
+
     def _build_filter_string(self, filters: Dict[str, Any]) -> str:
-        # Filter string builder remains the same
         conditions = []
         for key, value in filters.items():
-            if isinstance(value, str):
-                escaped_value = value.replace("'", "''")
-                conditions.append(f"json_extract(metadata, '$.{key}') = '{escaped_value}'")
-            elif isinstance(value, (int, float, bool)):
-                sql_value = str(value).upper() if isinstance(value, bool) else str(value)
-                conditions.append(f"CAST(json_extract(metadata, '$.{key}') AS REAL) = {sql_value}")
-            else:
+            if key in self.indexed_metadata_keys:
+                # Promoted keys hold the value's string form in their own column
+                escaped_value = str(value).replace("'", "''")
+                conditions.append(f"{key} = '{escaped_value}'")
+                continue
+            if self.metadata_format == "msgpack":
+                continue # Binary metadata can't be queried with json_extract; see _residual_filters
+            builder = _FILTER_CONDITION_BUILDERS.get(type(value))
+            if builder is None:
                 log.warning(f"Unsupported filter type {type(value)} for key '{key}'. Skipping.")
+                continue
+            conditions.append(builder(key, value))
         return " AND ".join(conditions)
 
     async def close(self):
-        log.info("LanceDB connection close requested (currently no-op).")
-        pass 
\ No newline at end of file
+        if self._index_task is not None and not self._index_task.done():
+            self._index_task.cancel()
+        if self._flusher_task is not None:
+            # Let queued writes land before stopping the flusher
+            await self._write_queue.join()
+            self._flusher_task.cancel()
+            try:
+                await self._flusher_task
+            except asyncio.CancelledError:
+                pass
+            self._flusher_task = None
+        if self._connect_uri is not None:
+            self._release_connections()
+            self._initialized = False
+            self._init_done.clear()
+        log.info(f"LanceDB store '{self.table_name}' closed.") 
\ No newline at end of file
@@ -1,8 +1,16 @@
+import asyncio
+import copy
+import hashlib
+import json
+import time
 import structlog
-from typing import Any, List, Dict, Optional
+from collections import OrderedDict, defaultdict
+from typing import Any, List, Dict, Optional, Tuple
 from contextlib import asynccontextmanager
 
-from core.config import AppConfig
+import numpy as np
+
+from core.config import AppConfig, LanceDBConfig
 from .base import MemoryService
 from .redis_cache import RedisCacheService
 from .lancedb_store import LanceDBVectorStore
@@ -15,10 +23,33 @@ class MemoryManager(MemoryService):
     def __init__(
         self,
         cache_service: Optional[RedisCacheService] = None,
-        vector_stores: Optional[Dict[str, LanceDBVectorStore]] = None
+        vector_stores: Optional[Dict[str, LanceDBVectorStore]] = None,
+        search_cache_size: int = 256,
+        search_cache_similarity_threshold: Optional[float] = None,
+        search_cache_ttl_seconds: float = 5.0,
+        write_coalesce_size: int = 10000,
+        write_coalesce_ttl_seconds: float = 2.0
     ):
         self.cache_service = cache_service
         self._vector_stores = vector_stores if vector_stores else {}
+
+        # Search result cache: (store_id, query, top_k, filters) -> (store generation, monotonic expiry, unit query vector, results).
+        # Writes/deletes through this manager bump the store's generation; entries also expire after the TTL,
+        # which bounds how long writes by other workers or processes can go unseen.
+        self._search_cache: "OrderedDict[Tuple, Tuple[int, float, Optional[np.ndarray], List[Dict]]]" = OrderedDict()
+        self._search_cache_size = search_cache_size
+        self._search_cache_similarity_threshold = search_cache_similarity_threshold
+        self._search_cache_ttl = search_cache_ttl_seconds
+        self._store_generations: Dict[str, int] = defaultdict(int)
+
+        # Write coalescing: (store_id, key) -> (digest of the last written value, monotonic write time).
+        # Rewriting an identical value within the TTL skips both the vector store and the cache.
+        self._write_coalesce: "OrderedDict[Tuple[str, str], Tuple[bytes, float]]" = OrderedDict()
+        self._write_coalesce_size = write_coalesce_size
+        self._write_coalesce_ttl = write_coalesce_ttl_seconds
+
+        # Fire-and-forget cache writes (e.g. read-through caching); awaited on close()
+        self._bg_tasks: "set[asyncio.Task]" = set()
         self._log_status()
 
     def _log_status(self):
@@ -47,30 +78,70 @@ class MemoryManager(MemoryService):
                 return None # Treat as unavailable if init fails
         return store
 
-    async def write(self, key: str, value: Any, metadata: Optional[Dict] = None, ttl: Optional[int] = None, vector_store_id: str = 'default') -> None:
+    async def write(self, key: str, value: Any, metadata: Optional[Dict] = None, ttl: Optional[int] = None, vector_store_id: str = 'default') -> bool:
         """
         Writes to the specified vector store and then caches if cache is enabled.
         TTL is primarily for the cache.
         Value for vector store is assumed to be text for embedding.
+        Identical rewrites of a key within the coalescing TTL are skipped.
+        Returns True when every configured backend confirmed the write.
         """
+        coalesce_key = (vector_store_id, key)
+        digest = self._write_digest(value, metadata, ttl)
+        if digest is not None:
+            last = self._write_coalesce.get(coalesce_key)
+            if last is not None and last[0] == digest and time.monotonic() - last[1] < self._write_coalesce_ttl:
+                log.debug(f"MemoryManager: Skipped unchanged rewrite of key '{key}'.")
+                return True
+
         vector_store = await self.get_vector_store(vector_store_id)
+        succeeded = vector_store is not None or vector_store_id not in self._vector_stores # Configured but unavailable: not written
         if vector_store:
             try:
-                await vector_store.write(key, value, metadata) # Vector store handles embedding
-                log.debug(f"MemoryManager: Wrote key '{key}' to vector store '{vector_store_id}'.")
+                # Vector store handles embedding; it logs its own failures and reports them as False
+                if await vector_store.write(key, value, metadata):
+                    log.debug(f"MemoryManager: Wrote key '{key}' to vector store '{vector_store_id}'.")
+                else:
+                    succeeded = False
             except Exception as e:
+                succeeded = False
                 log.error(f"MemoryManager: Error writing key '{key}' to vector store '{vector_store_id}': {e}", exc_info=True)
                 # Optionally re-raise or handle so cache write isn't skipped if critical
+            finally:
+                self._store_generations[vector_store_id] += 1 # Invalidate cached searches on this store
 
         if self.cache_service:
             try:
                 # Cache the original value (text) and its metadata
                 cache_value = {"text": value, "metadata": metadata}
-                await self.cache_service.write(key, cache_value, ttl=ttl)
-                log.debug(f"MemoryManager: Wrote key '{key}' to cache.")
+                if await self.cache_service.write(key, cache_value, ttl=ttl):
+                    log.debug(f"MemoryManager: Wrote key '{key}' to cache.")
+                else:
+                    succeeded = False
             except Exception as e:
+                succeeded = False
                 log.error(f"MemoryManager: Error writing key '{key}' to cache: {e}", exc_info=True)
 
+        # Only fully applied writes may absorb later identical ones
+        if digest is not None and succeeded:
+            self._write_coalesce[coalesce_key] = (digest, time.monotonic())
+            self._write_coalesce.move_to_end(coalesce_key)
+            if len(self._write_coalesce) > self._write_coalesce_size:
+                self._write_coalesce.popitem(last=False)
+        else:
+            self._write_coalesce.pop(coalesce_key, None)
+        return succeeded
+
+    def _write_digest(self, value: Any, metadata: Optional[Dict], ttl: Optional[int]) -> Optional[bytes]:
+        """Digest identifying a write's content; None when coalescing is off or the value can't be hashed."""
+        if not self._write_coalesce_size or self._write_coalesce_ttl <= 0:
+            return None
+        try:
+            payload = json.dumps([value, metadata, ttl], sort_keys=True, separators=(",", ":"))
+        except (TypeError, ValueError):
+            return None
+        return hashlib.blake2b(payload.encode(), digest_size=16).digest()
+
     async def read(self, key: str, vector_store_id: str = 'default') -> Optional[Dict[str, Any]]: # Return type matches LanceDB read
         """
         Reads from cache first. If not found, reads from the specified vector store and caches the result.
@@ -91,16 +162,14 @@ class MemoryManager(MemoryService):
                 vector_store_data = await vector_store.read(key)
                 if vector_store_data:
                     log.debug(f"MemoryManager: Read key '{key}' from vector store '{vector_store_id}'.")
-                    # Cache this result if cache is enabled
+                    # Cache this result if cache is enabled, off the caller's critical path
                     if self.cache_service:
-                        try:
-                            # Cache expects value and metadata. VS returns a dict {"text": ..., "metadata": ...}
-                            # Use default TTL from cache service if available
-                            default_ttl = getattr(self.cache_service, 'default_ttl', None)
-                            await self.cache_service.write(key, vector_store_data, ttl=default_ttl)
-                            log.debug(f"MemoryManager: Cached key '{key}' from vector store read.")
-                        except Exception as e_cache_write:
-                            log.error(f"MemoryManager: Error caching key '{key}' after vector store read: {e_cache_write}", exc_info=True)
+                        # Cache expects value and metadata. VS returns a dict {"text": ..., "metadata": ...}
+                        # Use default TTL from cache service if available
+                        default_ttl = getattr(self.cache_service, 'default_ttl', None)
+                        task = asyncio.create_task(self.cache_service.write(key, vector_store_data, ttl=default_ttl))
+                        self._bg_tasks.add(task)
+                        task.add_done_callback(lambda t, key=key: self._on_cache_fill_done(t, key))
                     return vector_store_data
             except Exception as e:
                 log.error(f"MemoryManager: Error reading key '{key}' from vector store '{vector_store_id}': {e}", exc_info=True)
@@ -108,12 +177,75 @@ class MemoryManager(MemoryService):
         log.debug(f"MemoryManager: Key '{key}' not found in cache or vector store '{vector_store_id}'.")
         return None
 
+    async def read_many(self, keys: List[str], vector_store_id: str = 'default') -> List[Optional[Dict[str, Any]]]:
+        """
+        Reads several keys, in order, with one pipelined cache round trip.
+
+        Cache misses fall back to read() (vector store plus cache fill), concurrently.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(keys)
+        if self.cache_service and keys:
+            try:
+                cached = await self.cache_service.mread(keys)
+            except Exception as e:
+                log.error(f"MemoryManager: Error reading {len(keys)} keys from cache: {e}", exc_info=True)
+                cached = results
+            for i, data in enumerate(cached):
+                if isinstance(data, dict) and "text" in data:
+                    results[i] = data
+        misses = [i for i, data in enumerate(results) if data is None]
+        if misses:
+            fetched = await asyncio.gather(*(self.read(keys[i], vector_store_id) for i in misses))
+            for i, data in zip(misses, fetched):
+                results[i] = data
+        return results
+
+    def _on_cache_fill_done(self, task: asyncio.Task, key: str) -> None:
+        self._bg_tasks.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            log.error(f"MemoryManager: Error caching key '{key}' after vector store read: {error}", exc_info=error)
+        else:
+            log.debug(f"MemoryManager: Cached key '{key}' from vector store read.")
+
     async def search(self, query: str, top_k: int = 5, filters: Optional[Dict] = None, vector_store_id: str = 'default') -> List[Dict]:
-        """Performs search directly on the specified vector store. Cache is not used for search results."""
+        """Performs search on the specified vector store, serving repeated (or, if a similarity
+        threshold is configured, near-duplicate) queries from the in-process search cache."""
         vector_store = await self.get_vector_store(vector_store_id)
         if vector_store:
             try:
-                results = await vector_store.search(query, top_k, filters)
+                if not self._search_cache_size or self._search_cache_ttl <= 0:
+                    return await vector_store.search(query, top_k, filters)
+
+                cache_key = (vector_store_id, query, top_k, json.dumps(filters, sort_keys=True, default=str) if filters else None)
+                generation = self._store_generations[vector_store_id]
+                now = time.monotonic()
+                cached = self._search_cache.get(cache_key)
+                if cached is not None and cached[0] == generation and cached[1] > now:
+                    self._search_cache.move_to_end(cache_key)
+                    log.debug(f"MemoryManager: Search for '{query}' served from search cache.")
+                    return copy.deepcopy(cached[3]) # Callers may modify their results
+
+                query_vector = None
+                if self._search_cache_similarity_threshold is not None:
+                    query_vector = np.asarray(await vector_store.embed_query(query), dtype=np.float32)
+                    query_vector /= np.linalg.norm(query_vector) or 1.0
+                    similar = self._find_similar_search(cache_key, generation, now, query_vector)
+                    if similar is not None:
+                        log.debug(f"MemoryManager: Search for '{query}' served from search cache (similar query).")
+                        return copy.deepcopy(similar)
+                    # Search with the vector we already have so the store doesn't embed again
+                    results = await vector_store.search(query_vector.tolist(), top_k, filters, raise_errors=True)
+                else:
+                    # Failed searches raise instead of returning [], so they are never cached
+                    results = await vector_store.search(query, top_k, filters, raise_errors=True)
+
+                self._search_cache[cache_key] = (generation, time.monotonic() + self._search_cache_ttl, query_vector, copy.deepcopy(results))
+                self._search_cache.move_to_end(cache_key)
+                if len(self._search_cache) > self._search_cache_size:
+                    self._search_cache.popitem(last=False)
                 log.debug(f"MemoryManager: Search for '{query}' returned {len(results)} results from vector store '{vector_store_id}'.")
                 return results
             except Exception as e:
@@ -122,8 +254,41 @@ class MemoryManager(MemoryService):
         log.warning(f"MemoryManager: Vector store '{vector_store_id}' unavailable for search query '{query}'.")
         return []
 
+    def _find_similar_search(self, cache_key: Tuple, generation: int, now: float, query_vector: np.ndarray) -> Optional[List[Dict]]:
+        """Returns unexpired cached results of the most similar query with the same store/top_k/filters, if above threshold."""
+        store_id, _, top_k, filters_key = cache_key
+        candidates = [
+            (key, entry) for key, entry in self._search_cache.items()
+            if entry[0] == generation and entry[1] > now and entry[2] is not None
+            and key[0] == store_id and key[2] == top_k and key[3] == filters_key
+        ]
+        if not candidates:
+            return None
+        scores = np.stack([entry[2] for _, entry in candidates]) @ query_vector
+        best = int(np.argmax(scores))
+        if scores[best] < self._search_cache_similarity_threshold:
+            return None
+        best_key, best_entry = candidates[best]
+        self._search_cache.move_to_end(best_key)
+        return best_entry[3]
+
+    async def search_batch(self, queries: List[str], top_k: int = 5, filters: Optional[Dict] = None, vector_store_id: str = 'default') -> List[List[Dict]]:
+        """Performs several searches on the specified vector store with one batched embedding call."""
+        vector_store = await self.get_vector_store(vector_store_id)
+        if vector_store:
+            try:
+                results = await vector_store.search_batch(queries, top_k, filters)
+                log.debug(f"MemoryManager: Batch search for {len(queries)} queries completed on vector store '{vector_store_id}'.")
+                return results
+            except Exception as e:
+                log.error(f"MemoryManager: Error during batch search in vector store '{vector_store_id}': {e}", exc_info=True)
+
+        log.warning(f"MemoryManager: Vector store '{vector_store_id}' unavailable for batch search of {len(queries)} queries.")
+        return [[] for _ in queries]
+
     async def delete(self, key: str, vector_store_id: str = 'default') -> None:
         """Deletes from the specified vector store and the cache."""
+        self._write_coalesce.pop((vector_store_id, key), None)
         vector_store = await self.get_vector_store(vector_store_id)
         if vector_store:
             try:
@@ -131,6 +296,8 @@ class MemoryManager(MemoryService):
                 log.debug(f"MemoryManager: Deleted key '{key}' from vector store '{vector_store_id}'.")
             except Exception as e:
                 log.error(f"MemoryManager: Error deleting key '{key}' from vector store '{vector_store_id}': {e}", exc_info=True)
+            finally:
+                self._store_generations[vector_store_id] += 1 # Invalidate cached searches on this store
 
         if self.cache_service:
             try:
@@ -140,23 +307,63 @@ class MemoryManager(MemoryService):
                 log.error(f"MemoryManager: Error deleting key '{key}' from cache: {e}", exc_info=True)
 
     async def close(self) -> None:
-        """Closes underlying services if they have close methods."""
-        if self.cache_service and hasattr(self.cache_service, 'close') and callable(self.cache_service.close):
-            try: # Add try/except for robustness
-                await self.cache_service.close()
-            except Exception:
-                log.exception("Error closing cache service")
+        """Closes the cache service and all vector stores concurrently."""
+        if self._bg_tasks:
+            # Let in-flight cache fills finish before the cache connection goes away
+            await asyncio.gather(*self._bg_tasks, return_exceptions=True)
 
+        names = []
+        closers = []
+        if self.cache_service:
+            names.append("cache service")
+            closers.append(self._close_service(self.cache_service))
         for store_id, store in self._vector_stores.items():
-            if store and hasattr(store, 'close') and callable(store.close):
-                try:
-                    await store.close()
-                except Exception:
-                    log.exception(f"Error closing vector store '{store_id}'")
+            if store:
+                names.append(f"vector store '{store_id}'")
+                closers.append(self._close_service(store))
+        results = await asyncio.gather(*closers, return_exceptions=True)
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                log.error(f"Error closing {name}: {result}", exc_info=result)
         log.info("MemoryManager closed underlying services.")
 
+    @staticmethod
+    async def _close_service(service: MemoryService) -> None:
+        try:
+            await service.close()
+        except AttributeError: # Service without a close()
+            pass
+
 # --- Lifespan Manager ---
 
+async def _init_store(store_id: str, store_config: LanceDBConfig) -> Tuple[str, Optional[LanceDBVectorStore]]:
+    """Creates and initializes one vector store. Returns (store_id, None) if initialization fails."""
+    try:
+        store = LanceDBVectorStore(
+            db_uri=store_config.uri,
+            table_name=store_config.table_name,
+            embedding_function_name=store_config.embedding_function_name,
+            embedding_model_name=store_config.embedding_model_name,
+            async_insert_wait_time=store_config.async_insert_wait_time,
+            async_insert_max_rows=store_config.async_insert_max_rows,
+            vector_dtype=store_config.vector_dtype,
+            indexed_metadata_keys=store_config.indexed_metadata_keys,
+            use_io_uring=store_config.use_io_uring,
+            metadata_format=store_config.metadata_format,
+            vector_index_type=store_config.vector_index_type,
+            auto_index_min_rows=store_config.auto_index_min_rows,
+            nprobes=store_config.nprobes,
+            ef_search=store_config.ef_search,
+            refine_factor=store_config.refine_factor,
+            distance_type=store_config.distance_type
+        )
+        await store._initialize_table() # Await async initialization
+        log.info(f"LanceDB Vector Store '{store_id}' initialized: {store_config.uri}")
+        return store_id, store
+    except Exception as e:
+        log.error(f"Failed to initialize LanceDB Vector Store '{store_id}': {e}", exc_info=True)
+        return store_id, None
+
 @asynccontextmanager
 async def memory_lifespan(config: AppConfig):
     """
@@ -170,7 +377,18 @@ async def memory_lifespan(config: AppConfig):
     # Initialize Cache Service
     if config.memory.redis_enabled and config.redis:
         try:
-            cache_service = RedisCacheService(redis_url=config.redis.url, default_ttl=config.memory.cache_ttl_seconds)
+            cache_service = RedisCacheService(
+                redis_url=config.redis.url,
+                default_ttl=config.memory.cache_ttl_seconds,
+                serializer=config.redis.serializer,
+                write_behind=config.redis.write_behind,
+                write_behind_interval=config.redis.write_behind_interval,
+                write_behind_max_batch=config.redis.write_behind_max_batch,
+                pool_size=config.redis.pool_size,
+                pool_timeout=config.redis.pool_timeout,
+                local_cache_size=config.redis.local_cache_size,
+                local_cache_ttl=config.redis.local_cache_ttl_seconds
+            )
             log.info(f"Redis Cache Service initialized: {config.redis.url}")
         except Exception as e:
             log.error(f"Failed to initialize Redis Cache Service: {e}", exc_info=True)
@@ -178,44 +396,31 @@ async def memory_lifespan(config: AppConfig):
     else:
         log.info("Redis Cache Service is disabled in config.")
 
-    # Initialize Vector Store(s)
+    # Initialize Vector Store(s) concurrently; each store connects and opens its table independently
     if config.memory.vector_store_enabled and config.memory.lancedb:
         lancedb_configs = config.memory.lancedb
         if isinstance(lancedb_configs, dict): # Multiple stores configured
-            for store_id, store_config in lancedb_configs.items():
-                try:
-                    store = LanceDBVectorStore(
-                        db_uri=store_config.uri,
-                        table_name=store_config.table_name,
-                        embedding_function_name=store_config.embedding_function_name,
-                        embedding_model_name=store_config.embedding_model_name
-                    )
-                    await store._initialize_table() # Await async initialization
-                    vector_stores[store_id] = store
-                    log.info(f"LanceDB Vector Store '{store_id}' initialized: {store_config.uri}")
-                except Exception as e:
-                    log.error(f"Failed to initialize LanceDB Vector Store '{store_id}': {e}", exc_info=True)
+            store_configs = lancedb_configs
         elif isinstance(lancedb_configs, object) and hasattr(lancedb_configs, 'uri'): # Single store
-             store_id = 'default' # Or derive from config if needed
-             try:
-                 store = LanceDBVectorStore(
-                     db_uri=lancedb_configs.uri,
-                     table_name=lancedb_configs.table_name,
-                     embedding_function_name=lancedb_configs.embedding_function_name,
-                     embedding_model_name=lancedb_configs.embedding_model_name
-                 )
-                 await store._initialize_table()
-                 vector_stores[store_id] = store
-                 log.info(f"LanceDB Vector Store '{store_id}' initialized: {lancedb_configs.uri}")
-             except Exception as e:
-                 log.error(f"Failed to initialize LanceDB Vector Store '{store_id}': {e}", exc_info=True)
+            store_configs = {'default': lancedb_configs} # Or derive store id from config if needed
         else:
-             log.warning("LanceDB config found but format is unrecognized (expected dict or single object with uri).")
+            log.warning("LanceDB config found but format is unrecognized (expected dict or single object with uri).")
+            store_configs = {}
+        results = await asyncio.gather(*(_init_store(store_id, store_config) for store_id, store_config in store_configs.items()))
+        vector_stores = {store_id: store for store_id, store in results if store}
     else:
         log.info("LanceDB Vector Store is disabled or not configured.")
 
     # Create MemoryManager
-    memory_manager = MemoryManager(cache_service=cache_service, vector_stores=vector_stores)
+    memory_manager = MemoryManager(
+        cache_service=cache_service,
+        vector_stores=vector_stores,
+        search_cache_size=config.memory.search_cache_size,
+        search_cache_similarity_threshold=config.memory.search_cache_similarity_threshold,
+        search_cache_ttl_seconds=config.memory.search_cache_ttl_seconds,
+        write_coalesce_size=config.memory.write_coalesce_size,
+        write_coalesce_ttl_seconds=config.memory.write_coalesce_ttl_seconds
+    )
 
     # Yield control to the application, passing the manager via a placeholder object
     # The actual app object isn't available here, so the caller needs to attach.
@@ -0,0 +1,132 @@
+"""Local ONNX Runtime embedding function for LanceDB ("local-onnx").
+
+Runs a Hugging Face feature-extraction model through ONNX Runtime with
+dynamic INT8 quantization instead of the fp32 PyTorch model used by the
+"sentence-transformers" function. optimum, onnxruntime and transformers are
+only imported when the model is first loaded.
+"""
+
+import os
+import platform
+import tempfile
+from typing import List, Literal, Optional, Union
+
+import numpy as np
+import structlog
+from lancedb.embeddings import TextEmbeddingFunction, get_registry
+
+log = structlog.get_logger(__name__)
+
+QuantizationArch = Literal["avx2", "avx512", "avx512_vnni", "arm64"]
+
+
+def detect_quantization_arch() -> QuantizationArch:
+    """Picks the optimum quantization preset matching this CPU (avx2 when unsure)."""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = next((line.split(":", 1)[1].split() for line in f if line.startswith("flags")), [])
+    except OSError:
+        return "avx2"
+    if "avx512_vnni" in flags:
+        return "avx512_vnni"
+    if "avx512f" in flags:
+        return "avx512"
+    return "avx2"
+
+
+@get_registry().register("local-onnx")
+class LocalONNXEmbeddingFunction(TextEmbeddingFunction):
+    """Sentence embeddings from an INT8-quantized ONNX model on CPU.
+
+    The model is exported and quantized lazily on first use, then cached on
+    the instance. Embeddings are mean-pooled over the attention mask and
+    L2-normalized.
+    """
+
+    name: str = "sentence-transformers/all-MiniLM-L6-v2"
+    max_length: int = 512
+    batch_size: int = 64
+    quantize: bool = True
+    quantization_arch: Optional[QuantizationArch] = None # None detects it from the CPU
+    cache_dir: Optional[str] = None # Where the quantized model is kept; a temporary dir by default
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._ndims = None
+        self._model = None
+        self._tokenizer = None
+
+    def ndims(self) -> int:
+        if self._ndims is None:
+            self._ndims = len(self.generate_embeddings(["foo"])[0])
+        return self._ndims
+
+    def _load(self):
+        """Exports (and optionally quantizes) the model once per instance."""
+        if self._model is not None:
+            return
+        try:
+            import onnxruntime as ort
+            from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+            from optimum.onnxruntime.configuration import AutoQuantizationConfig
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError(
+                "The 'local-onnx' embedding function requires 'optimum[onnxruntime]' and 'transformers'."
+            ) from e
+
+        so = ort.SessionOptions()
+        so.intra_op_num_threads = max(1, (os.cpu_count() or 2) // 2)
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self._tokenizer = AutoTokenizer.from_pretrained(self.name)
+        model = ORTModelForFeatureExtraction.from_pretrained(self.name, export=True)
+
+        if self.quantize:
+            arch = self.quantization_arch or detect_quantization_arch()
+            qconfig = getattr(AutoQuantizationConfig, arch)(is_static=False, per_channel=False)
+            quantizer = ORTQuantizer.from_pretrained(model)
+            # The session holds the model in memory, so a temporary save dir can go once it is loaded
+            with tempfile.TemporaryDirectory(prefix="kfm-onnx-") as tmp_dir:
+                save_dir = self.cache_dir or tmp_dir
+                quantizer.quantize(save_dir=save_dir, quantization_config=qconfig)
+                model = ORTModelForFeatureExtraction.from_pretrained(
+                    save_dir,
+                    file_name="model_quantized.onnx",
+                    provider="CPUExecutionProvider",
+                    session_options=so,
+                )
+        else:
+            model = ORTModelForFeatureExtraction.from_pretrained(
+                self.name,
+                export=True,
+                provider="CPUExecutionProvider",
+                session_options=so,
+            )
+
+        self._model = model
+        log.info(f"Loaded ONNX embedding model '{self.name}' (int8={self.quantize}, arch={arch if self.quantize else None}, threads={so.intra_op_num_threads})")
+
+    def generate_embeddings(self, texts: Union[List[str], np.ndarray]) -> List[np.ndarray]:
+        """Embeds texts in batches with one ONNX session run per batch."""
+        self._load()
+        texts = list(texts)
+        embeddings: List[np.ndarray] = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            inputs = self._tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            hidden = self._model(**inputs).last_hidden_state
+            hidden = np.asarray(hidden, dtype=np.float32)
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.linalg.norm(pooled, axis=1, keepdims=True)
+            embeddings.extend(pooled)
+        return embeddings
@@ -1,6 +1,10 @@
+import asyncio
+import functools
 import json
 import logging
-from typing import Any, List, Dict, Optional
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 import redis.asyncio
 from redis.exceptions import RedisError
@@ -9,48 +13,139 @@ import structlog
 
 from .base import MemoryService
 
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 log = structlog.get_logger(__name__)
 
+# Cache value codecs: (serialize -> bytes, deserialize from bytes/str)
+def _to_builtin(obj: Any) -> Any:
+    """Encoder fallback for numpy scalars/arrays (e.g. embedding floats) in cached values."""
+    tolist = getattr(obj, "tolist", None)
+    if tolist is None:
+        raise TypeError(f"Type is not serializable: {type(obj).__name__}")
+    return tolist()
+
+def _json_dumps(value: Any) -> bytes:
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(value, default=_to_builtin, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, default=_to_builtin).encode()
+
+_json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
+def _msgpack_dumps(value: Any) -> bytes:
+    return msgpack.packb(value, use_bin_type=True, default=_to_builtin)
+
+def _msgpack_loads(raw: bytes) -> Any:
+    return msgpack.unpackb(raw, raw=False)
+
+_SERIALIZERS = {"msgpack": (_msgpack_dumps, _msgpack_loads), "json": (_json_dumps, _json_loads)}
+
+# Memoized serialization for scalar values that are written repeatedly (tokens, flags, ids).
+# typed=True keeps 1, 1.0 and True apart; containers are not cached since (1,) == (True,).
+_CACHEABLE_VALUE_TYPES = frozenset({str, int, float, bool})
+_CACHED_SERIALIZERS = {
+    name: functools.lru_cache(maxsize=1024, typed=True)(dumps) for name, (dumps, _) in _SERIALIZERS.items()
+}
+
+# Longest wait between retries of a write-behind batch that failed to send
+_WRITE_BEHIND_MAX_RETRY_DELAY = 1.0
+
 class RedisCacheService(MemoryService):
-    """A memory service implementation using Redis for caching key-value data."""
+    """A memory service implementation using Redis for caching key-value data.
 
-    def __init__(self, redis_url: str, default_ttl: Optional[int] = 3600):
+    The Redis client and its connection pool are created once per service and reused for
+    every command. Constructing a redis-py client is comparatively expensive (it copies the
+    response-callback table into a CaseInsensitiveDict), so don't create clients per call;
+    share the service instance owned by MemoryManager instead.
+    """
+
+    def __init__(
+        self,
+        redis_url: str,
+        default_ttl: Optional[int] = 3600,
+        serializer: str = "msgpack",
+        write_behind: bool = False,
+        write_behind_interval: float = 0.005,
+        write_behind_max_batch: int = 512,
+        pool_size: int = 50,
+        pool_timeout: Optional[float] = 5.0,
+        local_cache_size: int = 0,
+        local_cache_ttl: float = 1.0
+    ):
         """
         Initialize the Redis connection pool.
 
         Args:
             redis_url: The connection URL for the Redis instance.
             default_ttl: The default TTL for cached items.
+            serializer: Value encoding, "msgpack" (compact binary) or "json" (readable, for debugging).
+            write_behind: If True, write() buffers the value and returns immediately; a background
+                task flushes buffered writes in pipelined batches. Reads and deletes see buffered writes.
+                Batches that fail to send are requeued and retried with backoff, but buffered writes
+                not yet in Redis are lost if the process exits.
+            write_behind_interval: Seconds the flusher waits for more writes before sending a batch.
+            write_behind_max_batch: Buffered writes that trigger an immediate flush.
+            pool_size: Maximum number of pooled connections. Commands wait for a free
+                connection instead of opening new ones beyond this limit.
+            pool_timeout: Seconds to wait for a free connection before raising (None waits forever).
+            local_cache_size: Entries kept in an in-process LRU in front of Redis (0 disables it).
+                Hits skip the Redis round trip. Writes and deletes through this service update it;
+                changes made by other processes are seen once the local entry expires.
+            local_cache_ttl: Seconds a local entry stays valid (capped at the key's Redis TTL).
         """
         self.redis_url = redis_url
         self.default_ttl = default_ttl
+        if serializer not in _SERIALIZERS:
+            raise ValueError(f"Unsupported serializer '{serializer}'. Expected one of {list(_SERIALIZERS)}.")
+        if serializer == "msgpack" and not MSGPACK_AVAILABLE:
+            log.warning("msgpack is not installed; falling back to the JSON cache serializer.")
+            serializer = "json"
+        self.serializer = serializer
+        self._dumps, self._loads = _SERIALIZERS[serializer]
+        self._cached_dumps = _CACHED_SERIALIZERS[serializer]
+
+        # Write-behind buffer: key -> (serialized value, ttl). Latest write per key wins.
+        self.write_behind = write_behind
+        self.write_behind_interval = write_behind_interval
+        self.write_behind_max_batch = max(1, write_behind_max_batch)
+        self._pending: Dict[str, Tuple[bytes, Optional[int]]] = {}
+        self._inflight: Dict[str, Tuple[bytes, Optional[int]]] = {} # Batch currently being sent
+        self._pending_event = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flusher_task: Optional[asyncio.Task] = None
+
+        # Local LRU: key -> (monotonic expiry, serialized value)
+        self.local_cache_size = max(0, local_cache_size)
+        self.local_cache_ttl = local_cache_ttl
+        self._local: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
         try:
-            # Corrected initialization - use Redis.from_url not asyncio.from_url
-            self.redis_client = redis.asyncio.Redis.from_url(self.redis_url, decode_responses=True)
+            # Bounded pool: bursts queue for a connection instead of opening unbounded sockets.
+            # Values are binary (msgpack/orjson bytes), so responses are not decoded to str
+            self._pool = redis.asyncio.BlockingConnectionPool.from_url(
+                self.redis_url, max_connections=pool_size, timeout=pool_timeout
+            )
+            self.redis_client = redis.asyncio.Redis(connection_pool=self._pool)
+            # Bound command methods, resolved once instead of per call
+            self._set = self.redis_client.set
+            self._get = self.redis_client.get
+            self._delete = self.redis_client.delete
             log.info(f"RedisCacheService initialized for URL: {self.redis_url} with default TTL: {self.default_ttl}")
         except Exception as e:
             log.error(f"Failed to initialize Redis client: {e}", exc_info=True)
+            self._pool = None
             self.redis_client = None # Ensure it's None if init fails
 
-    async def _execute_redis_command(self, command_name: str, *args: Any, **kwargs: Any) -> Any:
-        """Helper to execute a Redis command with error handling."""
-        if not self.redis_client:
-            log.error("Redis client not available for command execution.")
-            return None # Or raise an exception
-        
-        try:
-            # Get the method from the client instance
-            method_to_call = getattr(self.redis_client, command_name)
-            # Await the command directly on the client
-            return await method_to_call(*args, **kwargs)
-        except RedisError as e:
-            log.error(f"Redis error on {command_name}({args}, {kwargs}): {e}", exc_info=True)
-            return None
-        except Exception as e:
-            log.error(f"Unexpected error on {command_name}({args}, {kwargs}): {e}", exc_info=True)
-            return None
-
-    async def write(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+    async def write(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
         """
         Write data to Redis cache with optional TTL.
         
@@ -58,50 +153,116 @@ class RedisCacheService(MemoryService):
             key: The key for the data.
             value: The value to store.
             ttl: Time-to-live in seconds. If None, uses the default TTL.
+
+        Returns:
+            True if the value was stored (or accepted into the write-behind buffer), False otherwise.
         """
         try:
-            # Always JSON serialize the value for consistent storage format
-            serialized_value = json.dumps(value)
-        except (TypeError, ValueError) as e:
+            if type(value) in _CACHEABLE_VALUE_TYPES:
+                serialized_value = self._cached_dumps(value)
+            else:
+                serialized_value = self._dumps(value)
+        except (TypeError, ValueError, OverflowError) as e:
             log.error(f"Failed to serialize value for key '{key}': {e}")
-            return
+            return False
             
         # Use provided TTL or fall back to default
         actual_ttl = ttl if ttl is not None else self.default_ttl
+        if self.local_cache_size:
+            self._local_put(key, serialized_value, actual_ttl)
+
+        if self.write_behind and self.redis_client:
+            self._pending[key] = (serialized_value, actual_ttl)
+            if self._flusher_task is None or self._flusher_task.done():
+                self._flusher_task = asyncio.create_task(self._flush_loop())
+            self._pending_event.set()
+            return True
         
-        # Always include the ex parameter with the TTL value
-        success = await self._execute_redis_command(
-            'set', key, serialized_value, ex=actual_ttl
-        )
-        
+        if not self.redis_client:
+            log.error("Redis client not available for write.")
+            return False
+        try:
+            # Always include the ex parameter with the TTL value
+            success = await self._set(key, serialized_value, ex=actual_ttl)
+        except RedisError as e:
+            log.error(f"Redis error on set('{key}'): {e}", exc_info=True)
+            success = None
+
         if success:
             log.debug(f"Successfully wrote key '{key}' to cache with TTL {actual_ttl}s")
-        else:
-            log.warning(f"Failed to write key '{key}' to cache")
+            return True
+        self._local.pop(key, None)
+        log.warning(f"Failed to write key '{key}' to cache")
+        return False
 
     async def read(self, key: str) -> Optional[Any]:
         """
-        Read data from Redis cache. Deserializes value from JSON.
+        Read data from Redis cache. Deserializes value with the configured serializer.
         """
-        serialized_value = await self._execute_redis_command('get', key)
+        if self._local:
+            local = self._local.get(key)
+            if local is not None:
+                if local[0] > time.monotonic():
+                    self._local.move_to_end(key)
+                    return self._deserialize(key, local[1])
+                del self._local[key]
+        buffered = self._pending.get(key) or self._inflight.get(key)
+        if buffered is not None:
+            return self._deserialize(key, buffered[0])
+        if not self.redis_client:
+            log.error("Redis client not available for read.")
+            return None
+        try:
+            serialized_value = await self._get(key)
+        except RedisError as e:
+            log.error(f"Redis error on get('{key}'): {e}", exc_info=True)
+            return None
         if serialized_value is None:
             log.debug(f"Key '{key}' not found in Redis cache.")
             return None
+        if self.local_cache_size:
+            self._local_put(key, serialized_value, None)
+        return self._deserialize(key, serialized_value)
+
+    def _local_put(self, key: str, serialized_value: bytes, ttl: Optional[int]) -> None:
+        """Stores a serialized value in the local LRU, expiring no later than its Redis TTL."""
+        local_ttl = self.local_cache_ttl if ttl is None else min(self.local_cache_ttl, ttl)
+        self._local[key] = (time.monotonic() + local_ttl, serialized_value)
+        self._local.move_to_end(key)
+        if len(self._local) > self.local_cache_size:
+            self._local.popitem(last=False)
 
+    def _deserialize(self, key: str, serialized_value: Any) -> Optional[Any]:
         try:
-            return json.loads(serialized_value)
-        except json.JSONDecodeError as e:
-            log.error(f"Failed to deserialize JSON from Redis for key '{key}': {e}", exc_info=True)
-            return None # Treat corrupted data as missing
+            return self._loads(serialized_value)
         except Exception as e:
-            log.error(f"Unexpected error deserializing data for key '{key}': {e}", exc_info=True)
-            return None
+            if self._loads is not _json_loads:
+                # Entries written before the switch to msgpack are JSON
+                try:
+                    return _json_loads(serialized_value)
+                except ValueError:
+                    pass
+            log.error(f"Failed to deserialize value from Redis for key '{key}': {e}", exc_info=True)
+            return None # Treat corrupted data as missing
 
     async def delete(self, key: str) -> None:
         """
         Delete data from Redis cache by key.
         """
-        deleted_count = await self._execute_redis_command('delete', key)
+        self._local.pop(key, None)
+        self._pending.pop(key, None)
+        if key in self._inflight:
+            # Let the in-flight SET land first so the delete isn't overtaken by it
+            async with self._flush_lock:
+                self._pending.pop(key, None) # A failed flush requeues its batch
+        if not self.redis_client:
+            log.error("Redis client not available for delete.")
+            return
+        try:
+            deleted_count = await self._delete(key)
+        except RedisError as e:
+            log.error(f"Redis error on delete('{key}'): {e}", exc_info=True)
+            return
         # In tests, deleted_count might be a mock, so handle both cases
         if deleted_count is not None:
             if isinstance(deleted_count, int) and deleted_count > 0:
@@ -109,6 +270,143 @@ class RedisCacheService(MemoryService):
             else:
                 log.debug(f"Key '{key}' was not found in cache")
 
+    async def _flush_loop(self) -> None:
+        """Background task sending buffered writes in pipelined batches, backing off while Redis fails."""
+        retry_delay = self.write_behind_interval
+        while True:
+            await self._pending_event.wait()
+            self._pending_event.clear()
+            if len(self._pending) < self.write_behind_max_batch:
+                await asyncio.sleep(self.write_behind_interval) # Let more writes join the batch
+            if await self.flush():
+                retry_delay = self.write_behind_interval
+                continue
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(2 * retry_delay, _WRITE_BEHIND_MAX_RETRY_DELAY)
+            self._pending_event.set()
+
+    async def flush(self) -> bool:
+        """Sends all buffered writes to Redis in one pipeline.
+
+        Returns False if the batch could not be sent; it is then requeued behind any newer
+        writes to the same keys, to be retried by the next flush.
+        """
+        async with self._flush_lock:
+            if not self._pending or not self.redis_client:
+                return True
+            self._inflight, self._pending = self._pending, {}
+            try:
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    for key, (serialized_value, ttl) in self._inflight.items():
+                        pipe.set(key, serialized_value, ex=ttl)
+                    await pipe.execute()
+                log.debug(f"Flushed {len(self._inflight)} buffered writes to cache")
+                return True
+            except RedisError as e:
+                log.error(f"Redis error flushing {len(self._inflight)} buffered writes; requeued for retry: {e}", exc_info=True)
+                for key, item in self._inflight.items():
+                    self._pending.setdefault(key, item)
+                return False
+            finally:
+                self._inflight = {}
+
+    async def _drop_buffered(self, keys: Iterable[str]) -> None:
+        """Discards buffered writes for `keys` and waits out an in-flight flush holding any of them,
+        so a later (or concurrent) flush can't overwrite the bulk operation that follows."""
+        keys = list(keys)
+        in_flight = False
+        for key in keys:
+            self._pending.pop(key, None)
+            in_flight = in_flight or key in self._inflight
+        if in_flight:
+            async with self._flush_lock:
+                for key in keys: # A failed flush requeues its batch
+                    self._pending.pop(key, None)
+
+    async def mwrite(self, items: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        """
+        Write several key/value pairs in one pipelined round trip.
+
+        Args:
+            items: Mapping of key to value.
+            ttl: Time-to-live in seconds applied to every key. If None, uses the default TTL.
+        """
+        if not items:
+            return
+        if not self.redis_client:
+            log.error("Redis client not available for mwrite.")
+            return
+        await self._drop_buffered(items)
+        actual_ttl = ttl if ttl is not None else self.default_ttl
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    try:
+                        serialized_value = self._dumps(value)
+                    except (TypeError, ValueError, OverflowError) as e:
+                        log.error(f"Failed to serialize value for key '{key}': {e}")
+                        continue
+                    pipe.set(key, serialized_value, ex=actual_ttl)
+                    if self.local_cache_size:
+                        self._local_put(key, serialized_value, actual_ttl)
+                await pipe.execute()
+            log.debug(f"Wrote {len(items)} keys to cache with TTL {actual_ttl}s")
+        except RedisError as e:
+            log.error(f"Redis error on mwrite of {len(items)} keys: {e}", exc_info=True)
+
+    async def mread(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        Read several keys in one pipelined round trip.
+
+        Returns the deserialized values in the order of `keys`, with None for missing keys.
+        """
+        if not keys:
+            return []
+        # Buffered (not yet flushed) writes are newer than what Redis holds
+        raw_values: List[Any] = [None] * len(keys)
+        remote = []
+        for i, key in enumerate(keys):
+            buffered = self._pending.get(key) or self._inflight.get(key)
+            if buffered is not None:
+                raw_values[i] = buffered[0]
+            else:
+                remote.append(i)
+        if remote:
+            if not self.redis_client:
+                log.error("Redis client not available for mread.")
+                return [None] * len(keys)
+            try:
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    for i in remote:
+                        pipe.get(keys[i])
+                    for i, raw in zip(remote, await pipe.execute()):
+                        raw_values[i] = raw
+            except RedisError as e:
+                log.error(f"Redis error on mread of {len(keys)} keys: {e}", exc_info=True)
+                return [None] * len(keys)
+        return [None if raw is None else self._deserialize(key, raw) for key, raw in zip(keys, raw_values)]
+
+    async def mdelete(self, keys: List[str]) -> None:
+        """
+        Delete several keys in one pipelined round trip.
+        """
+        if not keys:
+            return
+        for key in keys:
+            self._local.pop(key, None)
+        await self._drop_buffered(keys)
+        if not self.redis_client:
+            log.error("Redis client not available for mdelete.")
+            return
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.delete(key)
+                deleted_counts = await pipe.execute()
+            log.debug(f"Deleted {sum(deleted_counts)} of {len(keys)} keys from cache")
+        except RedisError as e:
+            log.error(f"Redis error on mdelete of {len(keys)} keys: {e}", exc_info=True)
+
     async def search(self, query: str, top_k: int = 5, filters: Optional[Dict] = None) -> List[Dict]:
         """
         Search functionality is not supported by the Redis cache.
@@ -119,12 +417,27 @@ class RedisCacheService(MemoryService):
 
     async def close(self) -> None:
         """
-        Close the Redis connection.
+        Close the Redis connection, flushing buffered writes first.
         """
+        if self._flusher_task is not None:
+            await self.flush() # Waits for an in-flight batch, then sends the rest
+            self._flusher_task.cancel()
+            try:
+                await self._flusher_task
+            except asyncio.CancelledError:
+                pass
+            self._flusher_task = None
+        if self._pending and not await self.flush():
+            log.error(f"Dropping {len(self._pending)} buffered cache writes that could not be sent before close.")
+            self._pending.clear()
+        log.debug(f"Serialization cache stats: {self._cached_dumps.cache_info()}")
+        self._local.clear()
         if self.redis_client:
             try:
                 # Ensure we await the close method
                 await self.redis_client.close()
+                # The client doesn't own an explicitly passed pool; release its connections here
+                await self._pool.disconnect()
                 log.debug("Redis connection closed.")
             except Exception as e:
                 log.error(f"Error closing Redis connection: {e}", exc_info=True)
@@ -2,6 +2,7 @@
 
 import logging
 import os
+import sys
 from typing import List, Dict, Any, Optional
 
 # Third-party imports
@@ -25,8 +26,9 @@ except ImportError:
 
 
 # Local application imports
-from .base import ProviderInterface, LLMResponse, EmbeddingResponse, ModerationResponse
+from .base import ProviderInterface, LLMResponse, EmbeddingResponse, ModerationResponse, build_cost_functions, build_cost_table
 from core.config import AnthropicProviderConfig # Import specific config model
+from .retry import PROVIDER_RETRY_WAIT
 from .exceptions import ProviderError, AuthenticationError, RateLimitError, CallError, ConfigurationError
 
 # For retry mechanism
@@ -36,6 +38,19 @@ import structlog
 
 log = structlog.get_logger(__name__)
 
+# Conversation roles accepted in the Anthropic messages list (interned once)
+_CHAT_ROLES = frozenset((sys.intern("user"), sys.intern("assistant")))
+
+# Shared retry policy for Anthropic API calls. AsyncRetrying keeps per-run state,
+# so each call iterates over a cheap .copy() of this template.
+_ANTHROPIC_RETRY = tenacity.AsyncRetrying(
+    wait=PROVIDER_RETRY_WAIT,
+    stop=tenacity.stop_after_attempt(5),
+    retry=tenacity.retry_if_exception_type((AnthropicAPIConnectionError, AnthropicRateLimitError)),
+    before_sleep=tenacity.before_sleep_log(log, logging.WARNING),
+    reraise=True
+)
+
 class AnthropicAdapter(ProviderInterface):
     """Adapter for interacting with Anthropic APIs."""
 
@@ -63,18 +78,17 @@ class AnthropicAdapter(ProviderInterface):
                 # timeout=config.timeout # Example if config added this
                 )
             self.config = config
+            # Resolve the client's async close method once (AsyncAnthropic exposes close(), older clients aclose())
+            self._client_close = getattr(self.client, 'aclose', None) or getattr(self.client, 'close', None)
+            # Per-token (prompt, completion, embedding) cost in USD, precomputed from the per-million pricing
+            self._cost_table = build_cost_table(config.model_pricing)
+            # Specialized per-model completion cost functions (hot path)
+            self._cost_fn = build_cost_functions(self._cost_table)
             log.info("Anthropic Async Client initialized successfully.")
         except Exception as e:
             log.exception("Failed to initialize Anthropic client.")
             raise ConfigurationError(f"Failed to initialize Anthropic client: {e}") from e
 
-    @tenacity.retry(
-        wait=tenacity.wait_exponential(multiplier=1, min=2, max=10),
-        stop=tenacity.stop_after_attempt(5),
-        retry=tenacity.retry_if_exception_type((AnthropicAPIConnectionError, AnthropicRateLimitError)),
-        before_sleep=tenacity.before_sleep_log(log, logging.WARNING),
-        reraise=True
-    )
     async def generate(self, prompt: str, model_config: Dict[str, Any], **kwargs) -> LLMResponse:
         """
         Generates text using Anthropic's messages endpoint.
@@ -96,30 +110,33 @@ class AnthropicAdapter(ProviderInterface):
         system_prompt = kwargs.get("system_prompt")
         history: List[Message] = kwargs.get("conversation_history", [])
 
-        # Construct messages list for Anthropic API
-        messages_api_format = []
-        for msg in history:
-            # Ensure role is valid for Anthropic
-            if msg.role in ["user", "assistant"]:
-                messages_api_format.append({"role": msg.role, "content": msg.content})
-            # Ignore system messages in history if system_prompt is provided separately
-            elif msg.role == "system" and not system_prompt:
-                system_prompt = msg.content # Use the first system message found if no explicit one
-        
+        # Use the first system message found in history if no explicit one was provided
+        if not system_prompt:
+            system_prompt = next((msg.content for msg in history if msg.role == "system" and msg.content), system_prompt)
+
+        # Construct messages list for Anthropic API (only user/assistant roles are valid)
+        messages_api_format = [
+            {"role": msg.role, "content": msg.content}
+            for msg in history
+            if msg.role in _CHAT_ROLES
+        ]
         # Add the current user prompt
         messages_api_format.append({"role": "user", "content": prompt})
 
-        log.debug(f"Calling Anthropic generate: model={model}, max_tokens={max_tokens}, temp={temperature}")
+        log.debug("Calling Anthropic generate", model=model, max_tokens=max_tokens, temperature=temperature)
 
         try:
-            response = await self.client.messages.create(
-                model=model,
-                max_tokens=max_tokens,
-                messages=messages_api_format, # type: ignore # Pydantic should map well
-                system=system_prompt, # Pass system prompt if available
-                temperature=temperature,
-                # Add other supported parameters from model_config if needed (e.g., top_p, top_k)
-            )
+            # Retry only the API call so connection/rate-limit errors reach the policy before being mapped below
+            async for attempt in _ANTHROPIC_RETRY.copy():
+                with attempt:
+                    response = await self.client.messages.create(
+                        model=model,
+                        max_tokens=max_tokens,
+                        messages=messages_api_format, # type: ignore # Pydantic should map well
+                        system=system_prompt, # Pass system prompt if available
+                        temperature=temperature,
+                        # Add other supported parameters from model_config if needed (e.g., top_p, top_k)
+                    )
 
             # Extract content (assuming first content block is text)
             # TODO: Handle multiple/different content block types if necessary
@@ -129,56 +146,49 @@ class AnthropicAdapter(ProviderInterface):
                 if hasattr(first_block, 'text'):
                     content = first_block.text
             
-            usage = response.usage
             cost = 0.0
-            input_tokens = usage.input_tokens if usage else 0
-            output_tokens = usage.output_tokens if usage else 0
-            total_tokens = input_tokens + output_tokens # Anthropic usage may not have total_tokens
-
-            if usage:
-                pricing_info = self.config.model_pricing.get(model)
-                if pricing_info:
-                    prompt_cost_usd = 0.0
-                    completion_cost_usd = 0.0
-                    if pricing_info.prompt_token_cost_usd_million is not None and input_tokens > 0:
-                        prompt_cost_usd = (input_tokens / 1_000_000) * pricing_info.prompt_token_cost_usd_million
-                    if pricing_info.completion_token_cost_usd_million is not None and output_tokens > 0:
-                        completion_cost_usd = (output_tokens / 1_000_000) * pricing_info.completion_token_cost_usd_million
-                    cost = prompt_cost_usd + completion_cost_usd
-                    log.debug(f"Calculated cost for Anthropic model {model}: ${cost:.6f} (Input: ${prompt_cost_usd:.6f}, Output: ${completion_cost_usd:.6f})")
+            if (usage := response.usage) is not None:
+                input_tokens, output_tokens = usage.input_tokens, usage.output_tokens
+                cost_fn = self._cost_fn.get(model)
+                if cost_fn is not None:
+                    cost = cost_fn(input_tokens, output_tokens)
+                    log.debug("Calculated cost for Anthropic model", model=model, cost_usd=cost)
                 else:
-                    log.warning(f"No pricing information found for Anthropic model '{model}' in AnthropicProviderConfig. Cost will be 0.")
+                    log.warning("No pricing information found for Anthropic model in AnthropicProviderConfig. Cost will be 0.", model=model)
+            else:
+                input_tokens = output_tokens = 0
 
-            return LLMResponse(
+            # Fields are already typed correctly here, so skip validation
+            return LLMResponse.model_construct(
                 text_content=content,
                 input_tokens=input_tokens,
                 output_tokens=output_tokens,
-                total_tokens=total_tokens,
                 cost=cost,
                 is_error=False,
-                raw_response=response.model_dump() # Include raw response if needed
+                raw_response=response # SDK object; dumped lazily via raw_response_dict()
             )
 
-        except AnthropicAuthenticationError as e:
-            log.error(f"Anthropic authentication error: {e}")
-            raise AuthenticationError(f"Anthropic Auth Error: {e.status_code} - {e.body}") from e
+        # Retryable (most common) errors first. AuthenticationError and RateLimitError
+        # subclass APIStatusError, so both must stay ahead of the generic status handler.
         except AnthropicRateLimitError as e:
-            log.warning(f"Anthropic rate limit exceeded: {e}")
-            # Let Tenacity handle retry, but if it fails eventually, raise RateLimitError
+            log.warning("Anthropic rate limit exceeded", error=str(e))
+            # Retries are exhausted at this point, raise RateLimitError
             raise RateLimitError(f"Anthropic Rate Limit Error: {e.status_code} - {e.body}") from e
-        # TODO: Map other Anthropic errors (BadRequestError, PermissionError etc.) to CallError
-        except AnthropicAPIStatusError as e:
-            log.error(f"Anthropic API status error: {e.status_code} - {e.message}")
-            # Map potentially recoverable or specific errors?
-            # For now, map non-auth/rate-limit status errors to CallError or ProviderError
-            if 400 <= e.status_code < 500:
-                raise CallError(f"Anthropic API Error (Client): {e.status_code} - {e.message}") from e
-            else: # Treat 5xx and others as general provider errors
-                raise ProviderError(f"Anthropic API Error (Server/Other): {e.status_code} - {e.message}") from e
         except AnthropicAPIConnectionError as e:
-            log.error(f"Anthropic connection error: {e}")
-            # Let Tenacity handle retry, but if it fails eventually, raise ProviderError
+            log.error("Anthropic connection error", error=str(e))
+            # Retries are exhausted at this point, raise ProviderError
             raise ProviderError(f"Anthropic Connection Error: {e}") from e
+        except AnthropicAuthenticationError as e:
+            log.error("Anthropic authentication error", error=str(e))
+            raise AuthenticationError(f"Anthropic Auth Error: {e.status_code} - {e.body}") from e
+        # TODO: Map other Anthropic errors (BadRequestError, PermissionError etc.) to CallError
+        except AnthropicAPIStatusError as e:
+            log.error("Anthropic API status error", status_code=e.status_code, error=e.message)
+            match e.status_code:
+                case code if 400 <= code < 500:
+                    raise CallError(f"Anthropic API Error (Client): {e.status_code} - {e.message}") from e
+                case _: # Treat 5xx and others as general provider errors
+                    raise ProviderError(f"Anthropic API Error (Server/Other): {e.status_code} - {e.message}") from e
         except Exception as e:
             # Catchall for unexpected errors from the SDK or logic
             log.exception("An unexpected error occurred during Anthropic generate call.")
@@ -196,12 +206,12 @@ class AnthropicAdapter(ProviderInterface):
 
     async def close(self) -> None:
         """Closes the underlying AsyncAnthropic client session."""
-        if hasattr(self.client, 'aclose') and callable(self.client.aclose):
-            try:
-                log.info("Closing Anthropic client...")
-                await self.client.aclose()
-                log.info("Anthropic client closed successfully.")
-            except Exception as e:
-                log.exception("Failed to close Anthropic client session.")
-        else:
-            log.warning("AsyncAnthropic client does not have an 'aclose' method. Skipping closure.")
\ No newline at end of file
+        if self._client_close is None:
+            log.warning("AsyncAnthropic client does not have a close method. Skipping closure.")
+            return
+        try:
+            log.info("Closing Anthropic client...")
+            await self._client_close()
+            log.info("Anthropic client closed successfully.")
+        except Exception as e:
+            log.exception("Failed to close Anthropic client session.")
\ No newline at end of file
@@ -1,32 +1,120 @@
 """Base classes and interfaces for provider adapters."""
 
 import abc
-from pydantic import BaseModel
+import asyncio
+from pydantic import BaseModel, ConfigDict, Field, computed_field
 from abc import ABC, abstractmethod
-from typing import AsyncIterable
+from typing import Any, AsyncIterable, Callable, Literal
+import numpy as np
 from core.schema import Step, Message
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Define ProviderInterface (ABC) and common response models (LLMResponse etc.) here
 
+# Response models are immutable value objects created once per provider call.
+# (Pydantic v2 BaseModel has no slots option; instances keep a __dict__.)
+_RESPONSE_MODEL_CONFIG = ConfigDict(extra='forbid', frozen=True)
+
+def build_cost_table(model_pricing: dict) -> dict[str, tuple[float, float, float]]:
+    """Precomputes per-token USD (prompt, completion, embedding) rates from per-million ModelPricing."""
+    return {
+        model: (
+            (pricing.prompt_token_cost_usd_million or 0.0) * 1e-6,
+            (pricing.completion_token_cost_usd_million or 0.0) * 1e-6,
+            (pricing.embedding_token_cost_usd_million or 0.0) * 1e-6,
+        )
+        for model, pricing in model_pricing.items()
+    }
+
+def _specialize_cost_fn(prompt_rate: float, completion_rate: float) -> Callable[[int, int], float]:
+    """Returns a straight-line cost function for one model, with zero-priced terms dropped."""
+    if prompt_rate and completion_rate:
+        return lambda prompt_tokens, completion_tokens: prompt_tokens * prompt_rate + completion_tokens * completion_rate
+    if prompt_rate:
+        return lambda prompt_tokens, completion_tokens: prompt_tokens * prompt_rate
+    if completion_rate:
+        return lambda prompt_tokens, completion_tokens: completion_tokens * completion_rate
+    return _zero_cost
+
+def _zero_cost(prompt_tokens: int, completion_tokens: int) -> float:
+    return 0.0
+
+def build_cost_functions(cost_table: dict[str, tuple[float, float, float]]) -> dict[str, Callable[[int, int], float]]:
+    """Builds a specialized (prompt_tokens, completion_tokens) -> USD function per model from build_cost_table()."""
+    return {model: _specialize_cost_fn(prompt_rate, completion_rate) for model, (prompt_rate, completion_rate, _) in cost_table.items()}
+
+EmbeddingDType = Literal["float32", "float16", "int8"]
+
+def quantize_embeddings(embeddings: list[list[float]], dtype: EmbeddingDType) -> tuple[Any, np.ndarray | None]:
+    """
+    Packs embeddings into one contiguous array of `dtype`; returns (embeddings, scales).
+
+    "float32" returns the lists unchanged. "int8" quantizes each row symmetrically,
+    row ≈ q * scale, with the per-row scales returned as a (n, 1) float32 array.
+    """
+    if dtype == "float32":
+        return embeddings, None
+    arr = np.asarray(embeddings, dtype=np.float32)
+    if dtype == "float16":
+        return arr.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(arr).max(axis=1, keepdims=True) / 127
+        scales[scales == 0] = 1.0 # All-zero rows
+        return np.round(arr / scales).astype(np.int8), scales
+    raise ValueError(f"Unsupported embedding dtype '{dtype}'")
+
 class LLMResponse(BaseModel):
+    model_config = _RESPONSE_MODEL_CONFIG
+
     text_content: str | None = None
     input_tokens: int | None = None
     output_tokens: int | None = None
-    total_tokens: int | None = None
     cost: float | None = None
     is_error: bool = False
     error_details: dict | None = None
+    # Provider SDK response object, kept as-is; call raw_response_dict() only if a dict is needed
+    raw_response: Any = Field(default=None, exclude=True, repr=False)
     # ... other common fields
 
+    @computed_field
+    @property
+    def total_tokens(self) -> int | None:
+        """Prompt plus completion tokens, derived instead of stored."""
+        if self.input_tokens is None and self.output_tokens is None:
+            return None
+        return (self.input_tokens or 0) + (self.output_tokens or 0)
+
+    def raw_response_dict(self) -> dict | None:
+        """Dumps the provider's raw response on demand (skips None fields)."""
+        if self.raw_response is None or isinstance(self.raw_response, dict):
+            return self.raw_response
+        if ORJSON_AVAILABLE:
+            # pydantic-core JSON encoding + orjson parsing beats the Python dict walker of model_dump()
+            return orjson.loads(self.raw_response.model_dump_json(exclude_none=True, warnings=False))
+        return self.raw_response.model_dump(mode="json", exclude_none=True, warnings=False)
+
 class EmbeddingResponse(BaseModel): # Added for clarity
-    embeddings: list[list[float]]
+    model_config = ConfigDict(**_RESPONSE_MODEL_CONFIG, arbitrary_types_allowed=True)
+
+    embeddings: list[list[float]] | np.ndarray # ndarray when a float16/int8 return_dtype was requested
+    dtype: EmbeddingDType = "float32"
+    scales: np.ndarray | None = Field(default=None, repr=False) # Per-row int8 dequantization scales
     input_tokens: int | None = None
     total_tokens: int | None = None
     cost: float | None = None
+    cache_hits: int = 0 # Chunks served from the adapter's embedding cache
+    cache_misses: int = 0 # Chunks sent to the provider API
     is_error: bool = False
     error_details: dict | None = None
 
 class ModerationResponse(BaseModel): # Added for clarity
+    model_config = _RESPONSE_MODEL_CONFIG
+
     is_flagged: bool
     categories: dict[str, bool] | None = None
     scores: dict[str, float] | None = None
@@ -47,6 +135,22 @@ class ProviderInterface(abc.ABC):
     async def moderate(self, text: str, model_config: dict, **kwargs) -> ModerationResponse:
         pass
 
+    async def warmup(self) -> None:
+        """Opens the adapter's connection ahead of the first request. Optional; no-op by default."""
+
+    async def close(self) -> None:
+        """Releases the adapter's client/connections. Adapters holding a client override this."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+async def close_all(*adapters: ProviderInterface) -> list:
+    """Closes adapters concurrently; returns each close() result or the exception it raised."""
+    return await asyncio.gather(*(adapter.close() for adapter in adapters), return_exceptions=True)
+
 class Provider(ABC):
     @abstractmethod
     async def generate(self, step: Step) -> AsyncIterable[Message]: ...
\ No newline at end of file
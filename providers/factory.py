@@ -1,19 +1,26 @@
 """Provider factory for instantiating adapters."""
 
+import asyncio
 import logging
-from typing import Dict, Optional, Type
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple, Type
 
 # Local application imports
-from core.config import AppConfig, OpenAIProviderConfig, AnthropicProviderConfig, GroqProviderConfig # Import the main config model and provider configs
+from core.config import AppConfig # Import the main config model
 from providers.base import ProviderInterface       # Import the base interface
 from providers.openai import OpenAIAdapter         # Import the specific adapter
 # Import other adapters as they are created, e.g.:
 from .anthropic import AnthropicAdapter
 from .groq import GroqAdapter
 from providers.exceptions import ProviderError, ConfigurationError
+from providers.transport import create_http_client
+
+import httpx
 
 logger = logging.getLogger(__name__)
 
+# Adapters built on OpenAI-compatible SDKs that take an injected httpx client
+_SHARED_HTTP_CLIENT_PROVIDERS = frozenset({"openai", "groq"})
+
 class ProviderFactory:
     """
     Factory for creating and managing instances of provider adapters.
@@ -33,11 +40,26 @@ class ProviderFactory:
             raise ConfigurationError("Providers configuration is missing or invalid.")
         self.config: AppConfig = config
         self._adapter_cache: Dict[str, ProviderInterface] = {}
+        # One httpx connection pool shared by the adapters that accept an injected client
+        self._http_client: Optional[httpx.AsyncClient] = None
+        # Bound close() of each cached adapter that has one, resolved once at instantiation
+        self._closers: Dict[str, Callable[[], Awaitable[None]]] = {}
         self._adapter_map: Dict[str, Type[ProviderInterface]] = {
             "openai": OpenAIAdapter,
             "anthropic": AnthropicAdapter,
             "groq": GroqAdapter,
         }
+        # Resolve (adapter class, provider config section, API key) once per provider
+        # so that get_adapter() does no config introspection per call. Provider names
+        # match the ProvidersConfig attribute names, whose types Pydantic already validated.
+        self._provider_meta: Dict[str, Tuple[Type[ProviderInterface], Any, Optional[str]]] = {
+            name: (
+                adapter_class,
+                getattr(config.providers, name, None),
+                getattr(getattr(config.providers, name, None), '_api_key', None),
+            )
+            for name, adapter_class in self._adapter_map.items()
+        }
 
     def get_adapter(self, provider_name: str) -> ProviderInterface:
         """
@@ -54,79 +76,90 @@ class ProviderFactory:
                               or if its configuration is invalid (e.g., missing API key).
             ProviderError: If the requested provider name is unknown/unsupported.
         """
-        provider_name = provider_name.lower() # Normalize name
-
-        # Return cached instance if available
-        if provider_name in self._adapter_cache:
-            logger.debug(f"Returning cached adapter instance for provider: {provider_name}")
+        # Fast path: cached adapter, no normalization or logging
+        try:
             return self._adapter_cache[provider_name]
+        except KeyError:
+            return self._create_adapter(provider_name.lower())
+
+    def _create_adapter(self, provider_name: str) -> ProviderInterface:
+        """Validates the provider's configuration and instantiates (and caches) its adapter."""
+        cached = self._adapter_cache.get(provider_name)
+        if cached is not None:
+            return cached
 
         # Check if provider is supported
-        adapter_class = self._adapter_map.get(provider_name)
-        if not adapter_class:
-            logger.error(f"Attempted to get adapter for unsupported provider: {provider_name}")
+        meta = self._provider_meta.get(provider_name)
+        if meta is None:
+            logger.error("Attempted to get adapter for unsupported provider: %s", provider_name)
             raise ProviderError(f"Unsupported provider: {provider_name}")
+        adapter_class, provider_config_instance, api_key = meta
 
-        # Get the specific configuration section for this provider
-        # and ensure it's the correct Pydantic model type
-        provider_config_instance: Optional[OpenAIProviderConfig | AnthropicProviderConfig | GroqProviderConfig] = None
-        expected_config_type: Optional[Type[OpenAIProviderConfig | AnthropicProviderConfig | GroqProviderConfig]] = None
-
-        if provider_name == "openai":
-            provider_config_instance = self.config.providers.openai
-            expected_config_type = OpenAIProviderConfig
-        elif provider_name == "anthropic":
-            provider_config_instance = self.config.providers.anthropic
-            expected_config_type = AnthropicProviderConfig
-        elif provider_name == "groq":
-            provider_config_instance = self.config.providers.groq
-            expected_config_type = GroqProviderConfig
-        # Add elif for other providers (e.g., groq)
-        
         if not provider_config_instance:
-            logger.error(f"Configuration section for provider '{provider_name}' not found in config.toml.")
+            logger.error("Configuration section for provider '%s' not found in config.toml.", provider_name)
             raise ConfigurationError(f"Provider '{provider_name}' is not configured.")
-        
-        if expected_config_type and not isinstance(provider_config_instance, expected_config_type):
-            # This should ideally be caught by Pydantic validation during config load
-            logger.error(f"Configuration for provider '{provider_name}' is of unexpected type. Expected {expected_config_type}, got {type(provider_config_instance)}.\n")
-            raise ConfigurationError(f"Invalid configuration type for provider '{provider_name}'.")
-
-        # Extract the loaded API key (which should be in the private '_api_key' field)
-        api_key = getattr(provider_config_instance, '_api_key', None)
+
+        # The API key was extracted from the private '_api_key' field at init
         if not api_key:
             # This should have been caught by ConfigLoader, but double-check
             env_var_name = getattr(provider_config_instance, 'api_key_env_var', 'N/A')
-            logger.error(f"API key for provider '{provider_name}' was not loaded. Expected env var: {env_var_name}")
+            logger.error("API key for provider '%s' was not loaded. Expected env var: %s", provider_name, env_var_name)
             raise ConfigurationError(f"API key for provider '{provider_name}' is missing. Ensure env var '{env_var_name}' is set.")
 
         # Instantiate the adapter
         try:
-            logger.info(f"Instantiating adapter for provider: {provider_name}")
+            logger.info("Instantiating adapter for provider: %s", provider_name)
             # Pass the loaded API key and the specific config section
-            adapter_instance = adapter_class(api_key=api_key, config=provider_config_instance) # type: ignore
+            adapter_kwargs: Dict[str, Any] = {}
+            if provider_name in _SHARED_HTTP_CLIENT_PROVIDERS:
+                if self._http_client is None:
+                    self._http_client = create_http_client()
+                adapter_kwargs["http_client"] = self._http_client
+            adapter_instance = adapter_class(api_key=api_key, config=provider_config_instance, **adapter_kwargs) # type: ignore
             self._adapter_cache[provider_name] = adapter_instance
-            logger.info(f"Successfully instantiated adapter for provider: {provider_name}")
+            closer = getattr(adapter_instance, 'close', None)
+            if callable(closer):
+                self._closers[provider_name] = closer
+            logger.info("Successfully instantiated adapter for provider: %s", provider_name)
             return adapter_instance
         except Exception as e:
-            logger.exception(f"Failed to instantiate adapter for provider '{provider_name}': {e}")
+            logger.exception("Failed to instantiate adapter for provider '%s': %s", provider_name, e)
             # Catch specific instantiation errors if needed
             raise ProviderError(f"Failed to create adapter instance for '{provider_name}': {e}") from e
 
+    async def warmup_all(self, provider_names: Optional[Iterable[str]] = None) -> None:
+        """
+        Creates the given (default: all configured) adapters and warms their connections concurrently.
+
+        Meant to run once at service startup; failures are logged and never raised.
+        """
+        names = list(provider_names) if provider_names is not None else [
+            name for name, (_, config, _) in self._provider_meta.items() if config is not None
+        ]
+        adapters = []
+        for name in names:
+            try:
+                adapters.append(self.get_adapter(name))
+            except ProviderError as e:
+                logger.warning("Skipping warmup for provider '%s': %s", name, e)
+        await asyncio.gather(*(adapter.warmup() for adapter in adapters), return_exceptions=True)
+        logger.info("Warmed up %d provider adapter(s).", len(adapters))
+
     async def close_all(self) -> None:
-        """Closes all cached provider adapter instances that have a close method."""
+        """Closes all cached provider adapter instances that have a close method, concurrently."""
         logger.info("Closing all cached provider adapters...")
-        for provider_name, adapter_instance in self._adapter_cache.items():
-            if hasattr(adapter_instance, 'close') and callable(adapter_instance.close):
-                try:
-                    logger.debug(f"Closing adapter for provider: {provider_name}")
-                    await adapter_instance.close() # type: ignore
-                    logger.info(f"Successfully closed adapter for provider: {provider_name}")
-                except Exception as e:
-                    logger.exception(f"Failed to close adapter for provider '{provider_name}': {e}")
+        provider_names = list(self._closers)
+        results = await asyncio.gather(*(closer() for closer in self._closers.values()), return_exceptions=True)
+        for provider_name, result in zip(provider_names, results):
+            if isinstance(result, BaseException):
+                logger.error("Failed to close adapter for provider '%s': %s", provider_name, result, exc_info=result)
             else:
-                logger.debug(f"Adapter for provider '{provider_name}' does not have a close method.")
+                logger.info("Successfully closed adapter for provider: %s", provider_name)
+        self._closers.clear()
         self._adapter_cache.clear() # Clear cache after closing
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
         logger.info("All cached provider adapters processed for closure.")
 
 # Example Usage (requires a loaded AppConfig object):
@@ -2,6 +2,7 @@
 
 import structlog
 import logging
+import httpx
 import os
 from typing import List, Dict, Any, Optional
 
@@ -25,8 +26,10 @@ except ImportError:
     class GroqAuthenticationError(Exception): pass
 
 # Local application imports
-from .base import ProviderInterface, LLMResponse, EmbeddingResponse, ModerationResponse
+from .base import ProviderInterface, LLMResponse, EmbeddingResponse, ModerationResponse, build_cost_functions, build_cost_table
 from core.config import GroqProviderConfig # Import specific config model
+from .transport import WARMUP_TIMEOUT_SECONDS, create_http_client
+from .retry import PROVIDER_RETRY_WAIT
 from .exceptions import ProviderError, AuthenticationError, RateLimitError, CallError, ConfigurationError
 
 # For retry mechanism
@@ -34,16 +37,22 @@ import tenacity
 
 log = structlog.get_logger(__name__)
 
+# Conversation roles passed through from history
+_CHAT_ROLES = frozenset(("user", "assistant"))
+
 class GroqAdapter(ProviderInterface):
     """Adapter for interacting with Groq APIs."""
 
-    def __init__(self, api_key: str, config: GroqProviderConfig):
+    def __init__(self, api_key: str, config: GroqProviderConfig, http_client: Optional[httpx.AsyncClient] = None):
         """
         Initializes the Groq adapter.
 
         Args:
             api_key: The Groq API key.
             config: The Groq-specific configuration object.
+            http_client: Optional httpx client shared with other adapters (one connection pool
+                per process). The caller owns it and closes it; by default the adapter creates
+                and closes its own.
         """
         if not GROQ_AVAILABLE:
             raise ConfigurationError("Groq SDK not installed. Please install with 'pip install groq'.")
@@ -52,26 +61,26 @@ class GroqAdapter(ProviderInterface):
             raise ConfigurationError("Groq API key is required but was not provided.")
         
         try:
-            # TODO: Configure client further using config if needed (e.g., custom httpx client)
             # Default timeout/retries can be set here or handled per-call via Tenacity/with_options
+            # Pooled (HTTP/2 when available) transport shared by all calls of this adapter
+            self._owns_client = http_client is None
+            self._http_client = http_client or create_http_client()
             self.client = AsyncGroq(
                 api_key=api_key,
+                http_client=self._http_client,
                 # max_retries=config.max_retries # Example if config added this
                 # timeout=config.timeout # Example if config added this
             )
             self.config = config
+            # Per-token (prompt, completion, embedding) cost in USD, precomputed from the per-million pricing
+            self._cost_table = build_cost_table(config.model_pricing)
+            # Specialized per-model completion cost functions (hot path)
+            self._cost_fn = build_cost_functions(self._cost_table)
             log.info("Groq Async Client initialized successfully.")
         except Exception as e:
             log.exception("Failed to initialize Groq client.")
             raise ConfigurationError(f"Failed to initialize Groq client: {e}") from e
 
-    @tenacity.retry(
-        wait=tenacity.wait_exponential(multiplier=1, min=2, max=10),
-        stop=tenacity.stop_after_attempt(5), # SDK default is 2, but let's use 5 like others
-        retry=tenacity.retry_if_exception_type((GroqAPIConnectionError, GroqRateLimitError)), # Retry on connection/rate limit errors
-        before_sleep=tenacity.before_sleep_log(log, logging.WARNING),
-        reraise=True
-    )
     async def generate(self, prompt: str, model_config: Dict[str, Any], **kwargs) -> LLMResponse:
         """
         Generates text using Groq's chat completions endpoint.
@@ -91,60 +100,28 @@ class GroqAdapter(ProviderInterface):
         max_tokens = model_config.get("max_tokens") # Optional for Groq?
         temperature = model_config.get("temperature")
         # TODO: Add other OpenAI-compatible params like top_p, presence_penalty etc.
-        system_prompt = kwargs.get("system_prompt")
-        history: List[Message] = kwargs.get("conversation_history", [])
-
-        # Construct messages list (OpenAI format)
-        messages_api_format = []
-        if system_prompt:
-            messages_api_format.append({"role": "system", "content": system_prompt})
-        for msg in history:
-            # Ensure role is valid (user/assistant)
-            if msg.role in ["user", "assistant"]:
-                messages_api_format.append({"role": msg.role, "content": msg.content})
-            elif msg.role == "system" and not system_prompt:
-                # Add first system message from history if no separate system_prompt given
-                messages_api_format.insert(0, {"role": "system", "content": msg.content})
-                system_prompt = msg.content # Avoid adding it twice
+        # Built once; retries in _post() reuse it
+        messages_api_format = self._build_messages(prompt, kwargs.get("system_prompt"), kwargs.get("conversation_history", []))
 
-        # Add the current user prompt
-        messages_api_format.append({"role": "user", "content": prompt})
-
-        log.debug(f"Calling Groq generate: model={model}, max_tokens={max_tokens}, temp={temperature}")
+        log.debug("Calling Groq generate", model=model, max_tokens=max_tokens, temperature=temperature)
 
         try:
-            # Use Groq client, API is OpenAI compatible
-            response = await self.client.chat.completions.create(
-                model=model,
-                messages=messages_api_format, # type: ignore
-                max_tokens=max_tokens,
-                temperature=temperature,
-                # stream=False, # Assuming non-streaming for now
-                # Add other parameters as needed
-            )
+            response = await self._post(model, messages_api_format, max_tokens, temperature)
 
             content = response.choices[0].message.content
-            usage = response.usage
 
             cost = 0.0
-            prompt_tokens = usage.prompt_tokens if usage else 0
-            completion_tokens = usage.completion_tokens if usage else 0
-            total_tokens = usage.total_tokens if usage else 0
-
-            if usage:
+            if (usage := response.usage) is not None:
+                prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
                 # Calculate cost using configured pricing (may be empty/needs update)
-                pricing_info = self.config.model_pricing.get(model)
-                if pricing_info:
-                    prompt_cost_usd = 0.0
-                    completion_cost_usd = 0.0
-                    if pricing_info.prompt_token_cost_usd_million is not None and prompt_tokens > 0:
-                        prompt_cost_usd = (prompt_tokens / 1_000_000) * pricing_info.prompt_token_cost_usd_million
-                    if pricing_info.completion_token_cost_usd_million is not None and completion_tokens > 0:
-                        completion_cost_usd = (completion_tokens / 1_000_000) * pricing_info.completion_token_cost_usd_million
-                    cost = prompt_cost_usd + completion_cost_usd
-                    log.debug(f"Calculated cost for Groq model {model}: ${cost:.6f} (Input: ${prompt_cost_usd:.6f}, Output: ${completion_cost_usd:.6f})")
+                cost_fn = self._cost_fn.get(model)
+                if cost_fn is not None:
+                    cost = cost_fn(prompt_tokens, completion_tokens)
+                    log.debug("Calculated cost for Groq model", model=model, cost_usd=cost)
                 else:
                     log.warning(f"No pricing information found for Groq model '{model}' in GroqProviderConfig. Cost will be 0.")
+            else:
+                prompt_tokens = completion_tokens = 0
             
             # TODO: Extract timing info if needed (usage.prompt_time, usage.completion_time)
 
@@ -152,10 +129,9 @@ class GroqAdapter(ProviderInterface):
                 text_content=content,
                 input_tokens=prompt_tokens,
                 output_tokens=completion_tokens,
-                total_tokens=total_tokens,
                 cost=cost,
                 is_error=False,
-                raw_response=response.model_dump() # Include raw response
+                raw_response=response # SDK object; dumped lazily via raw_response_dict()
             )
 
         except GroqAuthenticationError as e:
@@ -163,7 +139,7 @@ class GroqAdapter(ProviderInterface):
             raise AuthenticationError(f"Groq Auth Error: {e.status_code} - {e.body}") from e
         except GroqRateLimitError as e:
             log.warning(f"Groq rate limit exceeded: {e}")
-            # Let Tenacity handle retry
+            # Retries are exhausted at this point
             raise RateLimitError(f"Groq Rate Limit Error: {e.status_code} - {e.body}") from e
         # TODO: Map other Groq errors (BadRequestError etc.) to CallError
         except GroqAPIStatusError as e:
@@ -174,12 +150,46 @@ class GroqAdapter(ProviderInterface):
                  raise ProviderError(f"Groq API Error (Server/Other): {e.status_code} - {e.message}") from e
         except GroqAPIConnectionError as e:
              log.error(f"Groq connection error: {e}")
-             # Let Tenacity handle retry
+             # Retries are exhausted at this point
              raise ProviderError(f"Groq Connection Error: {e}") from e
         except Exception as e:
             log.exception("An unexpected error occurred during Groq generate call.")
             raise ProviderError(f"Unexpected error in Groq generate: {e}") from e
 
+    @staticmethod
+    def _build_messages(prompt: str, system_prompt: Optional[str], history: List[Any]) -> List[Dict[str, str]]:
+        """Builds the OpenAI-format message list: system prompt, user/assistant history, then the prompt."""
+        if not system_prompt and not history:
+            # Single-turn fast path (the common case): one list, one dict
+            return [{"role": "user", "content": prompt}]
+        if not system_prompt:
+            # Use the first system message from history if no separate system_prompt is given
+            system_prompt = next((msg.content for msg in history if msg.role == "system"), None)
+        messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        messages.extend({"role": msg.role, "content": msg.content} for msg in history if msg.role in _CHAT_ROLES)
+        # Add the current user prompt
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    @tenacity.retry(
+        wait=PROVIDER_RETRY_WAIT,
+        stop=tenacity.stop_after_attempt(5), # SDK default is 2, but let's use 5 like others
+        retry=tenacity.retry_if_exception_type((GroqAPIConnectionError, GroqRateLimitError)), # Retry on connection/rate limit errors
+        before_sleep=tenacity.before_sleep_log(log, logging.WARNING),
+        reraise=True
+    )
+    async def _post(self, model: str, messages: List[Dict[str, str]], max_tokens: Optional[int], temperature: Optional[float]):
+        """Sends one chat completion request; SDK errors propagate so the retry policy sees them."""
+        # Use Groq client, API is OpenAI compatible
+        return await self.client.chat.completions.create(
+            model=model,
+            messages=messages, # type: ignore
+            max_tokens=max_tokens,
+            temperature=temperature,
+            # stream=False, # Assuming non-streaming for now
+            # Add other parameters as needed
+        )
+
     async def embed(self, text_chunks: List[str], model_config: Dict[str, Any], **kwargs) -> EmbeddingResponse:
         # Groq API (based on docs review) focuses on chat completions, no clear embedding endpoint.
         log.warning("Groq API does not provide a standard embedding endpoint via the Python SDK.")
@@ -190,14 +200,21 @@ class GroqAdapter(ProviderInterface):
         log.warning("Groq API does not provide a standard moderation endpoint via the Python SDK.")
         raise NotImplementedError("Groq moderation method not available via standard API.")
 
+    async def warmup(self) -> None:
+        """Establishes the TCP/TLS connection with a cheap models.list() so the first real call reuses it."""
+        try:
+            await self.client.models.list(timeout=WARMUP_TIMEOUT_SECONDS)
+            log.debug("Groq connection warmed up.")
+        except Exception as e:
+            log.debug("Groq connection warmup failed; the first request will connect.", error=str(e))
+
     async def close(self) -> None:
         """Closes the underlying AsyncGroq client session."""
-        if hasattr(self.client, 'aclose') and callable(self.client.aclose):
-            try:
-                log.info("Closing Groq client...")
-                await self.client.aclose()
-                log.info("Groq client closed successfully.")
-            except Exception as e:
-                log.exception("Failed to close Groq client session.")
-        else:
-            log.warning("AsyncGroq client does not have an 'aclose' method. Skipping closure.") 
\ No newline at end of file
+        if not self._owns_client:
+            return # The injected httpx client is closed by its owner
+        try:
+            log.info("Closing Groq client...")
+            await self.client.close() # Closes the adapter's own httpx client
+            log.info("Groq client closed successfully.")
+        except Exception as e:
+            log.exception("Failed to close Groq client session.") 
\ No newline at end of file
@@ -1,61 +1,269 @@
 """OpenAI Provider Adapter."""
 
+import asyncio
+import functools
+import hashlib
 import logging
 import os
-from typing import List, Dict, Any, Optional, Tuple
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import time
 
 # Third-party imports
+import httpx
 import openai # Ensure this is installed via requirements.txt or pyproject.toml
 from openai import AsyncOpenAI, AuthenticationError as OpenAIAuthenticationError, RateLimitError as OpenAIRateLimitError, BadRequestError as OpenAIBadRequestError, APIError as OpenAIAPIError
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from tenacity import retry, stop_after_attempt, retry_if_exception_type
 import structlog
 
+try:
+    import orjson
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:
+    import json
+    _json_dumps = lambda obj: json.dumps(obj).encode() # noqa: E731
+    _json_loads = json.loads
+
 # Local application imports
-from .base import ProviderInterface, LLMResponse, EmbeddingResponse, ModerationResponse
+from .base import ProviderInterface, LLMResponse, EmbeddingResponse, ModerationResponse, _zero_cost, quantize_embeddings, build_cost_functions, build_cost_table
 from core.config import OpenAIProviderConfig, ModelPricing # Import specific config model
+from .transport import WARMUP_TIMEOUT_SECONDS, create_http_client
+from .retry import PROVIDER_RETRY_WAIT
 from .exceptions import ProviderError, AuthenticationError, RateLimitError, CallError, ConfigurationError
 from core.models import StepMetrics
 from memory.base import EmbeddingProvider
-from core.metrics import record_llm_request, record_embedding_request
-
-# Default dimension for text-embedding-ada-002
+from core.metrics import enqueue_metric, record_llm_request, record_embedding_request
+
+# Native output dimension per embedding model; the text-embedding-3 models accept a smaller `dimensions`
+_EMBED_DIMS = {
+    "text-embedding-ada-002": 1536,
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+}
 DEFAULT_OPENAI_EMBEDDING_DIMENSION = 1536
 
 log = structlog.get_logger(__name__)
 
+# embed() calls with fewer chunks than this are coalesced by an _EmbedBatcher
+EMBED_BATCH_THRESHOLD = 32
+
+# Batch API: requests are billed at half the interactive price
+BATCH_PRICE_MULTIPLIER = 0.5
+BATCH_TERMINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+MAX_EMBEDDING_INPUTS_PER_REQUEST = 2048
+
+# Per-adapter LRU of embeddings keyed by (model, dimensions, blake2b(text))
+EMBED_CACHE_SIZE = 10000
+# Per-adapter LRU of moderation results keyed by (model, blake2b(text))
+MODERATION_CACHE_SIZE = 1024
+
+
+class _EmbedBatcher:
+    """
+    Coalesces small embed() calls for one (model, dimensions) into shared API requests.
+
+    Inputs queued within `max_wait` seconds are sent as one embeddings request of up
+    to `max_batch` texts; each caller gets its slice of the result and a share of the
+    reported token usage proportional to its text length. A request rejected as bad
+    (e.g. one over-long text) is resent per caller, so only the offending caller fails.
+    """
+
+    def __init__(self, aclient: AsyncOpenAI, model: str, dimensions: Optional[int], max_batch: int = 256, max_wait: float = 0.01):
+        self._aclient = aclient
+        self.model = model
+        self.dimensions = dimensions
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: "asyncio.Queue[Tuple[List[str], asyncio.Future]]" = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._requests: set = set() # In-flight batch requests (strong refs)
+        self._waiters: set = set() # Futures of callers not yet answered
+
+    async def embed(self, texts: List[str]) -> Tuple[List[List[float]], int]:
+        """Queues texts for the next batch; returns (embeddings, apportioned tokens)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.add(future)
+        future.add_done_callback(self._waiters.discard)
+        self._queue.put_nowait((texts, future))
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            if self._queue.qsize() + 1 < self.max_batch:
+                await asyncio.sleep(self.max_wait) # Let concurrent callers join the batch
+            count = len(batch[0][0])
+            while count < self.max_batch and not self._queue.empty():
+                item = self._queue.get_nowait()
+                batch.append(item)
+                count += len(item[0])
+            # Send without blocking collection of the next batch
+            request = asyncio.create_task(self._send(batch))
+            self._requests.add(request)
+            request.add_done_callback(self._requests.discard)
+
+    async def _send(self, batch: List[Tuple[List[str], asyncio.Future]]) -> None:
+        inputs = [text for texts, _ in batch for text in texts]
+        try:
+            response = await self._aclient.embeddings.create(model=self.model, input=inputs, dimensions=self.dimensions)
+        except Exception as e:
+            if isinstance(e, OpenAIBadRequestError) and len(batch) > 1:
+                # One caller's invalid input (e.g. an over-long text) rejects the whole request;
+                # resend per caller so only that caller fails
+                log.debug("Batched embedding request rejected; retrying callers separately", callers=len(batch), error=str(e))
+                await asyncio.gather(*(self._send([item]) for item in batch))
+                return
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        total_tokens = response.usage.total_tokens if response.usage else 0
+        total_chars = sum(len(text) for text in inputs) or 1
+        offset = 0
+        for texts, future in batch:
+            n = len(texts)
+            if not future.done():
+                share = round(total_tokens * sum(len(text) for text in texts) / total_chars)
+                future.set_result(([item.embedding for item in response.data[offset:offset + n]], share))
+            offset += n
+        log.debug("Embedded texts for concurrent callers in one request", texts=len(inputs), callers=len(batch), model=self.model)
+
+    async def close(self) -> None:
+        """Stops the batcher; callers still waiting on a queued or in-flight batch are cancelled."""
+        tasks = [t for t in (self._task, *self._requests) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for future in list(self._waiters):
+            future.cancel()
+
+
+@functools.lru_cache(maxsize=8)
+def _resolve_openai_key(env_var: Optional[str]) -> Optional[str]:
+    """Reads the API key from `env_var`, falling back to OPENAI_API_KEY. Cached per env var name
+    (call _resolve_openai_key.cache_clear() after changing the environment)."""
+    api_key = os.environ.get(env_var) if env_var else None
+    # Fallback to OPENAI_API_KEY if specific env var is not set or not provided
+    return api_key or os.environ.get("OPENAI_API_KEY")
+
+
+# SDK error -> (metrics error_type, raised error, message label); subclasses before APIError
+_OPENAI_ERROR_MAP = (
+    (OpenAIAuthenticationError, "auth", AuthenticationError, "OpenAI Auth Error"),
+    (OpenAIRateLimitError, "rate_limit", RateLimitError, "OpenAI Rate Limit Error"),
+    (OpenAIBadRequestError, "bad_request", CallError, "OpenAI Bad Request Error"), # Often model not found or invalid params
+    (OpenAIAPIError, "api", ProviderError, "OpenAI API Error"), # General API errors (5xx etc)
+)
+
+
 class OpenAIAdapter(ProviderInterface, EmbeddingProvider):
     """Adapter for interacting with OpenAI APIs."""
 
-    def __init__(self, config: OpenAIProviderConfig):
+    def __init__(self, config: OpenAIProviderConfig, http_client: Optional[httpx.AsyncClient] = None):
         """
         Initializes the OpenAI adapter.
 
         Args:
             config: The OpenAI-specific configuration object.
+            http_client: Optional httpx client shared with other adapters (one connection pool
+                per process). The caller owns it and closes it; by default the adapter creates
+                and closes its own.
         """
         self.config = config
-        api_key = os.environ.get(config.api_key_env_var) if config.api_key_env_var else None
-        if not api_key:
-            # Fallback to OPENAI_API_KEY if specific env var is not set or not provided
-            api_key = os.environ.get("OPENAI_API_KEY")
-
+        # Per-token (prompt, completion, embedding) cost in USD, precomputed from the per-million pricing
+        self._cost_table = build_cost_table(config.model_pricing)
+        # Specialized per-model completion cost functions (hot path)
+        self._cost_fn = build_cost_functions(self._cost_table)
+        api_key = _resolve_openai_key(config.api_key_env_var)
         if not api_key:
              raise ConfigurationError(f"OpenAI API key not found in environment variable '{config.api_key_env_var or 'OPENAI_API_KEY'}'")
+        self._api_key = api_key
+        # The client (and its TLS/HTTP transport) is created on first use, see `aclient`
+        self._aclient: Optional[AsyncOpenAI] = None
+        self._http_client = http_client
+        self._owns_client = http_client is None
+        self._embed_batchers: Dict[Tuple[str, Optional[int]], _EmbedBatcher] = {}
+        self._last_dim: Optional[int] = None # Dimensions of the last embed() call
+        # Cached vectors are tuples so callers mutating a returned embedding can't alter the cache
+        self._embed_cache: "OrderedDict[Tuple[str, Optional[int], bytes], Tuple[float, ...]]" = OrderedDict()
+        self._moderation_cache: "OrderedDict[Tuple[Optional[str], bytes], ModerationResponse]" = OrderedDict()
+
+    @property
+    def aclient(self) -> AsyncOpenAI:
+        """The AsyncOpenAI client, created lazily so unused adapters skip client/SSL setup."""
+        if self._aclient is None:
+            try:
+                if self._http_client is None:
+                    # Pooled (HTTP/2 when available) transport shared by all calls of this adapter
+                    self._http_client = create_http_client()
+                self._aclient = AsyncOpenAI(api_key=self._api_key, http_client=self._http_client)
+                log.info("OpenAI Async Client initialized successfully.")
+            except Exception as e:
+                log.exception("Failed to initialize OpenAI client.")
+                raise ConfigurationError(f"Failed to initialize OpenAI client: {e}") from e
+        return self._aclient
 
+    @asynccontextmanager
+    async def _measure(self, operation: str, recorder: Callable[..., None], model: str):
+        """
+        Times an API call, maps SDK errors to provider errors, and records metrics once.
+
+        Yields a dict the body fills with 'input_tokens' (and 'output_tokens' for LLM calls)
+        and 'cost'. Failed calls are recorded with zero tokens/cost and their error type;
+        cancelled calls with status 'cancelled'.
+        """
+        sample: Dict[str, Any] = {"input_tokens": 0, "cost": 0.0}
+        if recorder is record_llm_request:
+            sample["output_tokens"] = 0
+        start_time = time.perf_counter()
+        status, error_type = "success", None
         try:
-            self.aclient = AsyncOpenAI(api_key=api_key)
-            log.info("OpenAI Async Client initialized successfully.")
+            yield sample
         except Exception as e:
-            log.exception("Failed to initialize OpenAI client.")
-            raise ConfigurationError(f"Failed to initialize OpenAI client: {e}") from e
+            status = "error"
+            sample.update(dict.fromkeys(sample, 0))
+            for sdk_error, mapped_type, mapped_error, label in _OPENAI_ERROR_MAP:
+                if isinstance(e, sdk_error):
+                    error_type = mapped_type
+                    (log.warning if mapped_type == "rate_limit" else log.error)(f"{label} during {operation}: {e}")
+                    raise mapped_error(f"{label}: {e}") from e
+            error_type = "unknown"
+            log.exception(f"An unexpected error occurred during OpenAI {operation} call.")
+            raise ProviderError(f"Unexpected error in OpenAI {operation}: {e}") from e
+        except BaseException as e:
+            # Cancellation (or interpreter shutdown) must not be recorded as a success
+            status = "cancelled" if isinstance(e, asyncio.CancelledError) else "error"
+            error_type = "cancelled" if status == "cancelled" else type(e).__name__
+            sample.update(dict.fromkeys(sample, 0))
+            raise
+        finally:
+            enqueue_metric(
+                recorder,
+                provider="openai",
+                model=model,
+                start_time=start_time,
+                end_time=time.perf_counter(),
+                status=status,
+                error_type=error_type,
+                **sample
+            )
 
     @property
     def embedding_dimension(self) -> int:
-        """Returns the dimension of the vectors produced by the default OpenAI embedding model."""
-        # TODO: Make this dynamic based on the actual embedding model configured/used?
-        # For now, assume text-embedding-ada-002 is implicitly used by embed()
-        return DEFAULT_OPENAI_EMBEDDING_DIMENSION
+        """
+        Returns the dimension of the vectors produced by embed().
+
+        Uses the dimensions of the last embed() call, otherwise the configured embedding
+        model's `dimensions` parameter or native size.
+        """
+        if self._last_dim is not None:
+            return self._last_dim
+        embedding = self.config.embedding
+        return embedding.parameters.get("dimensions") or _EMBED_DIMS.get(embedding.model, DEFAULT_OPENAI_EMBEDDING_DIMENSION)
 
     async def generate(self, prompt: str, model_config: Dict[str, Any], **kwargs) -> LLMResponse:
         """
@@ -80,14 +288,9 @@ class OpenAIAdapter(ProviderInterface, EmbeddingProvider):
         messages = [{"role": "user", "content": prompt}]
         # TODO: Incorporate conversation_history from kwargs if provided
 
-        log.debug(f"Calling OpenAI generate: model={model}, temp={temperature}, max_tokens={max_tokens}")
-
-        # Track request timing and metrics
-        start_time = time.time()
-        error_type = None
-        status = "success"
+        log.debug("Calling OpenAI generate", model=model, temperature=temperature, max_tokens=max_tokens)
 
-        try:
+        async with self._measure("generate", record_llm_request, model) as sample:
             response = await self.aclient.chat.completions.create(
                 model=model,
                 messages=messages, # type: ignore (Pydantic models should be compatible)
@@ -97,157 +300,29 @@ class OpenAIAdapter(ProviderInterface, EmbeddingProvider):
             )
 
             content = response.choices[0].message.content
-            usage = response.usage
 
             cost = 0.0
-            prompt_tokens = usage.prompt_tokens if usage else 0
-            completion_tokens = usage.completion_tokens if usage else 0
-            total_tokens = usage.total_tokens if usage else 0
-
-            if usage:
-                pricing_info = self.config.model_pricing.get(model)
-                if pricing_info:
-                    prompt_cost_usd = 0.0
-                    completion_cost_usd = 0.0
-                    if pricing_info.prompt_token_cost_usd_million is not None and prompt_tokens > 0:
-                        prompt_cost_usd = (prompt_tokens / 1_000_000) * pricing_info.prompt_token_cost_usd_million
-                    if pricing_info.completion_token_cost_usd_million is not None and completion_tokens > 0:
-                        completion_cost_usd = (completion_tokens / 1_000_000) * pricing_info.completion_token_cost_usd_million
-                    cost = prompt_cost_usd + completion_cost_usd
-                    log.debug(f"Calculated cost for {model}: ${cost:.6f} (P: ${prompt_cost_usd:.6f}, C: ${completion_cost_usd:.6f})")
+            if (usage := response.usage) is not None:
+                prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+                cost_fn = self._cost_fn.get(model)
+                if cost_fn is not None:
+                    cost = cost_fn(prompt_tokens, completion_tokens)
+                    log.debug("Calculated cost for OpenAI model", model=model, cost_usd=cost)
                 else:
                     log.warning(f"No pricing information found for model '{model}' in OpenAIProviderConfig. Cost will be reported as 0.")
+            else:
+                prompt_tokens = completion_tokens = 0
+            sample.update(input_tokens=prompt_tokens, output_tokens=completion_tokens, cost=cost)
+
+        return LLMResponse(
+            text_content=content,
+            input_tokens=prompt_tokens,
+            output_tokens=completion_tokens,
+            cost=cost,
+            is_error=False,
+            raw_response=response # SDK object; dumped lazily via raw_response_dict()
+        )
 
-            end_time = time.time()
-            
-            # Record metrics
-            record_llm_request(
-                provider="openai",
-                model=model,
-                start_time=start_time,
-                end_time=end_time,
-                input_tokens=prompt_tokens,
-                output_tokens=completion_tokens,
-                cost=cost,
-                status=status
-            )
-
-            return LLMResponse(
-                text_content=content,
-                input_tokens=prompt_tokens,
-                output_tokens=completion_tokens,
-                total_tokens=total_tokens,
-                cost=cost,
-                is_error=False
-            )
-
-        except OpenAIAuthenticationError as e:
-            error_type = "auth"
-            status = "error"
-            log.error(f"OpenAI authentication error: {e}")
-            
-            # Record error metrics
-            end_time = time.time()
-            record_llm_request(
-                provider="openai",
-                model=model,
-                start_time=start_time,
-                end_time=end_time,
-                input_tokens=0,
-                output_tokens=0,
-                cost=0,
-                status=status,
-                error_type=error_type
-            )
-            
-            raise AuthenticationError(f"OpenAI Auth Error: {e}") from e
-            
-        except OpenAIRateLimitError as e:
-            error_type = "rate_limit"
-            status = "error"
-            log.warning(f"OpenAI rate limit exceeded: {e}")
-            
-            # Record error metrics
-            end_time = time.time()
-            record_llm_request(
-                provider="openai",
-                model=model,
-                start_time=start_time,
-                end_time=end_time,
-                input_tokens=0,
-                output_tokens=0,
-                cost=0,
-                status=status,
-                error_type=error_type
-            )
-            
-            raise RateLimitError(f"OpenAI Rate Limit Error: {e}") from e
-            
-        except OpenAIBadRequestError as e: # Often model not found or invalid params
-            error_type = "bad_request"
-            status = "error"
-            log.error(f"OpenAI bad request error: {e}")
-            
-            # Record error metrics
-            end_time = time.time()
-            record_llm_request(
-                provider="openai",
-                model=model,
-                start_time=start_time,
-                end_time=end_time,
-                input_tokens=0,
-                output_tokens=0,
-                cost=0,
-                status=status,
-                error_type=error_type
-            )
-            
-            raise CallError(f"OpenAI Bad Request Error: {e}") from e
-            
-        except OpenAIAPIError as e: # General API errors (5xx etc)
-            error_type = "api"
-            status = "error"
-            log.error(f"OpenAI API error: {e}")
-            
-            # Record error metrics
-            end_time = time.time()
-            record_llm_request(
-                provider="openai",
-                model=model,
-                start_time=start_time,
-                end_time=end_time,
-                input_tokens=0,
-                output_tokens=0,
-                cost=0,
-                status=status,
-                error_type=error_type
-            )
-            
-            raise ProviderError(f"OpenAI API Error: {e}") from e
-            
-        except Exception as e:
-            error_type = "unknown"
-            status = "error"
-            log.exception("An unexpected error occurred during OpenAI generate call.")
-            
-            # Record error metrics
-            end_time = time.time()
-            record_llm_request(
-                provider="openai",
-                model=model,
-                start_time=start_time,
-                end_time=end_time,
-                input_tokens=0,
-                output_tokens=0,
-                cost=0,
-                status=status,
-                error_type=error_type
-            )
-            
-            raise ProviderError(f"Unexpected error in OpenAI generate: {e}") from e
-
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10),
-           retry=retry_if_exception_type(RateLimitError))
     async def embed(self, text_chunks: List[str], model_config: Dict[str, Any], **kwargs) -> EmbeddingResponse:
         """
         Generates embeddings for text chunks using OpenAI.
@@ -255,163 +330,217 @@ class OpenAIAdapter(ProviderInterface, EmbeddingProvider):
         Args:
             text_chunks: A list of text strings to embed.
             model_config: Dictionary containing model parameters like 'model'.
-            **kwargs: Additional keyword arguments.
+            **kwargs: Additional keyword arguments. 'return_dtype' ("float32", "float16"
+                or "int8") packs the embeddings into one numpy array of that dtype;
+                int8 rows come with per-row 'scales'. Defaults to "float32" (lists).
 
         Returns:
             An EmbeddingResponse object.
         """
         model = model_config.get("model", "text-embedding-3-small") # Example default
         dimensions = model_config.get("dimensions") # Optional
+        return_dtype = kwargs.get("return_dtype", "float32")
+        self._last_dim = dimensions or _EMBED_DIMS.get(model, self._last_dim)
+
+        # Serve repeated chunks from the cache and only send the misses to the API
+        cache = self._embed_cache
+        keys = [(model, dimensions, hashlib.blake2b(text.encode(), digest_size=16).digest()) for text in text_chunks]
+        embeddings: List[Optional[List[float]]] = [None] * len(text_chunks)
+        misses: List[int] = []
+        for i, key in enumerate(keys):
+            cached = cache.get(key)
+            if cached is None:
+                misses.append(i)
+            else:
+                cache.move_to_end(key)
+                embeddings[i] = list(cached)
+        hits = len(text_chunks) - len(misses)
+
+        if not misses:
+            log.debug("OpenAI embed served from cache", model=model, chunks=hits)
+            packed, scales = quantize_embeddings(embeddings, return_dtype)
+            return EmbeddingResponse(embeddings=packed, dtype=return_dtype, scales=scales, input_tokens=0, total_tokens=0, cost=0.0, cache_hits=hits)
+
+        response = await self._embed([text_chunks[i] for i in misses], model, dimensions)
+        for i, embedding in zip(misses, response.embeddings):
+            embeddings[i] = embedding
+            cache[keys[i]] = tuple(embedding)
+        while len(cache) > EMBED_CACHE_SIZE:
+            cache.popitem(last=False)
+
+        packed, scales = quantize_embeddings(embeddings, return_dtype)
+        return response.model_copy(update={
+            "embeddings": packed, "dtype": return_dtype, "scales": scales, "cache_hits": hits, "cache_misses": len(misses),
+        })
+
+    @retry(stop=stop_after_attempt(3), wait=PROVIDER_RETRY_WAIT,
+           retry=retry_if_exception_type(RateLimitError))
+    async def _embed(self, text_chunks: List[str], model: str, dimensions: Optional[int]) -> EmbeddingResponse:
+        """One embedding attempt (with metrics); retried on rate limits with the unpacked config."""
+        log.debug("Calling OpenAI embed", model=model, chunks=len(text_chunks), dimensions=dimensions)
+
+        async with self._measure("embed", record_embedding_request, model) as sample:
+            if len(text_chunks) < EMBED_BATCH_THRESHOLD:
+                # Small calls share one request with concurrent callers for the same model/dimensions
+                batcher = self._embed_batchers.get((model, dimensions))
+                if batcher is None:
+                    batcher = self._embed_batchers[(model, dimensions)] = _EmbedBatcher(self.aclient, model, dimensions)
+                embeddings, input_tokens = await batcher.embed(text_chunks)
+                total_tokens_embed = input_tokens
+                usage_reported = True # Token usage apportioned from the batch response
+            else:
+                response = await self.aclient.embeddings.create(
+                    model=model,
+                    input=text_chunks,
+                    dimensions=dimensions
+                )
+
+                embeddings = [item.embedding for item in response.data]
+                if (usage := response.usage) is not None:
+                    # OpenAI uses prompt_tokens for embeddings input
+                    input_tokens, total_tokens_embed = usage.prompt_tokens, usage.total_tokens
+                    usage_reported = True
+                else:
+                    input_tokens = total_tokens_embed = 0
+                    usage_reported = False
+
+            cost = 0.0
+            if usage_reported:
+                rates = self._cost_table.get(model)
+                if rates is not None:
+                    cost = total_tokens_embed * rates[2]
+                    log.debug("Calculated cost for OpenAI embedding model", model=model, cost_usd=cost)
+                else:
+                    log.warning(f"No pricing information found for embedding model '{model}' in OpenAIProviderConfig. Cost will be 0.")
+            sample.update(input_tokens=input_tokens, cost=cost)
 
-        log.debug(f"Calling OpenAI embed: model={model}, chunks={len(text_chunks)}, dimensions={dimensions}")
+        return EmbeddingResponse(
+            embeddings=embeddings,
+            input_tokens=input_tokens,
+            total_tokens=total_tokens_embed,
+            cost=cost,
+            is_error=False
+        )
 
-        # Track request timing and metrics
-        start_time = time.time()
-        error_type = None
-        status = "success"
+    async def _run_batch(self, endpoint: str, bodies: List[Dict[str, Any]], poll_interval: float = 5.0, max_poll_interval: float = 60.0) -> List[Dict[str, Any]]:
+        """
+        Runs requests through the OpenAI Batch API and waits for the results.
 
+        Uploads the requests as JSONL, creates a batch with a 24h completion window and polls
+        it with exponential backoff. Returns one result line per request, in request order
+        (each has a 'response' with 'status_code'/'body', or an 'error').
+        """
+        lines = [
+            _json_dumps({"custom_id": str(i), "method": "POST", "url": endpoint, "body": body})
+            for i, body in enumerate(bodies)
+        ]
         try:
-            response = await self.aclient.embeddings.create(
-                model=model,
-                input=text_chunks,
-                dimensions=dimensions
-            )
+            input_file = await self.aclient.files.create(file=("batch.jsonl", b"\n".join(lines)), purpose="batch")
+            batch = await self.aclient.batches.create(input_file_id=input_file.id, endpoint=endpoint, completion_window="24h")
+            log.info(f"Submitted OpenAI batch {batch.id} with {len(bodies)} requests to {endpoint}")
+
+            delay = poll_interval
+            while batch.status not in BATCH_TERMINAL_STATUSES:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, max_poll_interval)
+                batch = await self.aclient.batches.retrieve(batch.id)
+
+            if batch.status != "completed":
+                raise ProviderError(f"OpenAI batch {batch.id} ended with status '{batch.status}'")
+
+            results: Dict[str, Dict[str, Any]] = {}
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if not file_id:
+                    continue
+                content = await self.aclient.files.content(file_id)
+                for line in content.content.splitlines():
+                    if line.strip():
+                        result = _json_loads(line)
+                        results[result["custom_id"]] = result
+        except OpenAIAuthenticationError as e:
+            raise AuthenticationError(f"OpenAI Auth Error: {e}") from e
+        except OpenAIAPIError as e:
+            raise ProviderError(f"OpenAI API Error during batch: {e}") from e
 
-            embeddings = [item.embedding for item in response.data]
-            usage = response.usage
+        log.info(f"OpenAI batch {batch.id} completed ({len(results)}/{len(bodies)} results)")
+        missing = {"error": {"message": "No result returned for request."}}
+        return [results.get(str(i), missing) for i in range(len(bodies))]
 
-            cost = 0.0
-            input_tokens = usage.prompt_tokens if usage else 0 # OpenAI uses prompt_tokens for embeddings input
-            total_tokens_embed = usage.total_tokens if usage else 0
+    async def generate_batch(self, prompts: List[Tuple[str, Dict[str, Any]]], endpoint: str = "/v1/chat/completions", **kwargs) -> List[LLMResponse]:
+        """
+        Generates completions for many prompts via the Batch API (50% price, separate rate limits).
 
-            if usage:
-                pricing_info = self.config.model_pricing.get(model)
-                if pricing_info and pricing_info.embedding_token_cost_usd_million is not None and total_tokens_embed > 0:
-                    cost = (total_tokens_embed / 1_000_000) * pricing_info.embedding_token_cost_usd_million
-                    log.debug(f"Calculated cost for embedding model {model}: ${cost:.6f}")
-                elif pricing_info and pricing_info.embedding_token_cost_usd_million is None:
-                    log.warning(f"Embedding pricing (embedding_token_cost_usd_million) not set for model '{model}' in OpenAIProviderConfig. Cost will be 0.")
-                elif not pricing_info:
-                    log.warning(f"No pricing information found for embedding model '{model}' in OpenAIProviderConfig. Cost will be 0.")
+        Intended for offline bulk work (evals, backfills): results arrive within the 24h
+        batch window rather than interactively.
 
-            end_time = time.time()
-            
-            # Record metrics
-            record_embedding_request(
-                provider="openai",
-                model=model,
-                start_time=start_time,
-                end_time=end_time,
-                input_tokens=input_tokens,
-                cost=cost,
-                status=status
-            )
+        Args:
+            prompts: (prompt, model_config) pairs, as passed to generate().
+            endpoint: Batch endpoint for the requests.
+            **kwargs: Passed to the batch poller ('poll_interval', 'max_poll_interval').
 
-            return EmbeddingResponse(
-                embeddings=embeddings,
-                input_tokens=input_tokens,
-                total_tokens=total_tokens_embed,
-                cost=cost,
-                is_error=False
-            )
+        Returns:
+            One LLMResponse per prompt, in order. Failed requests have is_error=True.
+        """
+        bodies = []
+        for prompt, model_config in prompts:
+            body = {"model": model_config.get("model") or self.config.llm.model, "messages": [{"role": "user", "content": prompt}]}
+            for param in ("temperature", "max_tokens"):
+                if model_config.get(param) is not None:
+                    body[param] = model_config[param]
+            bodies.append(body)
+
+        responses = []
+        for body, result in zip(bodies, await self._run_batch(endpoint, bodies, **kwargs)):
+            response = result.get("response") or {}
+            if result.get("error") or response.get("status_code") != 200:
+                responses.append(LLMResponse(is_error=True, error_details=result.get("error") or response.get("body")))
+                continue
+            data = response["body"]
+            usage = data.get("usage") or {}
+            prompt_tokens = usage.get("prompt_tokens", 0)
+            completion_tokens = usage.get("completion_tokens", 0)
+            responses.append(LLMResponse(
+                text_content=data["choices"][0]["message"]["content"],
+                input_tokens=prompt_tokens,
+                output_tokens=completion_tokens,
+                cost=self._batch_cost(data.get("model") or body["model"], prompt_tokens, completion_tokens),
+                raw_response=data,
+            ))
+        return responses
 
-        except OpenAIAuthenticationError as e:
-            error_type = "auth"
-            status = "error"
-            log.error(f"OpenAI authentication error during embed: {e}")
-            
-            # Record error metrics
-            end_time = time.time()
-            record_embedding_request(
-                provider="openai",
-                model=model,
-                start_time=start_time,
-                end_time=end_time,
-                input_tokens=0,
-                cost=0,
-                status=status,
-                error_type=error_type
-            )
-            
-            raise AuthenticationError(f"OpenAI Auth Error: {e}") from e
-            
-        except OpenAIRateLimitError as e:
-            error_type = "rate_limit"
-            status = "error"
-            log.warning(f"OpenAI rate limit exceeded during embed: {e}")
-            
-            # Record error metrics
-            end_time = time.time()
-            record_embedding_request(
-                provider="openai",
-                model=model,
-                start_time=start_time,
-                end_time=end_time,
-                input_tokens=0,
-                cost=0,
-                status=status,
-                error_type=error_type
-            )
-            
-            raise RateLimitError(f"OpenAI Rate Limit Error: {e}") from e
-            
-        except OpenAIBadRequestError as e:
-            error_type = "bad_request"
-            status = "error"
-            log.error(f"OpenAI bad request error during embed: {e}")
-            
-            # Record error metrics
-            end_time = time.time()
-            record_embedding_request(
-                provider="openai",
-                model=model,
-                start_time=start_time,
-                end_time=end_time,
-                input_tokens=0,
-                cost=0,
-                status=status,
-                error_type=error_type
-            )
-            
-            raise CallError(f"OpenAI Bad Request Error: {e}") from e
-        except OpenAIAPIError as e:
-            error_type = "api"
-            status = "error"
-            log.error(f"OpenAI API error during embed: {e}")
-            
-            # Record error metrics
-            end_time = time.time()
-            record_embedding_request(
-                provider="openai",
-                model=model,
-                start_time=start_time,
-                end_time=end_time,
-                input_tokens=0,
-                cost=0,
-                status=status,
-                error_type=error_type
-            )
-            
-            raise ProviderError(f"OpenAI API Error: {e}") from e
-        except Exception as e:
-            error_type = "unknown"
-            status = "error"
-            log.exception("An unexpected error occurred during OpenAI embed call.")
-            
-            # Record error metrics
-            end_time = time.time()
-            record_embedding_request(
-                provider="openai",
-                model=model,
-                start_time=start_time,
-                end_time=end_time,
-                input_tokens=0,
-                cost=0,
-                status=status,
-                error_type=error_type
-            )
-            
-            raise ProviderError(f"Unexpected error in OpenAI embed: {e}") from e
+    async def embed_batch(self, text_chunks: List[str], model_config: Dict[str, Any], **kwargs) -> EmbeddingResponse:
+        """
+        Embeds a large corpus via the Batch API (50% price, separate rate limits).
+
+        Chunks are split into requests of up to 2048 inputs. Raises ProviderError if any
+        request in the batch failed.
+        """
+        model = model_config.get("model", "text-embedding-3-small")
+        dimensions = model_config.get("dimensions")
+        bodies = []
+        for start in range(0, len(text_chunks), MAX_EMBEDDING_INPUTS_PER_REQUEST):
+            body = {"model": model, "input": text_chunks[start:start + MAX_EMBEDDING_INPUTS_PER_REQUEST]}
+            if dimensions is not None:
+                body["dimensions"] = dimensions
+            bodies.append(body)
+
+        embeddings: List[List[float]] = []
+        total_tokens = 0
+        for result in await self._run_batch("/v1/embeddings", bodies, **kwargs):
+            response = result.get("response") or {}
+            if result.get("error") or response.get("status_code") != 200:
+                raise ProviderError(f"OpenAI batch embedding request failed: {result.get('error') or response.get('body')}")
+            data = response["body"]
+            embeddings.extend(item["embedding"] for item in sorted(data["data"], key=lambda item: item["index"]))
+            total_tokens += (data.get("usage") or {}).get("total_tokens", 0)
+
+        rates = self._cost_table.get(model, (0.0, 0.0, 0.0))
+        cost = total_tokens * rates[2] * BATCH_PRICE_MULTIPLIER
+        return EmbeddingResponse(embeddings=embeddings, input_tokens=total_tokens, total_tokens=total_tokens, cost=cost)
+
+    def _batch_cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """Cost of a Batch API completion, at the discounted batch rate."""
+        return self._cost_fn.get(model, _zero_cost)(prompt_tokens, completion_tokens) * BATCH_PRICE_MULTIPLIER
 
     async def moderate(self, text: str, model_config: Dict[str, Any], **kwargs) -> ModerationResponse:
         """
@@ -428,7 +557,17 @@ class OpenAIAdapter(ProviderInterface, EmbeddingProvider):
         # Model is optional for moderation, defaults to text-moderation-latest
         model = model_config.get("model") 
 
-        log.debug(f"Calling OpenAI moderate: model={model or 'default'}")
+        if not text or text.isspace():
+            # Nothing to classify; skip the round-trip
+            return ModerationResponse(is_flagged=False, categories={}, scores={}, cost=0.0, is_error=False)
+        # Repeated inputs (e.g. the same system prompt every turn) are answered from the cache
+        cache_key = (model, hashlib.blake2b(text.encode(), digest_size=16).digest())
+        cached = self._moderation_cache.get(cache_key)
+        if cached is not None:
+            self._moderation_cache.move_to_end(cache_key)
+            return cached
+
+        log.debug("Calling OpenAI moderate", model=model or "default")
 
         try:
             response = await self.aclient.moderations.create(
@@ -455,13 +594,17 @@ class OpenAIAdapter(ProviderInterface, EmbeddingProvider):
             else:
                 log.debug("Moderation model not specified. Cost remains 0.")
 
-            return ModerationResponse(
+            moderation = ModerationResponse(
                 is_flagged=result.flagged,
                 categories=result.categories.model_dump(), # Convert Pydantic model to dict
                 scores=result.category_scores.model_dump(), # Convert Pydantic model to dict
                 cost=cost, 
                 is_error=False
             )
+            self._moderation_cache[cache_key] = moderation
+            if len(self._moderation_cache) > MODERATION_CACHE_SIZE:
+                self._moderation_cache.popitem(last=False)
+            return moderation
             
         except OpenAIAuthenticationError as e:
             log.error(f"OpenAI authentication error during moderate: {e}")
@@ -479,11 +622,23 @@ class OpenAIAdapter(ProviderInterface, EmbeddingProvider):
             log.exception("An unexpected error occurred during OpenAI moderate call.")
             raise ProviderError(f"Unexpected error in OpenAI moderate: {e}") from e
 
+    async def warmup(self) -> None:
+        """Establishes the TCP/TLS connection with a cheap models.list() so the first real call reuses it."""
+        try:
+            await self.aclient.models.list(timeout=WARMUP_TIMEOUT_SECONDS)
+            log.debug("OpenAI connection warmed up.")
+        except Exception as e:
+            log.debug("OpenAI connection warmup failed; the first request will connect.", error=str(e))
+
     async def close(self):
         """Close the OpenAI client connection."""
-        if self.aclient:
+        await asyncio.gather(*(batcher.close() for batcher in self._embed_batchers.values()))
+        self._embed_batchers.clear()
+        self._embed_cache.clear()
+        self._moderation_cache.clear()
+        if self._aclient and self._owns_client:
             try:
-                await self.aclient.close()
+                await self._aclient.close() # Closes the adapter's own httpx client
                 log.info("OpenAI async client closed.")
             except Exception as e:
                 log.error(f"Error closing OpenAI async client: {e}", exc_info=True)
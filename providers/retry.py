@@ -0,0 +1,57 @@
+"""Retry wait strategies shared by provider adapters."""
+
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import tenacity
+from tenacity.wait import wait_base
+
+# Longest server-requested delay we honor before falling back to our own backoff cap
+MAX_RETRY_AFTER_SECONDS = 60.0
+
+
+def _retry_after_seconds(exc: Optional[BaseException]) -> Optional[float]:
+    """Extracts the server's requested delay from an SDK error (or the error it was raised from)."""
+    for err in (exc, getattr(exc, "__cause__", None)):
+        headers = getattr(getattr(err, "response", None), "headers", None)
+        if headers is None:
+            continue
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms is not None:
+            try:
+                return float(retry_after_ms) / 1000
+            except ValueError:
+                pass
+        retry_after = headers.get("retry-after")
+        if retry_after is None:
+            continue
+        try:
+            return float(retry_after)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                continue
+    return None
+
+
+class wait_retry_after(wait_base):
+    """Waits as long as the server's Retry-After header asks, otherwise uses `fallback`."""
+
+    def __init__(self, fallback: wait_base, max_wait: float = MAX_RETRY_AFTER_SECONDS):
+        self.fallback = fallback
+        self.max_wait = max_wait
+
+    def __call__(self, retry_state: tenacity.RetryCallState) -> float:
+        outcome = retry_state.outcome
+        delay = _retry_after_seconds(outcome.exception() if outcome is not None and outcome.failed else None)
+        if delay is not None and delay <= self.max_wait:
+            return delay
+        return self.fallback(retry_state)
+
+
+# Jittered exponential backoff with a 100ms floor, so concurrent retriers don't stampede together.
+PROVIDER_RETRY_WAIT = wait_retry_after(
+    tenacity.wait_random_exponential(multiplier=0.1, min=0.1, max=10) + tenacity.wait_random(0, 0.25)
+)
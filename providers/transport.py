@@ -0,0 +1,39 @@
+"""Shared HTTP transport for provider SDK clients."""
+
+import httpx
+import structlog
+
+try:
+    import h2  # noqa: F401 # Required by httpx for HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+log = structlog.get_logger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 1000
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 200
+DEFAULT_TIMEOUT_SECONDS = 60.0
+# Upper bound for the connection warmup request made at startup
+WARMUP_TIMEOUT_SECONDS = 2.0
+
+
+def create_http_client(
+    max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+) -> httpx.AsyncClient:
+    """
+    Creates an httpx client for an OpenAI-compatible SDK (AsyncOpenAI, AsyncGroq).
+
+    With 'h2' installed (httpx[http2]) concurrent requests are multiplexed over a few
+    HTTP/2 connections instead of one HTTP/1.1 connection per in-flight request.
+    Without it the client falls back to HTTP/1.1 with the same pool limits.
+    """
+    if not HTTP2_AVAILABLE:
+        log.debug("h2 is not installed; provider HTTP client uses HTTP/1.1.")
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections),
+        timeout=httpx.Timeout(timeout),
+    )
@@ -6,11 +6,17 @@ from pathlib import Path
 # from agent_shell.core.schema import Turn       # Incorrect
 from contextlib import asynccontextmanager
 import asyncio
+import hashlib
+import hmac
 import logging
+import os
+import random
 from dotenv import load_dotenv
-from typing import Optional
+from typing import Any, Dict, Optional
+from pydantic import BaseModel, Field, ValidationError
+import orjson
 import uvicorn
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from core.logging_config import configure_logging
 import structlog
 import uuid
@@ -30,10 +36,17 @@ from core.personality import PersonalityPackManager
 from memory.redis_cache import RedisCacheService
 from memory.lancedb_store import LanceDBVectorStore
 from memory.manager import MemoryManager, memory_lifespan
-from core.models import Message # MODIFIED: Changed from core.messaging.message
+from core.models import Message, Turn # MODIFIED: Changed from core.messaging.message
 
-# Load environment variables from .env file
-load_dotenv()
+try:
+    import uvloop # noqa: F401 # libuv-based event loop, used by uvicorn when installed
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+# Load environment variables from .env file. This must precede AppConfig(), which resolves
+# provider API keys from os.environ during validation; existing variables win.
+load_dotenv(override=False)
 
 # Remove initial standard logger setup
 # logging.basicConfig(level=logging.INFO)
@@ -59,6 +72,12 @@ log = structlog.get_logger(__name__) # Define structlog logger here
 # async def step_event_worker(...): ...
 # async def step_result_event_worker(...): ...
 
+def _resolve_event_workers(config: AppConfig) -> int:
+    """Workers per event type: config.event_workers, else one per 500 queue slots within [1, CPU count]."""
+    if config.event_workers:
+        return config.event_workers
+    return max(1, min(os.cpu_count() or 1, config.event_queue_max_size // 500))
+
 # --- FastAPI Lifecycle (Startup/Shutdown) ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -76,6 +95,8 @@ async def lifespan(app: FastAPI):
     provider_factory = ProviderFactory(app_config)
     personality_manager = PersonalityPackManager(app_config.personality)
     log.info("Core services initialized (ProviderFactory, PersonalityManager).")
+    # Open provider connections (TLS/HTTP2) before the first request; failures are only logged
+    await provider_factory.warmup_all()
 
     # Use memory_lifespan context manager for memory services
     async with memory_lifespan(app_config) as memory_state:
@@ -124,13 +145,15 @@ async def lifespan(app: FastAPI):
         # Start Background Worker Tasks using global queue and injected components
         log.info("Starting event queue workers...") # Use log
         # Call start_event_workers from core.events
+        num_workers = _resolve_event_workers(app_config)
+        log.info("Resolved event worker count", workers_per_event_type=num_workers)
         worker_tasks = start_event_workers(
             publisher=event_publisher, 
             turn_manager=turn_manager, 
             step_processor=step_processor,
             shutdown_event_flag=shutdown_event,
-            num_step_event_workers=app_config.event_queue_max_size // 500, # Example: scale workers slightly with queue size
-            num_step_result_event_workers=app_config.event_queue_max_size // 500 # Example
+            num_step_event_workers=num_workers,
+            num_step_result_event_workers=num_workers
         )
         log.info(f"{len(worker_tasks)} event workers started.") # Use log
 
@@ -158,12 +181,12 @@ async def lifespan(app: FastAPI):
 
             log.info("Application shutdown complete.") # Use log
 
-app = FastAPI(title="Kernel Function Machine Framework", description="An extensible framework...", version="0.1.0", lifespan=lifespan)
+app = FastAPI(title="Kernel Function Machine Framework", description="An extensible framework...", version="0.1.0", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Instrument the app with more detailed Prometheus metrics
 instrumentator = Instrumentator(
     should_group_status_codes=False, # Example: retain original status codes
-    should_instrument_requests_inprogress=True,
+    should_instrument_requests_inprogress=False, # Skips a locked gauge inc/dec on every request
     excluded_handlers=["/metrics"], # Exclude metrics endpoint itself
     # Other general Instrumentator settings if needed
 )
@@ -202,43 +225,90 @@ instrumentator.instrument(app) # Instrument the app AFTER adding all metric defi
 # Expose combined metrics endpoint with all custom metrics
 instrumentator.expose(app, endpoint="/metrics", include_in_schema=True, tags=["observability"])
 
-# Add custom metrics for request tracking
-@app.middleware("http")
-async def track_metrics_middleware(request: Request, call_next):
-    structlog.contextvars.clear_contextvars()
-    request_id = request.headers.get("x-request-id", str(uuid.uuid4())) # Generate if missing
-    
-    # Add contextual information to logs
-    structlog.contextvars.bind_contextvars(
-        path=request.url.path,
-        method=request.method,
-        client_host=request.client.host,
-        client_port=request.client.port,
-        request_id=request_id,
-        trace_id=request_id  # Use request_id as trace_id for consistent tracing
-    )
-    
-    log.info("Received request")
-    start_time = time.time()
-    
-    response = await call_next(request)
-    
-    process_time = (time.time() - start_time) * 1000
-    structlog.contextvars.bind_contextvars(
-        status_code=response.status_code, 
-        process_time_ms=round(process_time, 2)
-    )
-    log.info("Sending response")
-    
-    # Add request ID to response header for client-side tracing
-    response.headers["X-Request-ID"] = request_id
-    response.headers["X-Trace-ID"] = request_id
-    
-    structlog.contextvars.clear_contextvars()
-    return response
+# Config values read on hot paths, resolved once at import (AppConfig is not reloaded at runtime)
+_REQUEST_LOG_SAMPLE_RATE = app_config.request_log_sample_rate
+_DEFAULT_CHAT_PERSONALITY_ID = app_config.personality.default_personality_id or "default"
+_internal_hmac_secret = os.environ.get(app_config.internal_hmac_secret_env_var) if app_config.internal_hmac_secret_env_var else None
+_INTERNAL_HMAC_KEY = _internal_hmac_secret.encode() if _internal_hmac_secret else None
+
+# Probe/scrape endpoints served without request logging or context binding
+_UNLOGGED_PATHS = frozenset({"/health", "/metrics"})
+
+class RequestTracingMiddleware:
+    """
+    Request logging/tracing as a pure ASGI middleware.
+
+    Binds the request context for logs, exposes the request id as request.state.request_id,
+    times the request, logs it once and adds X-Request-ID/X-Trace-ID to the response.
+    Unlike @app.middleware("http") it needs no extra task or memory stream per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in _UNLOGGED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        request_id = request_id or f"trace_{uuid.uuid4().hex}" # Generate only if missing
+        scope.setdefault("state", {})["request_id"] = request_id # request.state.request_id for handlers
+        encoded_id = request_id.encode("latin-1")
+        status_code = 500 # Reported if the app fails before starting a response
+
+        async def send_with_ids(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Add request ID to response header for client-side tracing
+                message["headers"] = [*message.get("headers", ()), (b"x-request-id", encoded_id), (b"x-trace-id", encoded_id)]
+            await send(message)
+
+        client = scope.get("client") or (None, None)
+        # Add contextual information to logs for the duration of the request (restored on exit)
+        with structlog.contextvars.bound_contextvars(
+            path=scope["path"],
+            method=scope["method"],
+            client_host=client[0],
+            client_port=client[1],
+            request_id=request_id,
+            trace_id=request_id  # Use request_id as trace_id for consistent tracing
+        ):
+            start_ns = time.perf_counter_ns()
+            try:
+                await self.app(scope, receive, send_with_ids)
+            finally:
+                process_time_ms = (time.perf_counter_ns() - start_ns) / 1_000_000
+                if status_code >= 400 or _REQUEST_LOG_SAMPLE_RATE >= 1.0 or random.random() < _REQUEST_LOG_SAMPLE_RATE:
+                    log.info("Request handled", status_code=status_code, process_time_ms=process_time_ms)
+
+app.add_middleware(RequestTracingMiddleware)
 
 # Define API endpoints (Replace logger.* with log.*)
 
+_WS_ACK_TEMPLATE = "Acknowledged: '{}'. Processing started (Turn ID: {}). Streaming TBD."
+# Replies a /chat client may leave unread before the connection is closed with 1013
+WS_OUTBOUND_QUEUE_SIZE = 256
+
+async def _ws_writer(ws: WebSocket, outbound: asyncio.Queue) -> None:
+    """Sends queued replies for one /chat connection, draining everything queued per wakeup."""
+    try:
+        while True:
+            batch = [await outbound.get()]
+            while not outbound.empty():
+                batch.append(outbound.get_nowait())
+            for text in batch:
+                await ws.send_text(text)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        log.warning("WebSocket send failed; dropping queued replies", error=str(e))
+
 @app.websocket("/chat")
 async def chat(ws: WebSocket):
     await ws.accept()
@@ -250,9 +320,22 @@ async def chat(ws: WebSocket):
         log.error("TurnManager not found in app state during /chat request.") # Try log
         return
 
+    # Turn parameters are fixed per connection via the query string
+    personality_id = ws.query_params.get("personality_id") or _DEFAULT_CHAT_PERSONALITY_ID
+    session_id = ws.query_params.get("session_id")
+
+    # Replies go through a per-connection queue so slow clients don't stall the receive loop
+    outbound: asyncio.Queue = asyncio.Queue(maxsize=WS_OUTBOUND_QUEUE_SIZE)
+    writer = asyncio.create_task(_ws_writer(ws, outbound))
     try:
         while True:
-            user_text = await ws.receive_text()
+            # Raw ASGI receive: accepts text or binary (UTF-8) frames and ends cleanly on disconnect
+            message = await ws.receive()
+            if message["type"] == "websocket.disconnect":
+                log.info("WebSocket client disconnected")
+                break
+            data = message.get("bytes")
+            user_text = data.decode() if data is not None else message.get("text") or ""
             log.info(f"Received message via WebSocket", user_text=user_text) # Use log
             
             # TODO: This Turn object doesn't match the one used by TurnManager
@@ -260,28 +343,39 @@ async def chat(ws: WebSocket):
             # initial_turn = Turn(user_input=user_text)
             # await turn_manager.start_turn(initial_turn)
             
-            # Simulate creating a TurnEventPayload
-            turn_id = f"ws_turn_{uuid.uuid4()}"
-            trace_id = f"ws_trace_{uuid.uuid4()}"
-            session_id = None # TODO: How to get session ID for websocket?
-            payload = {"message": user_text} # Simple payload
-            event_payload = TurnEventPayload(
-                turn_id=turn_id, 
-                input_data=payload,
+            turn_id = f"ws_turn_{uuid.uuid4().hex}"
+            trace_id = f"ws_trace_{uuid.uuid4().hex}"
+            # Same TURN_START shape as POST /v1/turns; all fields are server-built, so skip re-validation
+            event_payload = TurnEventPayload.model_construct(
+                turn_id=turn_id,
+                user_message=Message(role="user", content=user_text),
+                personality_id=personality_id,
+            )
+            event = EventEnvelope.model_construct(
+                event_id=f"evt_{uuid.uuid4().hex}",
+                type="TURN_START",
+                spec_version="1.0.0",
+                trace_id=trace_id,
                 session_id=session_id,
-                trace_id=trace_id
+                payload=event_payload
             )
-            event = EventEnvelope(event_type="TURN_START", payload=event_payload)
             await event_publisher.publish(event)
             log.info("Websocket initiated turn start event", turn_id=turn_id)
 
-            await ws.send_text(f"Acknowledged: '{user_text}'. Processing started (Turn ID: {turn_id}). Streaming TBD.")
+            try:
+                outbound.put_nowait(_WS_ACK_TEMPLATE.format(user_text, turn_id))
+            except asyncio.QueueFull:
+                log.warning("WebSocket client not reading replies; closing", queued=outbound.qsize())
+                await ws.close(code=1013, reason="Client too slow to receive replies")
+                break
 
     except Exception as e:
         log.error(f"Error in WebSocket chat: {e}", exc_info=True) # Use log
         try:
             await ws.close(code=1011, reason=f"Server error: {e}")
         except: pass
+    finally:
+        writer.cancel()
 
 # --- Management Endpoints --- (Replace logger.* with log.*)
 
@@ -303,78 +397,96 @@ async def reload_personalities_endpoint(request: Request):
         log.exception("Error reloading personality packs via API.") # Use log
         raise HTTPException(status_code=500, detail=f"Failed to reload personalities: {e}")
 
-# --- Middleware (Example: Logging requests) --- (Replace logger.* with log.*)
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    structlog.contextvars.clear_contextvars()
-    request_id = request.headers.get("x-request-id", str(uuid.uuid4())) # Generate if missing
-    structlog.contextvars.bind_contextvars(
-        path=request.url.path,
-        method=request.method,
-        client_host=request.client.host,
-        client_port=request.client.port,
-        request_id=request_id 
-    )
-    log.info("Received request") # Use log
-    start_time = time.time()
-    
-    response = await call_next(request)
-    
-    process_time = (time.time() - start_time) * 1000
-    structlog.contextvars.bind_contextvars(status_code=response.status_code, process_time_ms=round(process_time, 2))
-    log.info("Sending response") # Use log
-    structlog.contextvars.clear_contextvars()
-    response.headers["X-Request-ID"] = request_id # Add request ID to response header
-    return response
-
 # --- API Endpoints --- (Replace logger.* with log.*)
 
+class CreateTurnRequest(BaseModel):
+    """Body of POST /v1/turns."""
+    user_message: Message
+    personality_id: str = Field(min_length=1)
+    session_id: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None
+    turn_id: Optional[str] = None # Client-provided; generated if missing
+
+# 422 details for CreateTurnRequest validation errors, keyed by the offending top-level field
+_CREATE_TURN_ERRORS = {
+    "user_message": "'user_message' (with role and content) is required.",
+    "personality_id": "'personality_id' (string) is required.",
+    "session_id": "Invalid 'session_id', must be a string if provided.",
+    "metadata": "Invalid 'metadata', must be a dictionary if provided.",
+    "turn_id": "Invalid 'turn_id', must be a string if provided.",
+}
+
+# Signed internal requests older (or further in the future) than this are not trusted, limiting replay
+INTERNAL_SIGNATURE_MAX_AGE_SECONDS = 60
+
+def _trusted_turn_request(raw_body: bytes, signature: Optional[str], timestamp: Optional[str]) -> Optional[CreateTurnRequest]:
+    """
+    Builds the request without validation when it carries a fresh, valid internal HMAC, else None.
+
+    The signature covers "<timestamp>.<body>", so a captured request stops being trusted once
+    its timestamp is stale. Untrusted requests fall back to full validation.
+    """
+    if _INTERNAL_HMAC_KEY is None or not signature or not timestamp:
+        return None
+    try:
+        signed_at = int(timestamp)
+    except ValueError:
+        return None
+    if abs(time.time() - signed_at) > INTERNAL_SIGNATURE_MAX_AGE_SECONDS:
+        log.warning("Stale x-internal-timestamp on /v1/turns; validating body", signed_at=signed_at)
+        return None
+    expected = hmac.new(_INTERNAL_HMAC_KEY, timestamp.encode() + b"." + raw_body, hashlib.sha256).hexdigest().encode()
+    if not hmac.compare_digest(expected, signature.encode()):
+        log.warning("Invalid x-internal-trusted signature on /v1/turns; validating body")
+        return None
+    try:
+        data = orjson.loads(raw_body)
+    except orjson.JSONDecodeError:
+        return None
+    # Signed but incomplete bodies get full validation, which reports the missing field as a 422
+    user_message = data.get("user_message") if isinstance(data, dict) else None
+    if not isinstance(user_message, dict) or not data.get("personality_id") or "role" not in user_message or "content" not in user_message:
+        return None
+    data["user_message"] = Message.model_construct(**user_message)
+    return CreateTurnRequest.model_construct(**data)
+
 # Example endpoint to trigger a turn
 @app.post("/v1/turns", status_code=202) # 202 Accepted
 async def create_turn(request: Request):
     """Accepts a request to start a new agent turn."""
+    raw_body = await request.body()
+    headers = request.headers
+    body = _trusted_turn_request(raw_body, headers.get("x-internal-trusted"), headers.get("x-internal-timestamp"))
     try:
-        payload = await request.json()
-    except Exception as e:
-        log.error("Invalid JSON payload received for /v1/turns", error=str(e))
-        raise HTTPException(status_code=400, detail=f"Invalid JSON payload: {e}")
-
-    # Extract data for TurnEventPayload
-    user_message_data = payload.get("user_message")
-    if not isinstance(user_message_data, dict) or \
-       not user_message_data.get("role") or not user_message_data.get("content"):
-        log.warning("Missing or malformed 'user_message' in /v1/turns request", payload=payload)
-        raise HTTPException(status_code=422, detail="'user_message' (with role and content) is required.")
-    
-    try:
-        user_message_obj = Message(**user_message_data)
-    except Exception as e:
-        log.warning("Failed to parse 'user_message' object", error=str(e), data=user_message_data)
-        raise HTTPException(status_code=422, detail=f"Invalid 'user_message' structure: {e}")
-
-    personality_id = payload.get("personality_id")
-    if not personality_id or not isinstance(personality_id, str):
-        log.warning("Missing or invalid 'personality_id' in /v1/turns request", payload=payload)
-        raise HTTPException(status_code=422, detail="'personality_id' (string) is required.")
-
-    session_id = payload.get("session_id") # Optional
-    if session_id and not isinstance(session_id, str):
-        log.warning("Invalid 'session_id' (must be string) in /v1/turns request", payload=payload)
-        raise HTTPException(status_code=422, detail="Invalid 'session_id', must be a string if provided.")
-        
-    metadata = payload.get("metadata") # Optional
-    if metadata and not isinstance(metadata, dict):
-        log.warning("Invalid 'metadata' (must be dict) in /v1/turns request", payload=payload)
-        raise HTTPException(status_code=422, detail="Invalid 'metadata', must be a dictionary if provided.")
-
-    turn_id = payload.get("turn_id", f"turn_{uuid.uuid4()}") # Allow client-provided or generate
-    trace_id = request.headers.get("x-request-id") or f"trace_{uuid.uuid4()}" 
+        # Parse and validate the body in one pydantic-core pass
+        if body is None:
+            body = CreateTurnRequest.model_validate_json(raw_body)
+    except ValidationError as e:
+        error = e.errors()[0]
+        if error["type"] == "json_invalid":
+            log.error("Invalid JSON payload received for /v1/turns", error=error["msg"])
+            raise HTTPException(status_code=400, detail=f"Invalid JSON payload: {error['msg']}")
+        field = error["loc"][0] if error["loc"] else None
+        log.warning("Invalid /v1/turns request", field=field, error=error["msg"])
+        raise HTTPException(status_code=422, detail=_CREATE_TURN_ERRORS.get(field, f"Invalid request body: {error['msg']}"))
+    if not body.user_message.content:
+        log.warning("Empty 'user_message' content in /v1/turns request")
+        raise HTTPException(status_code=422, detail=_CREATE_TURN_ERRORS["user_message"])
+
+    user_message_obj = body.user_message
+    personality_id = body.personality_id
+    session_id = body.session_id # Optional
+    metadata = body.metadata # Optional
+    turn_id = body.turn_id or f"turn_{uuid.uuid4().hex}" # Allow client-provided or generate
+    # Same id the middleware logs and returns in X-Trace-ID
+    trace_id = getattr(request.state, "request_id", None) or f"trace_{uuid.uuid4().hex}"
 
     log.info("Received request to start turn via POST", turn_id=turn_id, trace_id=trace_id, personality_id=personality_id)
 
     try:
         # Create TurnEventPayload using specific fields
-        event_payload = TurnEventPayload(
+        # Every field was validated by CreateTurnRequest or generated here, so skip re-validation
+        event_payload = TurnEventPayload.model_construct(
             turn_id=turn_id, 
             user_message=user_message_obj,
             personality_id=personality_id,
@@ -382,8 +494,8 @@ async def create_turn(request: Request):
             # instructions and parameters are now optional in TurnEventPayload
             # Remove placeholders
         )
-        event = EventEnvelope(
-            event_id=f"evt_{uuid.uuid4()}", # Ensure event_id is unique
+        event = EventEnvelope.model_construct(
+            event_id=f"evt_{uuid.uuid4().hex}", # Ensure event_id is unique
             type="TURN_START", # Consistent event type string
             spec_version="1.0.0", # Example spec version
             trace_id=trace_id,
@@ -392,7 +504,7 @@ async def create_turn(request: Request):
         )
         await event_publisher.publish(event)
         log.info("Turn start event queued", turn_id=turn_id, event_type=event.type)
-        return JSONResponse(
+        return ORJSONResponse(
             content={"message": "Turn processing initiated", "turn_id": turn_id, "trace_id": trace_id},
             status_code=202
         )
@@ -402,6 +514,52 @@ async def create_turn(request: Request):
         log.exception("Failed to queue turn start event", turn_id=turn_id)
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
 
+# Turn fields returned by GET /v1/turns/{turn_id}
+_TURN_STATUS_FIELDS = ("turn_id", "status", "user_message", "final_response", "created_at", "updated_at", "session_id", "metadata", "metrics", "plan")
+
+# Upper bound on the ids accepted by GET /v1/turns
+MAX_TURNS_PER_STATUS_REQUEST = 100
+
+def _turn_status_payload(turn_context: Turn) -> Dict[str, Any]:
+    """Builds the status payload of a turn for GET /v1/turns responses."""
+    stored = getattr(turn_context, "_stored_data", None)
+    if stored is not None:
+        # Turn loaded from storage: its JSON-mode dict needs no re-serialization of the models
+        return {key: stored.get(key) for key in _TURN_STATUS_FIELDS}
+    # Assuming status is an Enum and other fields might need processing or dumping
+    return {
+        "turn_id": turn_context.turn_id,
+        "status": turn_context.status.value if hasattr(turn_context.status, 'value') else str(turn_context.status),
+        "user_message": turn_context.user_message.model_dump() if turn_context.user_message else None,
+        "final_response": turn_context.final_response.model_dump() if turn_context.final_response else None,
+        "created_at": turn_context.created_at, # orjson serializes datetimes as ISO 8601
+        "updated_at": turn_context.updated_at,
+        "session_id": turn_context.session_id,
+        "metadata": turn_context.metadata,
+        "metrics": turn_context.metrics,
+        "plan": turn_context.plan.model_dump() if turn_context.plan else None # Added plan
+    }
+
+@app.get("/v1/turns")
+async def get_turns_status(request: Request, ids: str):
+    """Returns the status of several turns (comma-separated `ids`) keyed by turn_id; unknown turns map to null."""
+    turn_ids = list(dict.fromkeys(turn_id for turn_id in ids.split(",") if turn_id))
+    if not turn_ids:
+        raise HTTPException(status_code=422, detail="'ids' must list at least one turn id.")
+    if len(turn_ids) > MAX_TURNS_PER_STATUS_REQUEST:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_TURNS_PER_STATUS_REQUEST} turn ids per request.")
+    context_manager: ContextManager = request.app.state.context_manager
+    log.info("Request received for status of multiple turns", count=len(turn_ids))
+
+    turns = await context_manager.get_turns(turn_ids)
+    try:
+        return ORJSONResponse(content={
+            turn_id: _turn_status_payload(turn) if turn is not None else None for turn_id, turn in turns.items()
+        })
+    except Exception as e:
+        log.error("Error serializing turn contexts for /v1/turns", exception=str(e), exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error while processing turn data: {str(e)}")
+
 # Placeholder for getting turn status
 @app.get("/v1/turns/{turn_id}")
 async def get_turn_status(request: Request, turn_id: str):
@@ -417,20 +575,7 @@ async def get_turn_status(request: Request, turn_id: str):
     
     # If turn_context exists, proceed to return 200. Catch errors during serialization.
     try:
-        # Assuming status is an Enum and other fields might need processing or dumping
-        response_payload = {
-            "turn_id": turn_context.turn_id,
-            "status": turn_context.status.value if hasattr(turn_context.status, 'value') else str(turn_context.status),
-            "user_message": turn_context.user_message.model_dump() if turn_context.user_message else None,
-            "final_response": turn_context.final_response.model_dump() if turn_context.final_response else None,
-            "created_at": turn_context.created_at.isoformat() if turn_context.created_at else None,
-            "updated_at": turn_context.updated_at.isoformat() if turn_context.updated_at else None,
-            "session_id": turn_context.session_id,
-            "metadata": turn_context.metadata,
-            "metrics": turn_context.metrics,
-            "plan": turn_context.plan.model_dump() if turn_context.plan else None # Added plan
-        }
-        return JSONResponse(content=response_payload)
+        return ORJSONResponse(content=_turn_status_payload(turn_context))
     except Exception as e:
         # This catch is now only for errors during serialization of a found turn_context
         log.error("Error serializing turn context for /v1/turns/{turn_id}", turn_id=turn_id, exception=str(e), exc_info=True)
@@ -440,7 +585,6 @@ async def get_turn_status(request: Request, turn_id: str):
 # --- Health Check Endpoint --- (Replace logger.* with log.*)
 @app.get("/health", status_code=200)
 async def health_check():
-    log.debug("Health check requested.") # Use log
     # TODO: Add checks for dependencies (e.g., redis ping, lancedb connection?)
     return {"status": "ok"}
 
@@ -449,12 +593,21 @@ if __name__ == "__main__":
     # Config loading & structlog configuration happen globally above
     
     # Pass message as first arg, context as kwargs for structlog
-    log.info("Starting KFM server", host=app_config.host, port=app_config.port, reload=app_config.reload) # Use log
+    loop = app_config.event_loop
+    if loop == "auto":
+        loop = "uvloop" if UVLOOP_AVAILABLE else "asyncio"
+    workers = 1 if app_config.reload else (app_config.workers or os.cpu_count() or 1)
+    if workers > 1 and "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        # Must be set before prometheus_client is imported, i.e. by whatever launches the server
+        log.warning("Running several workers without PROMETHEUS_MULTIPROC_DIR; /metrics will only report the worker that serves the scrape.", workers=workers)
+    log.info("Starting KFM server", host=app_config.host, port=app_config.port, reload=app_config.reload, loop=loop, workers=workers) # Use log
     uvicorn.run(
         "server:app", 
         host=app_config.host, 
         port=app_config.port, 
         reload=app_config.reload,
+        workers=workers, # Services are created per process in lifespan
+        loop=loop, # uvloop when installed; gunicorn deployments get it via uvicorn.workers.UvicornWorker
         log_config=None # Disable uvicorn default logging
     )
     log.info("KFM server stopped") # Use log
\ No newline at end of file
@@ -11,4 +11,19 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-# You can also define shared fixtures here if needed later 
\ No newline at end of file
+import pytest
+import pytest_asyncio
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def aclient():
+    """Async HTTP client for the server app; lifespan startup/shutdown runs once per test session."""
+    # Imported lazily: server.py loads AppConfig and configures logging at import,
+    # which test modules that don't need the app shouldn't pay for
+    from httpx import ASGITransport, AsyncClient
+    from server import app
+
+    # ASGITransport sends no lifespan events, so run the app's lifespan around the client
+    async with app.router.lifespan_context(app):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
+            yield c
@@ -1,48 +1,79 @@
 import pytest
-from fastapi.testclient import TestClient
-from unittest.mock import patch, AsyncMock, MagicMock
+from httpx import AsyncClient
+from unittest.mock import patch, AsyncMock
 import uuid
 import json
-from fastapi import HTTPException
+from types import MappingProxyType, SimpleNamespace
+import hashlib
+import hmac
+import time
 from datetime import datetime, timezone # Added for mocking datetime objects
 
 # Assuming server.py defines 'app' and 'event_publisher' is accessible for patching
 # from server import app  # This might cause issues if server.py has side effects on import
 # We will patch 'core.events.event_publisher' directly.
 
-from core.events import EventEnvelope, TurnEventPayload # Removed EventType
-from core.models import Message, Turn, Plan  # Removed TurnStatus & MessageRole
-
-# It's better to create a fixture that provides the TestClient with a properly configured app.
-# This involves ensuring lifespan events (startup/shutdown) are handled.
-from server import app as actual_app # Import the FastAPI app instance from server.py
-
-@pytest.fixture(scope="module")
-def client() -> TestClient:
-    # Ensure lifespan events are handled for the TestClient
-    with TestClient(actual_app) as c:
-        yield c
-
-# Mock the global event_publisher instance from core.events directly if it's easier
-# For now, patching where it's used in server.py or imported components is the approach.
+from core.events import EventEnvelope, TurnEventPayload, event_publisher # Removed EventType
+from core.models import Message, Turn  # Removed TurnStatus & MessageRole
+from core.context import ContextManager
+
+# The session-scoped `aclient` fixture (httpx AsyncClient with lifespan handled) lives in tests/conftest.py.
+
+@pytest.fixture(autouse=True)
+def mock_publish(monkeypatch: pytest.MonkeyPatch) -> AsyncMock:
+    """Swaps publish() on the global event publisher (the same instance server.py uses) for an AsyncMock."""
+    mock = AsyncMock()
+    monkeypatch.setattr(event_publisher, "publish", mock)
+    return mock
+
+# Minimal valid POST /v1/turns body; tests derive variants with {**_BASE_PAYLOAD, ...}.
+# Read-only so a test mutating it fails instead of leaking into other tests.
+_BASE_PAYLOAD = MappingProxyType({
+    "user_message": MappingProxyType({"role": "user", "content": "Hello, agent!"}),
+    "personality_id": "test_personality_001",
+})
+_BASE_USER_MESSAGE = dict(_BASE_PAYLOAD["user_message"])
+
+def _payload(**overrides) -> dict:
+    """JSON-serializable copy of _BASE_PAYLOAD with `overrides` applied (a None override drops the key)."""
+    payload = {**_BASE_PAYLOAD, "user_message": _BASE_USER_MESSAGE, **overrides}
+    return {key: value for key, value in payload.items() if value is not None}
+
+def assert_envelope_matches(mock_publish: AsyncMock, expected: dict):
+    """Asserts publish() was called once with a TURN_START envelope whose fields equal `expected`."""
+    mock_publish.assert_called_once()
+    env: EventEnvelope = mock_publish.call_args.args[0]
+    payload: TurnEventPayload = env.payload
+    # event_id is generated per event: "evt_" followed by a UUID
+    uuid.UUID(env.event_id.removeprefix("evt_"))
+    actual = {
+        "type": env.type,
+        "spec_version": env.spec_version,
+        "trace_id": env.trace_id,
+        "session_id": env.session_id,
+        "turn_id": payload.turn_id,
+        "user_message": {"role": payload.user_message.role, "content": payload.user_message.content},
+        "personality_id": payload.personality_id,
+        "metadata": payload.metadata,
+        "instructions": payload.instructions,
+        "parameters": payload.parameters,
+    }
+    assert actual == expected
 
-@pytest.mark.asyncio
-@patch('core.events.event_publisher.publish', new_callable=AsyncMock) # Patch the global publisher
-async def test_create_turn_success(mock_publish: AsyncMock, client: TestClient):
+@pytest.mark.asyncio(loop_scope="session")
+async def test_create_turn_success(mock_publish: AsyncMock, aclient: AsyncClient):
     """
     Tests successful creation of a turn via POST /v1/turns,
     verifying that a TURN_START event is published with correct data.
     """
-    request_payload = {
-        "user_message": {"role": "user", "content": "Hello, agent!"},
-        "personality_id": "test_personality_001",
-        "session_id": "session_test_12345",
-        "metadata": {"client_type": "test_client"},
-        "turn_id": "custom_turn_id_provided" # Test with client-provided turn_id
-    }
+    request_payload = _payload(
+        session_id="session_test_12345",
+        metadata={"client_type": "test_client"},
+        turn_id="custom_turn_id_provided" # Test with client-provided turn_id
+    )
     headers = {"X-Request-ID": "test-trace-id-789"} # For trace_id
 
-    response = client.post("/v1/turns", json=request_payload, headers=headers)
+    response = await aclient.post("/v1/turns", json=request_payload, headers=headers)
 
     assert response.status_code == 202
     response_json = response.json()
@@ -50,43 +81,27 @@ async def test_create_turn_success(mock_publish: AsyncMock, client: TestClient):
     assert response_json["turn_id"] == request_payload["turn_id"] # Ensure provided turn_id is used
     assert response_json["trace_id"] == headers["X-Request-ID"]
 
-    mock_publish.assert_called_once()
-    
-    published_event_envelope: EventEnvelope = mock_publish.call_args[0][0]
-    assert isinstance(published_event_envelope, EventEnvelope)
-    assert published_event_envelope.type == "TURN_START" # Changed event_type to type
-    assert published_event_envelope.trace_id == headers["X-Request-ID"]
-    assert published_event_envelope.session_id == request_payload["session_id"]
-    # EventEnvelope.event_id and timestamp are auto-generated, spec_version is fixed
-    assert published_event_envelope.spec_version == "1.0.0"
-    assert isinstance(uuid.UUID(published_event_envelope.event_id.replace("evt_", "")), uuid.UUID) # Check if valid UUID part
-
-    published_payload: TurnEventPayload = published_event_envelope.payload
-    assert isinstance(published_payload, TurnEventPayload)
-    assert published_payload.turn_id == request_payload["turn_id"]
-    
-    # Assert specific fields of TurnEventPayload
-    assert published_payload.user_message.role == request_payload["user_message"]["role"]
-    assert published_payload.user_message.content == request_payload["user_message"]["content"]
-    assert published_payload.personality_id == request_payload["personality_id"]
-    assert published_payload.metadata == request_payload["metadata"]
-    
-    # Assert that fields made optional are None if not provided (or their default if set in model)
-    assert published_payload.instructions is None 
-    assert published_payload.parameters is None
+    assert_envelope_matches(mock_publish, {
+        "type": "TURN_START",
+        "spec_version": "1.0.0",
+        "trace_id": headers["X-Request-ID"],
+        "session_id": request_payload["session_id"],
+        "turn_id": request_payload["turn_id"],
+        "user_message": request_payload["user_message"],
+        "personality_id": request_payload["personality_id"],
+        "metadata": request_payload["metadata"],
+        # Optional TurnEventPayload fields stay None when not provided
+        "instructions": None,
+        "parameters": None,
+    })
 
 # Test for when turn_id is NOT provided (should be generated)
-@pytest.mark.asyncio
-@patch('core.events.event_publisher.publish', new_callable=AsyncMock)
-async def test_create_turn_success_generated_turn_id(mock_publish: AsyncMock, client: TestClient):
-    request_payload = {
-        "user_message": {"role": "user", "content": "Another hello!"},
-        "personality_id": "test_perso_002",
-        # No session_id or metadata for this test, ensure they are handled as None
-    }
+@pytest.mark.asyncio(loop_scope="session")
+async def test_create_turn_success_generated_turn_id(mock_publish: AsyncMock, aclient: AsyncClient):
+    request_payload = _payload() # No session_id or metadata for this test, ensure they are handled as None
     # No X-Request-ID, so trace_id will be auto-generated
 
-    response = client.post("/v1/turns", json=request_payload)
+    response = await aclient.post("/v1/turns", json=request_payload)
 
     assert response.status_code == 202
     response_json = response.json()
@@ -97,24 +112,60 @@ async def test_create_turn_success_generated_turn_id(mock_publish: AsyncMock, cl
     generated_trace_id = response_json["trace_id"]
     assert generated_trace_id.startswith("trace_")
 
-    mock_publish.assert_called_once()
-    published_event_envelope: EventEnvelope = mock_publish.call_args[0][0]
-    assert published_event_envelope.type == "TURN_START" # Changed event_type to type
-    assert published_event_envelope.trace_id == generated_trace_id # Ensure generated trace_id matches
-    assert published_event_envelope.session_id is None # As it wasn't provided
-
-    published_payload: TurnEventPayload = published_event_envelope.payload
-    assert published_payload.turn_id == generated_turn_id
-    assert published_payload.user_message.content == request_payload["user_message"]["content"]
-    assert published_payload.personality_id == request_payload["personality_id"]
-    assert published_payload.metadata is None # As it wasn't provided
-
-@pytest.mark.asyncio
-async def test_create_turn_malformed_json(client: TestClient):
+    assert_envelope_matches(mock_publish, {
+        "type": "TURN_START",
+        "spec_version": "1.0.0",
+        "trace_id": generated_trace_id, # Ensure generated trace_id matches
+        "session_id": None, # As it wasn't provided
+        "turn_id": generated_turn_id,
+        "user_message": request_payload["user_message"],
+        "personality_id": request_payload["personality_id"],
+        "metadata": None, # As it wasn't provided
+        "instructions": None,
+        "parameters": None,
+    })
+
+def _signed_headers(secret: bytes, body: bytes, signed_at: int) -> dict:
+    """Internal-trust headers for `body`, signed as "<timestamp>.<body>"."""
+    timestamp = str(signed_at)
+    signature = hmac.new(secret, timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+    return {"Content-Type": "application/json", "x-internal-trusted": signature, "x-internal-timestamp": timestamp}
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_create_turn_trusted_internal_signature(mock_publish: AsyncMock, aclient: AsyncClient):
+    """A freshly signed body is accepted; forged, stale or incomplete ones fall back to validation."""
+    secret = b"internal-test-secret"
+    body = json.dumps(_payload()).encode()
+    now = int(time.time())
+
+    with patch("server._INTERNAL_HMAC_KEY", secret):
+        response = await aclient.post("/v1/turns", content=body, headers=_signed_headers(secret, body, now))
+        assert response.status_code == 202
+        published_payload: TurnEventPayload = mock_publish.call_args.args[0].payload
+        assert published_payload.user_message.content == _BASE_PAYLOAD["user_message"]["content"]
+        assert published_payload.personality_id == _BASE_PAYLOAD["personality_id"]
+
+        # A forged signature gets no shortcut: the invalid role is still rejected
+        bad_body = body.replace(b'"user"', b'"robot"')
+        response = await aclient.post("/v1/turns", content=bad_body, headers=_signed_headers(secret, body, now))
+        assert response.status_code == 422
+
+        # A replayed (stale) signature isn't trusted either
+        response = await aclient.post("/v1/turns", content=bad_body, headers=_signed_headers(secret, bad_body, now - 3600))
+        assert response.status_code == 422
+
+        # Signed but missing a required field: reported as 422, not a server error
+        incomplete_body = json.dumps(_payload(personality_id=None)).encode()
+        response = await aclient.post("/v1/turns", content=incomplete_body, headers=_signed_headers(secret, incomplete_body, now))
+        assert response.status_code == 422
+    assert mock_publish.call_count == 1
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_create_turn_malformed_json(aclient: AsyncClient):
     """Tests that a 400 error is returned for malformed JSON."""
     malformed_json_string = "{\"user_message\": {\"role\": \"user\", \"content\": \"Hi there\"}, \"personality_id\": \"test_perso_bad_json\" -- THIS IS BAD JSON"
     
-    response = client.post(
+    response = await aclient.post(
         "/v1/turns", 
         content=malformed_json_string, 
         headers={"Content-Type": "application/json"}
@@ -128,79 +179,33 @@ async def test_create_turn_malformed_json(client: TestClient):
     # The exact message might vary based on FastAPI version or our custom handling
     assert "Invalid JSON payload" in response_json["detail"] 
 
-@pytest.mark.asyncio
-@patch('core.events.event_publisher.publish', new_callable=AsyncMock)
-async def test_create_turn_missing_required_fields(mock_publish: AsyncMock, client: TestClient):
-    """Tests that a 422 error is returned for missing required fields."""
-    
-    # Test case 1: Missing user_message
-    payload_missing_user_message = {
-        "personality_id": "test_perso_003"
-    }
-    response = client.post("/v1/turns", json=payload_missing_user_message)
+@pytest.mark.asyncio(loop_scope="session")
+@pytest.mark.parametrize("payload, expected_detail", [
+    # Missing user_message
+    (_payload(user_message=None), "'user_message' (with role and content) is required"),
+    # Missing personality_id
+    (_payload(personality_id=None), "'personality_id' (string) is required"),
+    # Malformed user_message (missing role)
+    (_payload(user_message={"content": "Just content"}), "'user_message' (with role and content) is required"),
+    # Invalid session_id type (integer instead of string)
+    (_payload(session_id=12345), "Invalid 'session_id', must be a string if provided"),
+    # Invalid metadata type (not a dict)
+    (_payload(metadata="not_a_dictionary"), "Invalid 'metadata', must be a dictionary if provided"),
+], ids=["missing_user_message", "missing_personality_id", "malformed_user_message", "invalid_session_id", "invalid_metadata"])
+async def test_create_turn_missing_required_fields(payload: dict, expected_detail: str, mock_publish: AsyncMock, aclient: AsyncClient):
+    """Tests that a 422 error is returned for missing or invalid fields."""
+    response = await aclient.post("/v1/turns", json=payload)
     assert response.status_code == 422
-    assert "'user_message' (with role and content) is required" in response.json()["detail"]
+    assert expected_detail in response.json()["detail"]
     mock_publish.assert_not_called() # Ensure publisher not called on validation error
 
-    mock_publish.reset_mock() # Reset mock for the next call
-
-    # Test case 2: Missing personality_id
-    payload_missing_personality_id = {
-        "user_message": {"role": "user", "content": "Hello again"}
-    }
-    response = client.post("/v1/turns", json=payload_missing_personality_id)
-    assert response.status_code == 422
-    assert "'personality_id' (string) is required" in response.json()["detail"]
-    mock_publish.assert_not_called()
-
-    mock_publish.reset_mock()
-
-    # Test case 3: Malformed user_message (e.g., missing role)
-    payload_malformed_user_message = {
-        "user_message": {"content": "Just content"}, # Missing role
-        "personality_id": "test_perso_004"
-    }
-    response = client.post("/v1/turns", json=payload_malformed_user_message)
-    assert response.status_code == 422
-    assert "'user_message' (with role and content) is required" in response.json()["detail"]
-    mock_publish.assert_not_called()
-
-    mock_publish.reset_mock()
-
-    # Test case 4: Invalid session_id type (e.g., not a string)
-    payload_invalid_session_id = {
-        "user_message": {"role": "user", "content": "Hello"},
-        "personality_id": "test_perso_005",
-        "session_id": 12345 # Integer instead of string
-    }
-    response = client.post("/v1/turns", json=payload_invalid_session_id)
-    assert response.status_code == 422
-    assert "Invalid 'session_id', must be a string if provided" in response.json()["detail"]
-    mock_publish.assert_not_called()
-
-    mock_publish.reset_mock()
-
-    # Test case 5: Invalid metadata type (e.g., not a dict)
-    payload_invalid_metadata = {
-        "user_message": {"role": "user", "content": "Hello"},
-        "personality_id": "test_perso_006",
-        "metadata": "not_a_dictionary"
-    }
-    response = client.post("/v1/turns", json=payload_invalid_metadata)
-    assert response.status_code == 422
-    assert "Invalid 'metadata', must be a dictionary if provided" in response.json()["detail"]
-    mock_publish.assert_not_called()
-
-@pytest.mark.asyncio
-@patch('core.events.event_publisher.publish', side_effect=Exception("Failed to publish event"))
-async def test_create_turn_event_publisher_error(mock_publish: AsyncMock, client: TestClient):
+@pytest.mark.asyncio(loop_scope="session")
+async def test_create_turn_event_publisher_error(mock_publish: AsyncMock, aclient: AsyncClient):
     """Tests that a 500 error is returned when event_publisher.publish raises an error."""
-    request_payload = {
-        "user_message": {"role": "user", "content": "Hello error!"},
-        "personality_id": "test_perso_error_case",
-    }
+    mock_publish.side_effect = Exception("Failed to publish event")
+    request_payload = _payload()
     
-    response = client.post("/v1/turns", json=request_payload)
+    response = await aclient.post("/v1/turns", json=request_payload)
     
     # Expect 500 when publish fails
     assert response.status_code == 500
@@ -211,13 +216,11 @@ async def test_create_turn_event_publisher_error(mock_publish: AsyncMock, client
     # Verify publisher was called but raised the exception
     mock_publish.assert_called_once()
 
-@pytest.mark.asyncio
-@patch('server.event_publisher.publish', new_callable=AsyncMock)
-@patch('core.context.ContextManager.get_turn')
-async def test_get_turn_status_success(mock_get_turn: AsyncMock, mock_publish: AsyncMock, client: TestClient):
-    """Tests that the GET /v1/turns/{turn_id} endpoint works correctly."""
+@pytest.fixture(scope="module")
+def success_turn_fixtures():
+    """Builds the stored turn stand-in and the status payload GET /v1/turns/{turn_id} should return for it."""
     turn_id = "turn_12345_success"
-    
+
     # Expected data to be returned by the endpoint (after processing mock_turn_context)
     expected_created_at = datetime(2025, 5, 13, 12, 0, 0, tzinfo=timezone.utc)
     expected_updated_at = datetime(2025, 5, 13, 12, 5, 0, tzinfo=timezone.utc)
@@ -238,45 +241,61 @@ async def test_get_turn_status_success(mock_get_turn: AsyncMock, mock_publish: A
         "plan": expected_plan_data
     }
 
-    # Create a MagicMock that simulates a Turn object for the endpoint to process
-    mock_turn_context = MagicMock(spec=Turn) 
-    mock_turn_context.turn_id = turn_id
-    mock_turn_context.status = "COMPLETED" # Status is a string
-    
-    mock_user_message = MagicMock(spec=Message)
-    mock_user_message.model_dump.return_value = expected_user_message_data
-    mock_turn_context.user_message = mock_user_message
+    # Lightweight stand-ins for Turn/Message/Plan: the endpoint only reads attributes and calls model_dump()
+    mock_turn_context = SimpleNamespace(
+        turn_id=turn_id,
+        status="COMPLETED", # Status is a string
+        user_message=SimpleNamespace(model_dump=lambda: expected_user_message_data),
+        final_response=SimpleNamespace(model_dump=lambda: expected_final_response_data),
+        created_at=expected_created_at,
+        updated_at=expected_updated_at,
+        session_id=expected_response_payload["session_id"],
+        metadata=expected_response_payload["metadata"],
+        metrics=expected_response_payload["metrics"],
+        plan=SimpleNamespace(model_dump=lambda: expected_plan_data),
+    )
+    return mock_turn_context, expected_response_payload
 
-    mock_final_response = MagicMock(spec=Message)
-    mock_final_response.model_dump.return_value = expected_final_response_data
-    mock_turn_context.final_response = mock_final_response
-    
-    mock_turn_context.created_at = expected_created_at
-    mock_turn_context.updated_at = expected_updated_at
-    
-    mock_turn_context.session_id = expected_response_payload["session_id"]
-    mock_turn_context.metadata = expected_response_payload["metadata"]
-    mock_turn_context.metrics = expected_response_payload["metrics"]
-    
-    mock_plan = MagicMock(spec=Plan)
-    mock_plan.model_dump.return_value = expected_plan_data
-    mock_turn_context.plan = mock_plan
-    
-    mock_get_turn.return_value = mock_turn_context # context_manager.get_turn returns this mock
+@pytest.fixture
+def get_turn_mock():
+    """Patches ContextManager.get_turn (an AsyncMock, as the method is async); tests set return_value/side_effect."""
+    with patch('core.context.ContextManager.get_turn') as mock:
+        yield mock
 
-    response = client.get(f"/v1/turns/{turn_id}")
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_turn_status_success(get_turn_mock: AsyncMock, success_turn_fixtures, aclient: AsyncClient):
+    """Tests that the GET /v1/turns/{turn_id} endpoint works correctly."""
+    mock_turn_context, expected_response_payload = success_turn_fixtures
+    get_turn_mock.return_value = mock_turn_context # context_manager.get_turn returns this stand-in
+
+    response = await aclient.get(f"/v1/turns/{mock_turn_context.turn_id}")
 
     assert response.status_code == 200
     assert response.json() == expected_response_payload
 
-@pytest.mark.asyncio
-@patch('server.event_publisher.publish', new_callable=AsyncMock)
-@patch('core.context.ContextManager.get_turn', return_value=None)
-async def test_get_turn_status_not_found(mock_get_turn: AsyncMock, mock_publish: AsyncMock, client: TestClient):
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_turns_status_batch(aclient: AsyncClient):
+    """Tests that GET /v1/turns?ids=... returns each turn's status keyed by turn_id in one batched read."""
+    stored_turn = Turn(turn_id="turn_batch_1", user_message=Message(role="user", content="Hi"), personality_id="p", status="COMPLETED")
+    turn = ContextManager._load_turn(stored_turn.model_dump_json()) # As returned from memory
+    with patch('core.context.ContextManager.get_turns', new_callable=AsyncMock,
+               return_value={"turn_batch_1": turn, "turn_batch_missing": None}) as mock_get_turns:
+        response = await aclient.get("/v1/turns", params={"ids": "turn_batch_1,turn_batch_missing,turn_batch_1"})
+
+    assert response.status_code == 200
+    response_json = response.json()
+    assert response_json["turn_batch_missing"] is None
+    assert response_json["turn_batch_1"]["status"] == "COMPLETED"
+    assert response_json["turn_batch_1"]["user_message"] == {"role": "user", "content": "Hi"}
+    mock_get_turns.assert_called_once_with(["turn_batch_1", "turn_batch_missing"]) # Duplicates collapsed
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_turn_status_not_found(get_turn_mock: AsyncMock, aclient: AsyncClient):
     """Tests that a 404 error is returned when the turn is not found."""
+    get_turn_mock.return_value = None
     turn_id = "nonexistent_turn_id"
     
-    response = client.get(f"/v1/turns/{turn_id}")
+    response = await aclient.get(f"/v1/turns/{turn_id}")
     
     assert response.status_code == 404
     response_json = response.json()
@@ -284,16 +303,15 @@ async def test_get_turn_status_not_found(mock_get_turn: AsyncMock, mock_publish:
     assert "Turn not found" in response_json["detail"]
     
     # Verify ContextManager.get_turn was called with the right turn_id
-    mock_get_turn.assert_called_once_with(turn_id)
+    get_turn_mock.assert_called_once_with(turn_id)
 
-@pytest.mark.asyncio
-@patch('server.event_publisher.publish', new_callable=AsyncMock)
-@patch('core.context.ContextManager.get_turn', side_effect=Exception("Database error"))
-async def test_get_turn_status_error(mock_get_turn: AsyncMock, mock_publish: AsyncMock, client: TestClient):
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_turn_status_error(get_turn_mock: AsyncMock, aclient: AsyncClient):
     """Tests that a 500 error is returned when getting turn status raises an error."""
+    get_turn_mock.side_effect = Exception("Database error")
     turn_id = "error_turn_id"
     
-    response = client.get(f"/v1/turns/{turn_id}")
+    response = await aclient.get(f"/v1/turns/{turn_id}")
     
     assert response.status_code == 500
     response_json = response.json()
@@ -301,4 +319,4 @@ async def test_get_turn_status_error(mock_get_turn: AsyncMock, mock_publish: Asy
     assert "Internal server error" in response_json["detail"]
     
     # Verify ContextManager.get_turn was called with the right turn_id
-    mock_get_turn.assert_called_once_with(turn_id) 
\ No newline at end of file
+    get_turn_mock.assert_called_once_with(turn_id) 
\ No newline at end of file
@@ -2,12 +2,15 @@
 
 import pytest
 import pytest_asyncio
-import pandas as pd
+import pyarrow as pa
 from unittest.mock import AsyncMock, MagicMock, patch
 import json
 from pydantic import Field
 from lancedb.pydantic import LanceModel
 import asyncio
+import hashlib
+import numpy as np
+from lancedb.embeddings import register, TextEmbeddingFunction
 
 # Update imports based on AppConfig structure
 from core.config import ( 
@@ -16,7 +19,17 @@ from core.config import (
     AnthropicProviderConfig, GroqProviderConfig, MemoryConfig, RedisConfig,
     ProvidersConfig, IggyIntegrationConfig, PersonalitiesConfig # Add missing imports
 )
-from memory.lancedb_store import LanceDBVectorStore
+import memory.lancedb_store as lancedb_store_module
+from memory.lancedb_store import LanceDBVectorStore, LANCEDB_EXPR_AVAILABLE, _uring_table_location
+
+@pytest.fixture(autouse=True)
+def clear_connection_cache():
+    """Each test patches lancedb.connect_async, so shared connections must not leak between tests."""
+    lancedb_store_module._conn_cache.clear()
+    lancedb_store_module._conn_refcounts.clear()
+    yield
+    lancedb_store_module._conn_cache.clear()
+    lancedb_store_module._conn_refcounts.clear()
 
 # Minimal AppConfig focused on LanceDBVectorStore
 @pytest.fixture
@@ -34,11 +47,11 @@ def app_config():
         log_level="INFO", 
         memory=memory_cfg,
         # Add dummy provider configs under 'providers'
-        providers=ProvidersConfig(
-            openai=OpenAIProviderConfig(),
-            anthropic=AnthropicProviderConfig(),
-            groq=GroqProviderConfig()
-        ),
+        providers={
+            "openai": OpenAIProviderConfig(),
+            "anthropic": AnthropicProviderConfig(),
+            "groq": GroqProviderConfig()
+        },
         # Add other required dummy configs
         iggy_integration=IggyIntegrationConfig(),
         personalities=PersonalitiesConfig(directory="./tests/fake_personalities"),
@@ -54,22 +67,37 @@ async def mock_lancedb_table():
     table_mock.add = AsyncMock(name="TableAdd_AsyncMock")
     table_mock.delete = AsyncMock(name="TableDelete_AsyncMock")
     table_mock.schema = MagicMock() # schema is an attribute
+
+    # Mock the fluent upsert interface: table.merge_insert().when_matched_update_all().when_not_matched_insert_all().execute()
+    # merge_insert() and the when_* calls are SYNC and return the same builder; execute() is awaited.
+    merge_builder_mock = MagicMock(name="MergeInsertBuilder_Mock")
+    merge_builder_mock.when_matched_update_all.return_value = merge_builder_mock
+    merge_builder_mock.when_not_matched_insert_all.return_value = merge_builder_mock
+    merge_builder_mock.execute = AsyncMock(name="MergeInsertExecute_AsyncMock")
+    table_mock.merge_insert = MagicMock(return_value=merge_builder_mock, name="TableMergeInsert_SyncMock")
     table_mock.schema.names = ['id', 'vector', 'text', 'metadata']
 
-    # Mock the fluent search interface: table.search().where().limit().to_pandas_async()
-    # table.search() is SYNC and returns a query builder object.
+    # Mock the fluent query interface: table.vector_search(vector) / table.query() -> .where().select().limit().to_arrow()
+    # vector_search() and query() are SYNC and return a query builder object.
     search_query_builder_mock = MagicMock(name="SearchQueryBuilder_Mock")
-    table_mock.search = MagicMock(return_value=search_query_builder_mock, name="TableSearch_SyncMock")
+    table_mock.vector_search = MagicMock(return_value=search_query_builder_mock, name="TableVectorSearch_SyncMock")
+    table_mock.query = MagicMock(return_value=search_query_builder_mock, name="TableQuery_SyncMock")
 
     # Configure the chain on search_query_builder_mock
     # .where() is SYNC and returns the same builder mock for chaining
     search_query_builder_mock.where = MagicMock(return_value=search_query_builder_mock, name="QueryBuilderWhere_SyncMock")
     # .limit() is SYNC and returns the same builder mock
     search_query_builder_mock.limit = MagicMock(return_value=search_query_builder_mock, name="QueryBuilderLimit_SyncMock")
-    # .to_pandas_async() is ASYNC and is awaited.
-    search_query_builder_mock.to_pandas_async = AsyncMock(
-        return_value=pd.DataFrame({'id': [], 'text': [], 'metadata': []}), 
-        name="QueryBuilderToPandas_AsyncMock"
+    # .select() is SYNC (column projection) and returns the same builder mock
+    search_query_builder_mock.select = MagicMock(return_value=search_query_builder_mock, name="QueryBuilderSelect_SyncMock")
+    # .distance_type() is SYNC and returns the same builder mock
+    search_query_builder_mock.distance_type = MagicMock(return_value=search_query_builder_mock, name="QueryBuilderDistanceType_SyncMock")
+    # .postfilter() is SYNC and returns the same builder mock
+    search_query_builder_mock.postfilter = MagicMock(return_value=search_query_builder_mock, name="QueryBuilderPostfilter_SyncMock")
+    # .to_arrow() is ASYNC and is awaited.
+    search_query_builder_mock.to_arrow = AsyncMock(
+        return_value=pa.table({'id': [], 'text': [], 'metadata': []}), 
+        name="QueryBuilderToArrow_AsyncMock"
     )
 
     return table_mock
@@ -81,6 +109,7 @@ async def mock_lancedb_connection(mock_lancedb_table): # mock_lancedb_table is t
     # These should return the table_mock instance directly, as they are awaited
     connection.open_table = AsyncMock(return_value=mock_lancedb_table)
     connection.create_table = AsyncMock(return_value=mock_lancedb_table)
+    connection.close = MagicMock() # AsyncConnection.close() is sync
     return connection
 
 @pytest_asyncio.fixture
@@ -89,6 +118,8 @@ async def mock_embedding_function():
     mock_func = MagicMock()
     mock_func.source_column = 'text' # Match LanceDBVectorStore implementation
     mock_func.vector_column = 'vector' # Match LanceDBVectorStore implementation
+    # Client-side embeddings for writes: one 128-dim vector per text
+    mock_func.compute_source_embeddings.side_effect = lambda texts: [[0.0] * 128 for _ in texts]
     return mock_func
 
 @pytest_asyncio.fixture
@@ -157,6 +188,21 @@ async def lancedb_vector_store(app_config, mock_lancedb_connection, mock_embeddi
         if hasattr(service, 'close') and asyncio.iscoroutinefunction(service.close):
            await service.close()
 
+# Real local database: deterministic embeddings stand in for a model so stores run against actual LanceDB
+@register("test-deterministic")
+class DeterministicEmbeddings(TextEmbeddingFunction):
+    def ndims(self):
+        return 8
+
+    def generate_embeddings(self, texts):
+        return [np.random.default_rng(list(hashlib.sha256(text.encode()).digest())).random(8).tolist() for text in texts]
+
+@pytest_asyncio.fixture
+async def real_vector_store(tmp_path):
+    store = LanceDBVectorStore(db_uri=str(tmp_path / "lancedb"), table_name="real_vectors", embedding_function_name="test-deterministic")
+    yield store
+    await store.close()
+
 # Test initialization variations (Now tests _initialize_table directly)
 @pytest.mark.parametrize("table_exists, expected_call", [
     (True, "open_table"),
@@ -214,6 +260,48 @@ async def test_init_opens_or_creates_table(table_exists, expected_call, app_conf
             assert kwargs.get('mode') == 'create' # Default mode
             mock_lancedb_connection.open_table.assert_not_awaited()
 
+@pytest.mark.asyncio
+async def test_stores_share_connection_per_uri(app_config, mock_lancedb_connection, mock_embedding_function, mock_lancedb_table):
+    mock_lancedb_connection.table_names = AsyncMock(return_value=["a", "b"])
+    mock_lancedb_connection.open_table = AsyncMock(return_value=mock_lancedb_table)
+
+    with patch('lancedb.connect_async', return_value=mock_lancedb_connection) as mock_connect_async, \
+         patch('lancedb.embeddings.EmbeddingFunctionRegistry.get_instance') as mock_get_instance:
+        mock_get_instance.return_value.get.return_value.create.return_value = mock_embedding_function
+        mock_embedding_function.ndims.return_value = 128
+        mock_embedding_function.VectorField.return_value = Field()
+        mock_embedding_function.SourceField.return_value = Field()
+
+        stores = [LanceDBVectorStore(db_uri=app_config.memory.lancedb.uri, table_name=name) for name in ("a", "b")]
+        await asyncio.gather(*(store._initialize_table() for store in stores))
+
+        mock_connect_async.assert_awaited_once_with(app_config.memory.lancedb.uri)
+        assert stores[0].db is stores[1].db is mock_lancedb_connection
+
+        # The connection is closed only when the last store using it closes
+        await stores[0].close()
+        mock_lancedb_connection.close.assert_not_called()
+        await stores[1].close()
+        mock_lancedb_connection.close.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_concurrent_first_calls_initialize_once(app_config, mock_lancedb_connection, mock_embedding_function, mock_lancedb_table):
+    mock_lancedb_connection.table_names = AsyncMock(return_value=[app_config.memory.lancedb.table_name])
+
+    with patch('lancedb.connect_async', return_value=mock_lancedb_connection), \
+         patch('lancedb.embeddings.EmbeddingFunctionRegistry.get_instance') as mock_get_instance:
+        mock_get_instance.return_value.get.return_value.create.return_value = mock_embedding_function
+        mock_embedding_function.ndims.return_value = 128
+        mock_embedding_function.VectorField.return_value = Field()
+        mock_embedding_function.SourceField.return_value = Field()
+
+        service = LanceDBVectorStore(db_uri=app_config.memory.lancedb.uri, table_name=app_config.memory.lancedb.table_name)
+        assert not service._init_done.is_set()
+        await asyncio.gather(service._ensure_initialized(), service._ensure_initialized())
+
+        mock_lancedb_connection.table_names.assert_awaited_once()
+        assert service._init_done.is_set()
+
 @pytest.mark.asyncio
 async def test_write_success(lancedb_vector_store: LanceDBVectorStore, mock_lancedb_table: AsyncMock):
     key = "doc1"
@@ -228,14 +316,16 @@ async def test_write_success(lancedb_vector_store: LanceDBVectorStore, mock_lanc
 
     await lancedb_vector_store.write(key, text, metadata)
 
-    # Check that table.add was called with the correctly formatted data
-    mock_lancedb_table.add.assert_awaited_once()
-    call_args, call_kwargs = mock_lancedb_table.add.call_args
-    # The first argument should be the data (list of dicts)
-    assert isinstance(call_args[0], list)
-    assert len(call_args[0]) == 1
-    # Compare the dictionary content (handle potential JSON string diff)
-    added_dict = call_args[0][0]
+    # Check that a single merge_insert upsert keyed on doc_id was executed
+    mock_lancedb_table.merge_insert.assert_called_once_with("doc_id")
+    merge_builder = mock_lancedb_table.merge_insert.return_value
+    merge_builder.execute.assert_awaited_once()
+    call_args, call_kwargs = merge_builder.execute.call_args
+    # The first argument should be the data (a single Arrow RecordBatch)
+    assert isinstance(call_args[0], pa.RecordBatch)
+    assert call_args[0].num_rows == 1
+    # Compare the row content (handle potential JSON string diff)
+    added_dict = call_args[0].to_pylist()[0]
     assert added_dict['doc_id'] == expected_data[0]['doc_id']
     assert added_dict['text'] == expected_data[0]['text']
     # Metadata comparison: deserialize from JSON string if needed
@@ -243,6 +333,34 @@ async def test_write_success(lancedb_vector_store: LanceDBVectorStore, mock_lanc
          assert json.loads(added_dict['metadata']) == json.loads(expected_data[0]['metadata'])
     else:
          assert added_dict['metadata'] == expected_data[0]['metadata']
+    # Upsert is one transaction: no separate delete/add round-trips
+    mock_lancedb_table.delete.assert_not_awaited()
+    mock_lancedb_table.add.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_write_batches_concurrent_writes(lancedb_vector_store: LanceDBVectorStore, mock_lancedb_table: AsyncMock, mock_embedding_function):
+    """Concurrent writes within the insert window are upserted with a single merge_insert."""
+    lancedb_vector_store.async_insert_wait_time = 0.05
+    merge_builder = mock_lancedb_table.merge_insert.return_value
+
+    await asyncio.gather(
+        lancedb_vector_store.write("doc1", "first text", {"n": 1}),
+        lancedb_vector_store.write("doc2", "second text"),
+        lancedb_vector_store.write("doc1", "first text, updated", {"n": 2}),
+    )
+
+    mock_lancedb_table.merge_insert.assert_called_once_with("doc_id")
+    merge_builder.execute.assert_awaited_once()
+    records = merge_builder.execute.call_args.args[0].to_pylist()
+    # Later writes to the same doc_id win within a batch
+    assert [(r["doc_id"], r["text"]) for r in records] == [("doc1", "first text, updated"), ("doc2", "second text")]
+    assert json.loads(records[0]["metadata"]) == {"n": 2}
+    assert records[1]["metadata"] is None
+    # The whole batch is embedded client-side in one call and shipped with its vectors
+    mock_embedding_function.compute_source_embeddings.assert_called_once_with(["first text, updated", "second text"])
+    assert all(len(r["vector"]) == 128 for r in records)
+    mock_lancedb_table.delete.assert_not_awaited()
+    mock_lancedb_table.add.assert_not_awaited()
 
 @pytest.mark.asyncio
 async def test_read_success_found(lancedb_vector_store: LanceDBVectorStore, mock_lancedb_table: AsyncMock):
@@ -251,26 +369,26 @@ async def test_read_success_found(lancedb_vector_store: LanceDBVectorStore, mock
     expected_metadata = {"found": True}
     expected_filter_str = f"doc_id = '{key}'" # Use doc_id
 
-    # Configure the mock chain to return a DataFrame with one row
-    mock_df = pd.DataFrame([{
+    # Configure the mock chain to return an Arrow table with one row
+    mock_table = pa.Table.from_pylist([{
         'doc_id': key, # Use doc_id in mock data if needed for consistency
         'text': expected_text,
         'metadata': json.dumps(expected_metadata)
     }])
     
     # Configure the mock return value *without* calling search() again
-    search_builder_mock = mock_lancedb_table.search.return_value
-    search_builder_mock.where.return_value.limit.return_value.to_pandas_async.return_value = mock_df
+    search_builder_mock = mock_lancedb_table.query.return_value
+    search_builder_mock.where.return_value.limit.return_value.to_arrow.return_value = mock_table
 
     result = await lancedb_vector_store.read(key)
 
     # Verify the search call chain was used correctly
-    mock_lancedb_table.search.assert_called_once() # search() is sync
+    mock_lancedb_table.query.assert_called_once() # query() is sync
     # Get the mock builder instance that search() returned
-    search_builder_instance = mock_lancedb_table.search.return_value
+    search_builder_instance = mock_lancedb_table.query.return_value
     search_builder_instance.where.assert_called_once_with(expected_filter_str)
     search_builder_instance.where.return_value.limit.assert_called_once_with(1)
-    search_builder_instance.where.return_value.limit.return_value.to_pandas_async.assert_awaited_once()
+    search_builder_instance.where.return_value.limit.return_value.to_arrow.assert_awaited_once()
 
     assert result is not None
     assert result.get("text") == expected_text
@@ -281,21 +399,21 @@ async def test_read_success_not_found(lancedb_vector_store: LanceDBVectorStore,
     key = "doc_not_found"
     expected_filter_str = f"doc_id = '{key}'" # Use doc_id
 
-    # Configure the mock chain to return an empty DataFrame
-    mock_df = pd.DataFrame({'doc_id': [], 'text': [], 'metadata': []}) # Use doc_id
+    # Configure the mock chain to return an empty Arrow table
+    mock_table = pa.table({'doc_id': [], 'text': [], 'metadata': []}) # Use doc_id
     # Configure the mock return value *without* calling search() again
-    search_builder_mock = mock_lancedb_table.search.return_value
-    search_builder_mock.where.return_value.limit.return_value.to_pandas_async.return_value = mock_df
+    search_builder_mock = mock_lancedb_table.query.return_value
+    search_builder_mock.where.return_value.limit.return_value.to_arrow.return_value = mock_table
 
     result = await lancedb_vector_store.read(key)
 
     # Verify the search call chain was used correctly
-    mock_lancedb_table.search.assert_called_once() # search() is sync
+    mock_lancedb_table.query.assert_called_once() # query() is sync
     # Get the mock builder instance that search() returned
-    search_builder_instance = mock_lancedb_table.search.return_value
+    search_builder_instance = mock_lancedb_table.query.return_value
     search_builder_instance.where.assert_called_once_with(expected_filter_str)
     search_builder_instance.where.return_value.limit.assert_called_once_with(1)
-    search_builder_instance.where.return_value.limit.return_value.to_pandas_async.assert_awaited_once()
+    search_builder_instance.where.return_value.limit.return_value.to_arrow.assert_awaited_once()
 
     assert result is None
 
@@ -319,23 +437,25 @@ async def test_search_success(lancedb_vector_store: LanceDBVectorStore, mock_lan
         {'doc_id': 'res1', 'text': 'Result 1', 'metadata': json.dumps({"source": "A"}), '_distance': 0.1},
         {'doc_id': 'res2', 'text': 'Result 2', 'metadata': json.dumps({"source": "B"}), '_distance': 0.2}
     ]
-    mock_df = pd.DataFrame(expected_results_data)
+    mock_table = pa.Table.from_pylist(expected_results_data)
+    query_vector = [0.1, 0.2]
+    lancedb_vector_store.embedding_func.compute_query_embeddings.return_value = [query_vector]
 
     # Configure the mock chain for search
     # Configure the mock return value *without* calling search() again
-    search_builder_mock = mock_lancedb_table.search.return_value
-    # Note: search() takes query arg, where() is not called for basic search
-    search_builder_mock.limit.return_value.to_pandas_async.return_value = mock_df
+    search_builder_mock = mock_lancedb_table.vector_search.return_value
+    # Note: search() takes the query vector, where() is not called for basic search
+    search_builder_mock.limit.return_value.to_arrow.return_value = mock_table
 
     results = await lancedb_vector_store.search(query=query, top_k=top_k)
 
     # Verify the search call chain
-    mock_lancedb_table.search.assert_called_once_with(query)
-    # Get the mock builder instance that search() returned
-    search_builder_instance = mock_lancedb_table.search.return_value
+    mock_lancedb_table.vector_search.assert_called_once_with(query_vector)
+    # Get the mock builder instance that vector_search() returned
+    search_builder_instance = mock_lancedb_table.vector_search.return_value
     search_builder_instance.where.assert_not_called() # No filter applied
     search_builder_instance.limit.assert_called_once_with(top_k)
-    search_builder_instance.limit.return_value.to_pandas_async.assert_awaited_once()
+    search_builder_instance.limit.return_value.to_arrow.assert_awaited_once()
 
     # Check results formatting
     assert len(results) == 2
@@ -359,27 +479,30 @@ async def test_search_with_filters(lancedb_vector_store: LanceDBVectorStore, moc
     expected_results_data = [
         {'doc_id': 'f_res1', 'text': 'Filtered Result 1', 'metadata': json.dumps({"source": "specific", "timestamp": 1500}), '_distance': 0.3}
     ]
-    mock_df = pd.DataFrame(expected_results_data)
+    mock_table = pa.Table.from_pylist(expected_results_data)
+    query_vector = [0.3, 0.4]
+    lancedb_vector_store.embedding_func.compute_query_embeddings.return_value = [query_vector]
 
     # Configure the mock chain for filtered search
     # Configure the mock return value *without* calling search() again
-    search_builder_mock = mock_lancedb_table.search.return_value
-    search_builder_mock.where.return_value.limit.return_value.to_pandas_async.return_value = mock_df
+    search_builder_mock = mock_lancedb_table.vector_search.return_value
+    search_builder_mock.where.return_value.limit.return_value.to_arrow.return_value = mock_table
     
     # Mock the internal filter builder if needed, or just check the where() call
     with patch.object(lancedb_vector_store, '_build_filter_string', return_value=expected_filter_str) as mock_build_filter:
         results = await lancedb_vector_store.search(query=query, top_k=top_k, filters=filters)
 
     # Verify the search call chain
-    mock_lancedb_table.search.assert_called_once_with(query)
+    mock_lancedb_table.vector_search.assert_called_once_with(query_vector)
     # Verify filter builder was called
     mock_build_filter.assert_called_once_with(filters)
-    # Get the mock builder instance that search() returned
-    search_builder_instance = mock_lancedb_table.search.return_value
+    # Get the mock builder instance that vector_search() returned
+    search_builder_instance = mock_lancedb_table.vector_search.return_value
     # Check where() was called with the expected string from the (mocked) builder
-    search_builder_instance.where.assert_called_once_with(expected_filter_str, prefilter=False) 
+    search_builder_instance.where.assert_called_once_with(expected_filter_str)
+    search_builder_instance.postfilter.assert_called_once()
     search_builder_instance.where.return_value.limit.assert_called_once_with(top_k)
-    search_builder_instance.where.return_value.limit.return_value.to_pandas_async.assert_awaited_once()
+    search_builder_instance.where.return_value.limit.return_value.to_arrow.assert_awaited_once()
 
     # Check results formatting
     assert len(results) == 1
@@ -387,6 +510,191 @@ async def test_search_with_filters(lancedb_vector_store: LanceDBVectorStore, moc
     assert results[0]['metadata'] == {"source": "specific", "timestamp": 1500}
     assert results[0]['score'] == 0.3
 
+@pytest.mark.asyncio
+async def test_search_batch_embeds_once(lancedb_vector_store: LanceDBVectorStore, mock_lancedb_table: AsyncMock, mock_embedding_function):
+    queries = ["first query", "second query"]
+    vectors = [[0.1, 0.2], [0.3, 0.4]]
+    mock_embedding_function.compute_query_embeddings.side_effect = lambda query: [vectors[queries.index(query)]]
+    search_builder_mock = mock_lancedb_table.vector_search.return_value
+    search_builder_mock.limit.return_value.to_arrow.return_value = pa.Table.from_pylist(
+        [{'doc_id': 'res1', 'text': 'Result 1', 'metadata': json.dumps({"source": "A"}), '_distance': 0.1}]
+    )
+
+    results = await lancedb_vector_store.search_batch(queries, top_k=1)
+
+    # Queries are embedded as queries (matching embed_query); each precomputed vector is searched directly
+    assert [c.args[0] for c in mock_embedding_function.compute_query_embeddings.call_args_list] == queries
+    mock_embedding_function.compute_source_embeddings.assert_not_called()
+    assert [c.args[0] for c in mock_lancedb_table.vector_search.call_args_list] == vectors
+    assert len(results) == 2
+    assert results[0] == [{"text": "Result 1", "metadata": {"source": "A"}, "score": 0.1}]
+
+@pytest.mark.asyncio
+async def test_search_reuses_cached_query_embedding(lancedb_vector_store: LanceDBVectorStore, mock_lancedb_table: AsyncMock, mock_embedding_function):
+    mock_embedding_function.compute_query_embeddings.return_value = [[0.5, 0.5]]
+
+    await lancedb_vector_store.search("repeated query")
+    await lancedb_vector_store.search("repeated query")
+
+    mock_embedding_function.compute_query_embeddings.assert_called_once_with("repeated query")
+    assert [c.args[0] for c in mock_lancedb_table.vector_search.call_args_list] == [[0.5, 0.5], [0.5, 0.5]]
+
+@pytest.mark.asyncio
+async def test_real_db_write_read_search(real_vector_store: LanceDBVectorStore):
+    assert await real_vector_store.write("doc1", "first document", {"source": "A"})
+    assert await real_vector_store.write("doc2", "second document", {"source": "B"})
+
+    assert await real_vector_store.read("doc1") == {"text": "first document", "metadata": {"source": "A"}}
+    assert await real_vector_store.read("missing") is None
+    results = await real_vector_store.search("second document", top_k=1, raise_errors=True)
+    assert [r["text"] for r in results] == ["second document"]
+    assert [r["text"] for r in (await real_vector_store.search_batch(["first document"], top_k=1))[0]] == ["first document"]
+
+def test_filter_string_is_memoized(lancedb_vector_store: LanceDBVectorStore):
+    filters = {"source": "it's", "count": 3, "flag": True}
+    expected = (
+        "json_extract(metadata, '$.source') = 'it''s' AND "
+        "CAST(json_extract(metadata, '$.count') AS REAL) = 3 AND "
+        "CAST(json_extract(metadata, '$.flag') AS REAL) = TRUE"
+    )
+
+    with patch.object(lancedb_vector_store, '_build_filter_string', wraps=lancedb_vector_store._build_filter_string) as mock_build_filter:
+        assert lancedb_vector_store._get_filter(filters) == expected
+        assert lancedb_vector_store._get_filter(dict(filters)) == expected
+
+    mock_build_filter.assert_called_once_with(filters)
+
+@pytest.mark.asyncio
+async def test_indexed_metadata_keys_use_columns(lancedb_vector_store: LanceDBVectorStore, mock_lancedb_table: AsyncMock):
+    lancedb_vector_store.indexed_metadata_keys = ("tenant_id",)
+    lancedb_vector_store._arrow_write_schema = lancedb_vector_store._arrow_write_schema.append(pa.field("tenant_id", pa.string()))
+
+    await lancedb_vector_store.write("doc1", "tenant doc", {"tenant_id": "acme", "source": "test"})
+
+    record = mock_lancedb_table.merge_insert.return_value.execute.call_args.args[0].to_pylist()[0]
+    assert record["tenant_id"] == "acme"
+    assert json.loads(record["metadata"]) == {"tenant_id": "acme", "source": "test"}
+    # Promoted keys filter on their column; other keys still go through the metadata JSON
+    assert lancedb_vector_store._build_filter_string({"tenant_id": "acme", "source": "test"}) == (
+        "tenant_id = 'acme' AND json_extract(metadata, '$.source') = 'test'"
+    )
+
+@pytest.mark.skipif(not LANCEDB_EXPR_AVAILABLE, reason="lancedb.expr not available")
+def test_indexed_only_filters_compile_to_expression(lancedb_vector_store: LanceDBVectorStore):
+    from lancedb.expr import Expr
+    lancedb_vector_store.indexed_metadata_keys = ("tenant_id", "kind")
+
+    predicate = lancedb_vector_store._get_filter({"tenant_id": "acme", "kind": 1})
+
+    assert isinstance(predicate, Expr)
+    assert "acme" in str(predicate) and "'1'" in str(predicate)
+    assert lancedb_vector_store._get_filter({"kind": 1, "tenant_id": "acme"}) is predicate
+    # Column expressions are compiled once per key set
+    assert list(lancedb_vector_store._filter_templates) == [("kind", "tenant_id")]
+    lancedb_vector_store._get_filter({"tenant_id": "other", "kind": 2})
+    assert list(lancedb_vector_store._filter_templates) == [("kind", "tenant_id")]
+    # Keys outside the indexed set fall back to a SQL string
+    assert isinstance(lancedb_vector_store._get_filter({"tenant_id": "acme", "source": "x"}), str)
+
+@pytest.mark.asyncio
+async def test_msgpack_metadata_roundtrip_and_residual_filters(lancedb_vector_store: LanceDBVectorStore, mock_lancedb_table: AsyncMock):
+    import msgpack
+    lancedb_vector_store._set_metadata_format("msgpack")
+
+    await lancedb_vector_store.write("doc1", "packed doc", {"source": "test", "n": 2})
+
+    batch = mock_lancedb_table.merge_insert.return_value.execute.call_args.args[0]
+    assert batch.schema.field("metadata").type == pa.binary()
+    packed = batch.to_pylist()[0]["metadata"]
+    assert msgpack.unpackb(packed, raw=False) == {"source": "test", "n": 2}
+    # Rows written as JSON before the switch still decode
+    assert LanceDBVectorStore._decode_metadata(b'{"source": "old"}') == {"source": "old"}
+
+    # json_extract can't read binary metadata, so the filter runs on the decoded results
+    assert lancedb_vector_store._get_filter({"source": "test"}) is None
+    results = pa.Table.from_pylist([
+        {"text": "match", "metadata": packed, "_distance": 0.1},
+        {"text": "other", "metadata": msgpack.packb({"source": "else"}), "_distance": 0.2},
+    ])
+    formatted = lancedb_vector_store._format_search_results(results, {"source": "test"})
+    assert [r["text"] for r in formatted] == ["match"]
+
+@pytest.mark.asyncio
+async def test_vector_index_built_after_threshold(lancedb_vector_store: LanceDBVectorStore, mock_lancedb_table: AsyncMock):
+    lancedb_vector_store.auto_index_min_rows = 2
+    lancedb_vector_store._rows_until_index_check = 2
+    mock_lancedb_table.count_rows = AsyncMock(return_value=2)
+
+    await lancedb_vector_store.write("doc1", "first")
+    assert lancedb_vector_store._index_task is None
+    await lancedb_vector_store.write("doc2", "second")
+    await lancedb_vector_store._index_task
+
+    mock_lancedb_table.create_index.assert_awaited_once()
+    config = mock_lancedb_table.create_index.call_args.kwargs["config"]
+    assert config.num_partitions == 1 and config.num_sub_vectors == 8 # sqrt(2) partitions, 128 / 16 sub-vectors
+    assert config.distance_type == "cosine"
+    # Next build waits until the table doubles
+    assert lancedb_vector_store._indexed_rows == 2
+    assert lancedb_vector_store._rows_until_index_check == 2
+
+@pytest.mark.asyncio
+async def test_search_uses_index_metric(lancedb_vector_store: LanceDBVectorStore, mock_lancedb_table: AsyncMock):
+    await lancedb_vector_store.search([0.1, 0.2])
+
+    mock_lancedb_table.vector_search.return_value.distance_type.assert_called_once_with("cosine")
+
+@pytest.mark.asyncio
+async def test_real_db_searches_auto_built_index(tmp_path):
+    store = LanceDBVectorStore(
+        db_uri=str(tmp_path / "lancedb"), table_name="indexed_vectors", embedding_function_name="test-deterministic",
+        async_insert_wait_time=0.01, vector_index_type="IVF_SQ", auto_index_min_rows=300, distance_type="cosine"
+    )
+    try:
+        await asyncio.gather(*(store.write(f"doc{i}", f"document {i}") for i in range(300)))
+        await store._index_task
+        index = (await store.table.list_indices())[0]
+        assert (await store.table.index_stats(index.name)).distance_type == "cosine"
+
+        # Lance silently falls back to a flat scan when the query metric differs from the index's
+        plan = await store._vector_query([0.5] * 8).limit(1).explain_plan()
+        assert "ANNSubIndex" in plan and "metric=Cosine" in plan
+        for i in range(0, 300, 30):
+            results = await store.search(f"document {i}", top_k=1, raise_errors=True)
+            assert [r["text"] for r in results] == [f"document {i}"]
+    finally:
+        await store.close()
+
+def test_uring_table_location():
+    with patch("memory.lancedb_store.sys.platform", "linux"), \
+         patch("memory.lancedb_store._local_fs_type", return_value="ext4"):
+        assert _uring_table_location("/data/lancedb", "vectors", True) == "file+uring:///data/lancedb/vectors.lance"
+        assert _uring_table_location("/data/lancedb", "vectors", False) is None
+        assert _uring_table_location("s3://bucket/lancedb", "vectors", True) is None
+    with patch("memory.lancedb_store.sys.platform", "linux"), \
+         patch("memory.lancedb_store._local_fs_type", return_value="tmpfs"):
+        assert _uring_table_location("/dev/shm/lancedb", "vectors", True) is None
+
+@pytest.mark.asyncio
+async def test_real_db_io_uring_reads(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db_path = tmp_path / "lancedb"
+    with patch("memory.lancedb_store.sys.platform", "linux"), \
+         patch("memory.lancedb_store._local_fs_type", return_value="ext4"):
+        store = LanceDBVectorStore(db_uri=str(db_path), table_name="uring_vectors", embedding_function_name="test-deterministic", use_io_uring=True)
+        await store._initialize_table()
+    try:
+        assert store._read_table is not store.table
+        # Writes through the regular handle are visible to the io_uring handle right away
+        assert await store.write("doc1", "first document", {"source": "A"})
+        assert await store.read("doc1") == {"text": "first document", "metadata": {"source": "A"}}
+        assert [r["text"] for r in await store.search("first document", top_k=1, raise_errors=True)] == ["first document"]
+        # The database lives at its real path, with nothing created relative to the working directory
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["lancedb"]
+        assert [p.name for p in db_path.iterdir()] == ["uring_vectors.lance"]
+    finally:
+        await store.close()
+
 # TODO: Add tests for error_handling (e.g., LanceDBConnectionError) 
 # --- Error Handling Tests ---
 
@@ -400,26 +708,21 @@ async def test_write_failure(lancedb_vector_store: LanceDBVectorStore, mock_lanc
     key = "fail_doc"
     text = "This will fail."
     metadata = {"source": "failure_test"}
-    # Configure mock to raise an error on add()
-    mock_lancedb_table.add.side_effect = Exception("Simulated write error")
-    # Also configure delete mock in case it's called first in upsert
-    mock_lancedb_table.delete.side_effect = Exception("Simulated delete error during upsert")
+    # Configure the merge_insert upsert to raise an error
+    mock_lancedb_table.merge_insert.return_value.execute.side_effect = Exception("Simulated write error")
 
     import logging
     caplog.set_level(logging.ERROR)
 
     # Write should handle the exception internally and log it
-    # It should not raise an exception itself, as it catches the re-raised one from delete()
     await lancedb_vector_store.write(key, text, metadata)
 
-    # Check which mock actually raised the error based on implementation (delete first)
-    mock_lancedb_table.delete.assert_awaited_once()
-    mock_lancedb_table.add.assert_not_awaited() # Add should not be reached if delete fails
+    mock_lancedb_table.merge_insert.return_value.execute.assert_awaited_once()
 
     # Assert the correct error message is logged (from the write() method's except block)
     assert f"Failed during upsert operation for doc_id '{key}'" in caplog.text
-    # Check that the specific error message from the delete side_effect is also present
-    assert "Simulated delete error during upsert" in caplog.text
+    # Check that the specific error message from the upsert side_effect is also present
+    assert "Simulated write error" in caplog.text
 
 @pytest.mark.asyncio
 async def test_read_failure(lancedb_vector_store: LanceDBVectorStore, mock_lancedb_table: AsyncMock, caplog):
@@ -427,8 +730,8 @@ async def test_read_failure(lancedb_vector_store: LanceDBVectorStore, mock_lance
     key = "fail_read_doc"
     # Configure search chain to raise an error
     # Configure the mock return value *without* calling search() again
-    search_builder_mock = mock_lancedb_table.search.return_value
-    search_builder_mock.where.return_value.limit.return_value.to_pandas_async.side_effect = Exception("Simulated read error")
+    search_builder_mock = mock_lancedb_table.query.return_value
+    search_builder_mock.where.return_value.limit.return_value.to_arrow.side_effect = Exception("Simulated read error")
 
     import logging
     caplog.set_level(logging.ERROR)
@@ -436,11 +739,11 @@ async def test_read_failure(lancedb_vector_store: LanceDBVectorStore, mock_lance
     result = await lancedb_vector_store.read(key)
 
     # Assert search chain was called up to the point of failure
-    mock_lancedb_table.search.assert_called_once()
-    search_builder_instance = mock_lancedb_table.search.return_value
+    mock_lancedb_table.query.assert_called_once()
+    search_builder_instance = mock_lancedb_table.query.return_value
     search_builder_instance.where.assert_called_once_with(f"doc_id = '{key}'")
     search_builder_instance.where.return_value.limit.assert_called_once_with(1)
-    search_builder_instance.where.return_value.limit.return_value.to_pandas_async.assert_awaited_once()
+    search_builder_instance.where.return_value.limit.return_value.to_arrow.assert_awaited_once()
 
     assert result is None # Should return None on failure
     # Assert the correct error message is logged
@@ -475,10 +778,12 @@ async def test_search_failure(lancedb_vector_store: LanceDBVectorStore, mock_lan
     """Test that search failures return empty list and log errors."""
     query = "fail search query"
     top_k = 3
+    query_vector = [0.5, 0.6]
+    lancedb_vector_store.embedding_func.compute_query_embeddings.return_value = [query_vector]
     # Configure search chain to raise an error
     # Configure the mock return value *without* calling search() again
-    search_builder_mock = mock_lancedb_table.search.return_value
-    search_builder_mock.limit.return_value.to_pandas_async.side_effect = Exception("Simulated search error")
+    search_builder_mock = mock_lancedb_table.vector_search.return_value
+    search_builder_mock.limit.return_value.to_arrow.side_effect = Exception("Simulated search error")
 
     import logging
     caplog.set_level(logging.ERROR)
@@ -486,11 +791,11 @@ async def test_search_failure(lancedb_vector_store: LanceDBVectorStore, mock_lan
     results = await lancedb_vector_store.search(query=query, top_k=top_k)
 
     # Assert search chain was called up to the point of failure
-    mock_lancedb_table.search.assert_called_once_with(query)
-    search_builder_instance = mock_lancedb_table.search.return_value
+    mock_lancedb_table.vector_search.assert_called_once_with(query_vector)
+    search_builder_instance = mock_lancedb_table.vector_search.return_value
     search_builder_instance.where.assert_not_called() # No filter
     search_builder_instance.limit.assert_called_once_with(top_k)
-    search_builder_instance.limit.return_value.to_pandas_async.assert_awaited_once()
+    search_builder_instance.limit.return_value.to_arrow.assert_awaited_once()
 
     assert results == [] # Should return empty list on failure
     # Assert the correct error message is logged
@@ -0,0 +1,39 @@
+# Tests for the local ONNX embedding function
+
+import subprocess
+import sys
+
+import pytest
+
+from memory import onnx_embeddings
+from memory.onnx_embeddings import LocalONNXEmbeddingFunction, detect_quantization_arch
+
+
+def test_import_does_not_load_onnx_dependencies():
+    code = (
+        "import sys, memory.onnx_embeddings; "
+        "print(sorted(m for m in ('optimum', 'onnxruntime', 'transformers') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+@pytest.mark.parametrize("machine, flags, expected", [
+    ("x86_64", "fpu sse avx2 avx512f avx512bw avx512_vnni", "avx512_vnni"),
+    ("x86_64", "fpu sse avx2 avx512f avx512bw", "avx512"),
+    ("x86_64", "fpu sse avx2", "avx2"),
+    ("aarch64", "fp asimd", "arm64"),
+])
+def test_detect_quantization_arch(monkeypatch, tmp_path, machine, flags, expected):
+    cpuinfo = tmp_path / "cpuinfo"
+    cpuinfo.write_text(f"processor\t: 0\nflags\t\t: {flags}\n")
+    monkeypatch.setattr(onnx_embeddings.platform, "machine", lambda: machine)
+    monkeypatch.setattr(onnx_embeddings, "open", lambda path: open(cpuinfo), raising=False)
+
+    assert detect_quantization_arch() == expected
+
+def test_load_without_optimum_raises_import_error(monkeypatch):
+    monkeypatch.setitem(sys.modules, "optimum", None)
+    func = LocalONNXEmbeddingFunction()
+
+    with pytest.raises(ImportError, match="optimum"):
+        func.generate_embeddings(["hello"])
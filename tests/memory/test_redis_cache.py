@@ -3,7 +3,8 @@
 import pytest
 import pytest_asyncio
 import json
-from unittest.mock import AsyncMock, patch
+import msgpack
+from unittest.mock import AsyncMock, MagicMock, patch
 import asyncio
 import redis.exceptions
 from redis.exceptions import RedisError
@@ -65,8 +66,8 @@ async def mock_redis_client():
 @pytest_asyncio.fixture
 async def redis_cache_service(mock_redis_client):
     """Test fixture that uses a mocked Redis client."""
-    # Patch the Redis.from_url constructor to return our mock
-    with patch('redis.asyncio.Redis.from_url', return_value=mock_redis_client):
+    # Patch the Redis constructor (built on a BlockingConnectionPool) to return our mock
+    with patch('redis.asyncio.Redis', return_value=mock_redis_client):
         # Create the Redis service with real initialization
         service = RedisCacheService("redis://localhost:6379/1", default_ttl=3600)
         # Make sure the mock is used
@@ -87,7 +88,7 @@ async def test_write_success(redis_cache_service: RedisCacheService, mock_redis_
     # Verify the args were correct
     args, kwargs = mock_redis_client.set.call_args
     assert args[0] == key
-    assert args[1] == json.dumps(value)
+    assert msgpack.unpackb(args[1], raw=False) == value
     assert "ex" in kwargs  # TTL should be in kwargs
 
 @pytest.mark.asyncio
@@ -102,7 +103,7 @@ async def test_write_with_custom_ttl(redis_cache_service: RedisCacheService, moc
     mock_redis_client.set.assert_awaited_once()
     args, kwargs = mock_redis_client.set.call_args
     assert args[0] == key
-    assert args[1] == json.dumps(value)
+    assert msgpack.unpackb(args[1], raw=False) == value
     assert kwargs.get("ex") == custom_ttl  # Custom TTL should be used
 
 @pytest.mark.asyncio
@@ -140,13 +141,12 @@ async def test_serialization_deserialization(redis_cache_service: RedisCacheServ
     # Verify the args were correct
     args, kwargs = mock_redis_client.set.call_args
     assert args[0] == key
-    assert args[1] == json.dumps(complex_value)
+    assert msgpack.unpackb(args[1], raw=False) == complex_value
     assert "ex" in kwargs  # TTL should be in kwargs
     
-    # Configure mock_redis_client.get to return the JSON string
+    # Configure mock_redis_client.get to return the stored bytes
     async def mock_get(key):
-        # Return JSON string to simulate the stored value
-        return json.dumps(complex_value)
+        return args[1]
         
     mock_redis_client.get.side_effect = mock_get
     
@@ -157,6 +157,186 @@ async def test_serialization_deserialization(redis_cache_service: RedisCacheServ
     # Value should be deserialized to match the original
     assert value == complex_value
 
+@pytest.mark.asyncio
+async def test_json_serializer_roundtrip(mock_redis_client: AsyncMock):
+    with patch('redis.asyncio.Redis', return_value=mock_redis_client):
+        service = RedisCacheService("redis://localhost:6379/1", serializer="json")
+    value = {"text": "hello", "metadata": {"n": 1}}
+
+    await service.write("json_key", value)
+    args, _ = mock_redis_client.set.call_args
+    assert json.loads(args[1]) == value
+
+    mock_redis_client.get.return_value = args[1]
+    assert await service.read("json_key") == value
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("serializer", ["msgpack", "json"])
+async def test_numpy_values_are_serialized(mock_redis_client: AsyncMock, serializer: str):
+    np = pytest.importorskip("numpy")
+    with patch('redis.asyncio.Redis', return_value=mock_redis_client):
+        service = RedisCacheService("redis://localhost:6379/1", serializer=serializer)
+    value = {"embedding": np.array([0.5, 0.25], dtype=np.float32), "score": np.float32(0.75)}
+
+    await service.write("np_key", value)
+    args, _ = mock_redis_client.set.call_args
+
+    mock_redis_client.get.return_value = args[1]
+    assert await service.read("np_key") == {"embedding": [0.5, 0.25], "score": 0.75}
+
+@pytest.fixture
+def mock_pipeline(mock_redis_client: AsyncMock):
+    """Pipeline mock: commands are queued synchronously, execute() is awaited."""
+    pipe = MagicMock(name="Pipeline")
+    pipe.__aenter__.return_value = pipe
+    pipe.execute = AsyncMock()
+    mock_redis_client.pipeline = MagicMock(return_value=pipe)
+    return pipe
+
+@pytest.mark.asyncio
+async def test_mwrite_uses_one_pipeline(redis_cache_service: RedisCacheService, mock_redis_client: AsyncMock, mock_pipeline: MagicMock):
+    await redis_cache_service.mwrite({"k1": {"a": 1}, "k2": "two"}, ttl=60)
+
+    mock_redis_client.pipeline.assert_called_once_with(transaction=False)
+    assert [c.args[0] for c in mock_pipeline.set.call_args_list] == ["k1", "k2"]
+    assert msgpack.unpackb(mock_pipeline.set.call_args_list[0].args[1], raw=False) == {"a": 1}
+    assert all(c.kwargs["ex"] == 60 for c in mock_pipeline.set.call_args_list)
+    mock_pipeline.execute.assert_awaited_once()
+    mock_redis_client.set.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_mread_preserves_key_order(redis_cache_service: RedisCacheService, mock_pipeline: MagicMock):
+    mock_pipeline.execute.return_value = [msgpack.packb({"v": 1}), None, msgpack.packb("three")]
+
+    values = await redis_cache_service.mread(["a", "missing", "c"])
+
+    assert values == [{"v": 1}, None, "three"]
+    assert [c.args[0] for c in mock_pipeline.get.call_args_list] == ["a", "missing", "c"]
+
+@pytest.mark.asyncio
+async def test_mdelete_uses_one_pipeline(redis_cache_service: RedisCacheService, mock_pipeline: MagicMock):
+    mock_pipeline.execute.return_value = [1, 0]
+
+    await redis_cache_service.mdelete(["a", "b"])
+
+    assert [c.args[0] for c in mock_pipeline.delete.call_args_list] == ["a", "b"]
+    mock_pipeline.execute.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_write_behind_batches_writes(mock_redis_client: AsyncMock, mock_pipeline: MagicMock):
+    with patch('redis.asyncio.Redis', return_value=mock_redis_client):
+        service = RedisCacheService("redis://localhost:6379/1", default_ttl=60, write_behind=True, write_behind_interval=0.01)
+
+    await service.write("k1", {"v": 1})
+    await service.write("k2", {"v": 2})
+    await service.write("k1", {"v": 3}) # Supersedes the buffered k1
+    mock_redis_client.set.assert_not_called()
+    # Buffered writes are visible to reads before they are flushed
+    assert await service.read("k1") == {"v": 3}
+    mock_redis_client.get.assert_not_called()
+
+    await asyncio.sleep(0.05)
+    mock_pipeline.execute.assert_awaited_once()
+    assert {c.args[0]: msgpack.unpackb(c.args[1], raw=False) for c in mock_pipeline.set.call_args_list} == {"k1": {"v": 3}, "k2": {"v": 2}}
+
+    # Pending writes are flushed on close
+    await service.write("k3", "late")
+    await service.close()
+    assert mock_pipeline.execute.await_count == 2
+    assert mock_pipeline.set.call_args_list[-1].args[0] == "k3"
+    mock_redis_client.close.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_write_behind_delete_drops_buffered_write(mock_redis_client: AsyncMock, mock_pipeline: MagicMock):
+    with patch('redis.asyncio.Redis', return_value=mock_redis_client):
+        service = RedisCacheService("redis://localhost:6379/1", write_behind=True, write_behind_interval=0.01)
+
+    await service.write("k1", "value")
+    await service.delete("k1")
+    await service.flush()
+
+    mock_pipeline.set.assert_not_called()
+    mock_redis_client.delete.assert_awaited_once_with("k1")
+    await service.close()
+
+@pytest.mark.asyncio
+async def test_write_behind_bulk_ops_respect_buffer(mock_redis_client: AsyncMock, mock_pipeline: MagicMock):
+    with patch('redis.asyncio.Redis', return_value=mock_redis_client):
+        service = RedisCacheService("redis://localhost:6379/1", write_behind=True, write_behind_interval=0.01)
+
+    await service.write("k1", "buffered")
+    await service.write("k2", "stale")
+    mock_pipeline.execute.return_value = [msgpack.packb("remote")]
+    # Buffered values are served without a round trip; only k3 goes to Redis
+    assert await service.mread(["k1", "k3"]) == ["buffered", "remote"]
+    assert [c.args[0] for c in mock_pipeline.get.call_args_list] == ["k3"]
+
+    mock_pipeline.execute.return_value = [1]
+    await service.mdelete(["k1"])
+    await service.mwrite({"k2": "fresh"})
+    mock_pipeline.set.reset_mock()
+    await service.flush()
+    mock_pipeline.set.assert_not_called() # Neither the deleted nor the superseded value is written back
+    await service.close()
+
+@pytest.mark.asyncio
+async def test_write_behind_failed_flush_is_retried(mock_redis_client: AsyncMock, mock_pipeline: MagicMock):
+    with patch('redis.asyncio.Redis', return_value=mock_redis_client):
+        service = RedisCacheService("redis://localhost:6379/1", write_behind=True, write_behind_interval=0.01)
+    mock_pipeline.execute.side_effect = [RedisError("connection lost"), [True, True]]
+
+    await service.write("k1", "first")
+    await service.write("k2", "second")
+    assert await service.flush() is False
+    # The failed batch is requeued: still readable, and newer writes to its keys win
+    assert await service.read("k1") == "first"
+    await service.write("k2", "newer")
+
+    await asyncio.sleep(0.05) # The flusher retries after a backoff
+    assert mock_pipeline.execute.await_count == 2
+    sent = {c.args[0]: msgpack.unpackb(c.args[1], raw=False) for c in mock_pipeline.set.call_args_list[2:]}
+    assert sent == {"k1": "first", "k2": "newer"}
+    assert not service._pending
+    await service.close()
+
+@pytest.mark.asyncio
+async def test_scalar_serialization_is_memoized(redis_cache_service: RedisCacheService, mock_redis_client: AsyncMock):
+    redis_cache_service._cached_dumps.cache_clear()
+
+    await redis_cache_service.write("flag", True)
+    await redis_cache_service.write("flag", True)
+    await redis_cache_service.write("count", 1) # Equal to True but typed separately
+
+    info = redis_cache_service._cached_dumps.cache_info()
+    assert (info.hits, info.misses) == (1, 2)
+    assert [msgpack.unpackb(c.args[1]) for c in mock_redis_client.set.call_args_list] == [True, True, 1]
+
+@pytest.mark.asyncio
+async def test_local_cache_serves_hot_keys(mock_redis_client: AsyncMock):
+    with patch('redis.asyncio.Redis', return_value=mock_redis_client):
+        service = RedisCacheService("redis://localhost:6379/1", local_cache_size=2, local_cache_ttl=60)
+    mock_redis_client.get.return_value = msgpack.packb({"v": 1})
+
+    assert await service.read("hot") == {"v": 1}
+    assert await service.read("hot") == {"v": 1}
+    mock_redis_client.get.assert_awaited_once_with("hot")
+
+    # Writes refresh the local entry, deletes drop it
+    await service.write("hot", {"v": 2})
+    assert await service.read("hot") == {"v": 2}
+    await service.delete("hot")
+    mock_redis_client.get.return_value = None
+    assert await service.read("hot") is None
+    assert mock_redis_client.get.await_count == 2
+
+@pytest.mark.asyncio
+async def test_local_cache_evicts_least_recently_used(mock_redis_client: AsyncMock):
+    with patch('redis.asyncio.Redis', return_value=mock_redis_client):
+        service = RedisCacheService("redis://localhost:6379/1", local_cache_size=2, local_cache_ttl=60)
+    for key in ("a", "b", "c"):
+        await service.write(key, key)
+    assert list(service._local) == ["b", "c"]
+
 @pytest.mark.asyncio
 async def test_delete_success(redis_cache_service: RedisCacheService, mock_redis_client: AsyncMock):
     key = "test_key_delete"
@@ -201,6 +381,15 @@ async def test_delete_failure(redis_cache_service: RedisCacheService, mock_redis
     assert "test_key_delete_fail" in caplog.text
     mock_redis_client.delete.assert_awaited_once_with(key)
 
+def test_client_uses_bounded_blocking_pool(mock_redis_client: AsyncMock):
+    with patch('redis.asyncio.Redis', return_value=mock_redis_client) as mock_redis_cls:
+        service = RedisCacheService("redis://localhost:6379/1", pool_size=8, pool_timeout=2.0)
+
+    pool = mock_redis_cls.call_args.kwargs["connection_pool"]
+    assert isinstance(pool, redis.asyncio.BlockingConnectionPool)
+    assert pool.max_connections == 8 and pool.timeout == 2.0
+    assert service.redis_client is mock_redis_client
+
 @pytest.mark.asyncio
 async def test_close_closes_connection(redis_cache_service: RedisCacheService, mock_redis_client: AsyncMock):
     # Configure mock to ensure close is actually awaited
@@ -0,0 +1,241 @@
+# Tests for the OpenAI provider adapter
+
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import httpx
+import openai
+import pytest
+
+from core.config import ModelPricing, OpenAIProviderConfig # Loads core before providers (core.runtime imports the provider factory)
+from providers.base import EmbeddingResponse
+from providers.exceptions import ProviderError
+from core.metrics import record_llm_request
+from providers import openai as openai_adapter
+from providers.openai import OpenAIAdapter, _EmbedBatcher, _resolve_openai_key
+
+
+def _bad_request(message: str = "Invalid input") -> openai.BadRequestError:
+    response = httpx.Response(400, request=httpx.Request("POST", "https://api.openai.com/v1/embeddings"))
+    return openai.BadRequestError(message, response=response, body=None)
+
+def _embedding_response(inputs, total_tokens=None):
+    """Embeddings response whose vectors encode each input's length, so callers can check their slice."""
+    return SimpleNamespace(
+        data=[SimpleNamespace(embedding=[float(len(text))]) for text in inputs],
+        usage=SimpleNamespace(total_tokens=sum(len(text) for text in inputs) if total_tokens is None else total_tokens),
+    )
+
+@pytest.fixture
+def adapter(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    _resolve_openai_key.cache_clear()
+    pricing = {
+        "gpt-4o": ModelPricing(prompt_token_cost_usd_million=2.0, completion_token_cost_usd_million=8.0),
+        "text-embedding-3-small": ModelPricing(embedding_token_cost_usd_million=0.02),
+    }
+    yield OpenAIAdapter(OpenAIProviderConfig(model_pricing=pricing))
+    _resolve_openai_key.cache_clear()
+
+def _jsonl(*results) -> bytes:
+    return b"\n".join(json.dumps(result).encode() for result in results)
+
+def _batch_result(custom_id, body, status_code=200):
+    return {"custom_id": custom_id, "response": {"status_code": status_code, "body": body}}
+
+def _chat_body(text, prompt_tokens=1000, completion_tokens=500):
+    return {
+        "model": "gpt-4o",
+        "choices": [{"message": {"content": text}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens},
+    }
+
+def _batch_client(output=b"", errors=b"", status="completed"):
+    """AsyncOpenAI mock whose batch is in progress on creation and `status` on the first poll."""
+    aclient = MagicMock(name="AsyncOpenAI")
+    aclient.files.create = AsyncMock(return_value=SimpleNamespace(id="file-input"))
+    aclient.batches.create = AsyncMock(return_value=SimpleNamespace(id="batch_1", status="in_progress"))
+    aclient.batches.retrieve = AsyncMock(return_value=SimpleNamespace(
+        id="batch_1", status=status,
+        output_file_id="file-output" if output else None, error_file_id="file-errors" if errors else None,
+    ))
+    files = {"file-output": output, "file-errors": errors}
+    aclient.files.content = AsyncMock(side_effect=lambda file_id: SimpleNamespace(content=files[file_id]))
+    return aclient
+
+@pytest.fixture
+def mock_aclient():
+    aclient = MagicMock(name="AsyncOpenAI")
+    aclient.embeddings.create = AsyncMock(side_effect=lambda model, input, dimensions: _embedding_response(input))
+    return aclient
+
+@pytest.mark.asyncio
+async def test_embed_batcher_coalesces_concurrent_calls(mock_aclient):
+    mock_aclient.embeddings.create.side_effect = lambda model, input, dimensions: _embedding_response(input, total_tokens=100)
+    batcher = _EmbedBatcher(mock_aclient, "text-embedding-3-small", 256)
+
+    results = await asyncio.gather(batcher.embed(["a", "bbb"]), batcher.embed(["cccccc"]))
+
+    mock_aclient.embeddings.create.assert_awaited_once_with(model="text-embedding-3-small", input=["a", "bbb", "cccccc"], dimensions=256)
+    # Each caller gets its own slice, and tokens in proportion to its share of the characters (4/10, 6/10)
+    assert results == [([[1.0], [3.0]], 40), ([[6.0]], 60)]
+    await batcher.close()
+
+@pytest.mark.asyncio
+async def test_embed_batcher_splits_at_max_batch(mock_aclient):
+    batcher = _EmbedBatcher(mock_aclient, "text-embedding-3-small", None, max_batch=2)
+
+    results = await asyncio.gather(*(batcher.embed([text]) for text in ("a", "bb", "ccc")))
+
+    assert [c.kwargs["input"] for c in mock_aclient.embeddings.create.await_args_list] == [["a", "bb"], ["ccc"]]
+    assert [embeddings for embeddings, _ in results] == [[[1.0]], [[2.0]], [[3.0]]]
+    await batcher.close()
+
+@pytest.mark.asyncio
+async def test_embed_batcher_bad_request_fails_only_offending_caller(mock_aclient):
+    def create(model, input, dimensions):
+        if "too long" in input:
+            raise _bad_request("maximum context length exceeded")
+        return _embedding_response(input)
+    mock_aclient.embeddings.create.side_effect = create
+    batcher = _EmbedBatcher(mock_aclient, "text-embedding-3-small", None)
+
+    good, bad = await asyncio.gather(batcher.embed(["fine"]), batcher.embed(["too long"]), return_exceptions=True)
+
+    assert good == ([[4.0]], 4)
+    assert isinstance(bad, openai.BadRequestError)
+    # The shared request, then one retry per caller
+    assert [c.kwargs["input"] for c in mock_aclient.embeddings.create.await_args_list] == [["fine", "too long"], ["fine"], ["too long"]]
+    await batcher.close()
+
+@pytest.mark.asyncio
+async def test_embed_batcher_other_errors_fail_every_caller(mock_aclient):
+    mock_aclient.embeddings.create.side_effect = RuntimeError("connection reset")
+    batcher = _EmbedBatcher(mock_aclient, "text-embedding-3-small", None)
+
+    results = await asyncio.gather(batcher.embed(["a"]), batcher.embed(["b"]), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    mock_aclient.embeddings.create.assert_awaited_once()
+    await batcher.close()
+
+@pytest.mark.asyncio
+async def test_embed_batcher_close_cancels_waiting_callers(mock_aclient):
+    release = asyncio.Event()
+    async def create(model, input, dimensions):
+        await release.wait()
+        return _embedding_response(input)
+    mock_aclient.embeddings.create.side_effect = create
+    batcher = _EmbedBatcher(mock_aclient, "text-embedding-3-small", None)
+
+    in_flight = asyncio.ensure_future(batcher.embed(["sent"]))
+    await asyncio.sleep(0.05) # Its request is now waiting on the API
+    queued = asyncio.ensure_future(batcher.embed(["queued"]))
+    await batcher.close()
+
+    for caller in (in_flight, queued):
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+    assert not batcher._waiters
+
+@pytest.mark.asyncio
+async def test_embed_cache_is_not_aliased_to_returned_vectors(adapter):
+    adapter._embed = AsyncMock(return_value=EmbeddingResponse(embeddings=[[3.0, 4.0]], input_tokens=1, total_tokens=1, cost=0.0))
+    model_config = {"model": "text-embedding-3-small"}
+
+    first = await adapter.embed(["hello"], model_config)
+    first.embeddings[0][0] = 0.6 # e.g. a caller normalizing in place
+    second = await adapter.embed(["hello"], model_config)
+    second.embeddings[0][1] = 0.8
+    third = await adapter.embed(["hello"], model_config)
+
+    adapter._embed.assert_awaited_once()
+    assert second.cache_hits == third.cache_hits == 1
+    assert third.embeddings == [[3.0, 4.0]]
+
+@pytest.mark.asyncio
+async def test_measure_records_cancelled_calls(adapter, monkeypatch):
+    recorded = []
+    monkeypatch.setattr(openai_adapter, "enqueue_metric", lambda recorder, **fields: recorded.append(fields))
+    started = asyncio.Event()
+
+    async def call():
+        async with adapter._measure("generate", record_llm_request, "gpt-4o") as sample:
+            sample.update(input_tokens=10, output_tokens=5, cost=0.01)
+            started.set()
+            await asyncio.sleep(10)
+
+    task = asyncio.create_task(call())
+    await started.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert len(recorded) == 1
+    assert recorded[0]["status"] == recorded[0]["error_type"] == "cancelled"
+    assert recorded[0]["input_tokens"] == recorded[0]["output_tokens"] == recorded[0]["cost"] == 0
+
+@pytest.mark.asyncio
+async def test_generate_batch_returns_results_in_request_order(adapter):
+    # Results come back out of order, and request 1 has no result line at all
+    adapter._aclient = _batch_client(output=_jsonl(_batch_result("2", _chat_body("third")), _batch_result("0", _chat_body("first"))))
+    prompts = [("one", {"model": "gpt-4o"}), ("two", {"model": "gpt-4o", "temperature": 0.2}), ("three", {})]
+
+    responses = await adapter.generate_batch(prompts, poll_interval=0)
+
+    uploaded = adapter._aclient.files.create.await_args.kwargs["file"][1].splitlines()
+    assert [json.loads(line)["custom_id"] for line in uploaded] == ["0", "1", "2"]
+    assert json.loads(uploaded[1])["body"]["temperature"] == 0.2
+    adapter._aclient.batches.retrieve.assert_awaited_once_with("batch_1")
+    assert [r.text_content for r in responses] == ["first", None, "third"]
+    assert responses[1].is_error and responses[1].error_details == {"message": "No result returned for request."}
+    # 1000 prompt * $2/M + 500 completion * $8/M = $0.006, at the 50% batch rate
+    assert responses[0].cost == responses[2].cost == pytest.approx(0.003)
+    assert (responses[0].input_tokens, responses[0].output_tokens) == (1000, 500)
+
+@pytest.mark.asyncio
+async def test_generate_batch_maps_error_file_entries(adapter):
+    adapter._aclient = _batch_client(
+        output=_jsonl(_batch_result("0", _chat_body("ok")), _batch_result("1", {"error": {"message": "bad model"}}, status_code=400)),
+        errors=_jsonl({"custom_id": "2", "response": None, "error": {"code": "server_error", "message": "boom"}}),
+    )
+
+    responses = await adapter.generate_batch([("a", {}), ("b", {}), ("c", {})], poll_interval=0)
+
+    assert not responses[0].is_error and responses[0].text_content == "ok"
+    assert responses[1].is_error and responses[1].error_details == {"error": {"message": "bad model"}}
+    assert responses[2].is_error and responses[2].error_details == {"code": "server_error", "message": "boom"}
+
+@pytest.mark.asyncio
+async def test_run_batch_raises_when_batch_does_not_complete(adapter):
+    adapter._aclient = _batch_client(status="expired")
+
+    with pytest.raises(ProviderError, match="expired"):
+        await adapter.generate_batch([("a", {})], poll_interval=0)
+
+@pytest.mark.asyncio
+async def test_embed_batch_orders_embeddings_and_applies_batch_price(adapter, monkeypatch):
+    monkeypatch.setattr(openai_adapter, "MAX_EMBEDDING_INPUTS_PER_REQUEST", 2)
+    first = {"data": [{"index": 1, "embedding": [2.0]}, {"index": 0, "embedding": [1.0]}], "usage": {"total_tokens": 600}}
+    second = {"data": [{"index": 0, "embedding": [3.0]}], "usage": {"total_tokens": 400}}
+    adapter._aclient = _batch_client(output=_jsonl(_batch_result("1", second), _batch_result("0", first)))
+
+    response = await adapter.embed_batch(["a", "b", "c"], {"model": "text-embedding-3-small", "dimensions": 1}, poll_interval=0)
+
+    bodies = [json.loads(line)["body"] for line in adapter._aclient.files.create.await_args.kwargs["file"][1].splitlines()]
+    assert bodies == [
+        {"model": "text-embedding-3-small", "input": ["a", "b"], "dimensions": 1},
+        {"model": "text-embedding-3-small", "input": ["c"], "dimensions": 1},
+    ]
+    assert response.embeddings == [[1.0], [2.0], [3.0]]
+    assert response.total_tokens == 1000
+    assert response.cost == pytest.approx(1000 * 0.02e-6 * 0.5)
+
+@pytest.mark.asyncio
+async def test_embed_batch_raises_on_failed_request(adapter):
+    adapter._aclient = _batch_client(errors=_jsonl({"custom_id": "0", "response": None, "error": {"message": "boom"}}))
+
+    with pytest.raises(ProviderError, match="boom"):
+        await adapter.embed_batch(["a"], {}, poll_interval=0)
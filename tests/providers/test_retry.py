@@ -0,0 +1,56 @@
+# Tests for the provider retry wait strategies
+
+import time
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import pytest
+import tenacity
+
+from providers.retry import MAX_RETRY_AFTER_SECONDS, _retry_after_seconds, wait_retry_after
+
+
+def _error(headers) -> Exception:
+    err = Exception("rate limited")
+    err.response = SimpleNamespace(headers=headers)
+    return err
+
+def _retry_state(exc) -> tenacity.RetryCallState:
+    state = tenacity.RetryCallState(retry_object=tenacity.AsyncRetrying(), fn=None, args=(), kwargs={})
+    state.attempt_number = 1
+    state.set_exception((type(exc), exc, None))
+    return state
+
+FALLBACK = tenacity.wait_fixed(7)
+
+def test_retry_after_seconds():
+    assert _retry_after_seconds(_error({"retry-after": "3"})) == 3.0
+
+def test_retry_after_ms_takes_precedence():
+    assert _retry_after_seconds(_error({"retry-after-ms": "250", "retry-after": "3"})) == 0.25
+
+def test_retry_after_http_date():
+    delay = _retry_after_seconds(_error({"retry-after": formatdate(time.time() + 30, usegmt=True)}))
+    assert 28 <= delay <= 30
+
+def test_retry_after_read_from_cause():
+    cause = _error({"retry-after": "2"})
+    wrapped = RuntimeError("mapped")
+    wrapped.__cause__ = cause
+    assert _retry_after_seconds(wrapped) == 2.0
+
+@pytest.mark.parametrize("headers", [{}, {"retry-after": "soon"}])
+def test_retry_after_missing_or_unparseable(headers):
+    assert _retry_after_seconds(_error(headers)) is None
+
+def test_wait_uses_server_delay():
+    assert wait_retry_after(FALLBACK)(_retry_state(_error({"retry-after": "4"}))) == 4.0
+
+@pytest.mark.parametrize("headers", [{}, {"retry-after": str(MAX_RETRY_AFTER_SECONDS + 1)}])
+def test_wait_falls_back_without_usable_delay(headers):
+    assert wait_retry_after(FALLBACK)(_retry_state(_error(headers))) == 7
+
+def test_wait_respects_custom_cap():
+    wait = wait_retry_after(FALLBACK, max_wait=1.0)
+    assert wait(_retry_state(_error({"retry-after-ms": "900"}))) == 0.9
+    assert wait(_retry_state(_error({"retry-after": "2"}))) == 7
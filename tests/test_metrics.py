@@ -1,10 +1,13 @@
 """Tests for the core.metrics module."""
 
+import asyncio
 import unittest
 import time
 from prometheus_client import REGISTRY
 
 from core.metrics import (
+    enqueue_metric,
+    flush_metrics,
     record_llm_request,
     record_embedding_request,
     record_step_execution,
@@ -73,6 +76,22 @@ class TestMetrics(unittest.TestCase):
         self.assertTrue(any("llm_tokens_total" in s.name for s in REGISTRY._collector_to_names.keys()))
         self.assertTrue(any("llm_cost_total_usd" in s.name for s in REGISTRY._collector_to_names.keys()))
     
+    def test_enqueue_metric_records_in_background(self):
+        """Test that queued samples are recorded by the background consumer."""
+        recorded = []
+
+        async def run():
+            enqueue_metric(lambda **fields: recorded.append(fields), provider="test_provider", status="success")
+            self.assertEqual(recorded, [])  # Not recorded on the caller's path
+            await flush_metrics()
+
+        asyncio.run(run())
+        self.assertEqual(recorded, [{"provider": "test_provider", "status": "success"}])
+
+        # Without a running event loop the sample is recorded inline
+        enqueue_metric(lambda **fields: recorded.append(fields), provider="inline")
+        self.assertEqual(recorded[-1], {"provider": "inline"})
+
     def test_step_and_turn_metrics(self):
         """Test recording step and turn metrics."""
         # Record step execution